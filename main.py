@@ -1,56 +1,224 @@
 # main.py
-# Entry point for the psychology AI tool.
+# Batch entry point: transcribes and summarizes archived session recordings in parallel.
+"""
+Process every recording under OUTPUT_PATH/audio_records/ (one folder per patient) across
+a pool of worker processes. Each finished recording is appended to a JSON Lines results
+file and recorded in a checkpoint, so an interrupted run resumes where it stopped.
 
-from modules.speech_to_text import SpeechToText
-from modules.nlp_processing import NLPProcessor
-from modules.mood_music import MoodMusic
-from modules.image_generation import ImageGenerator
-from modules.ui import UI
-from modules.data_manager import DataManager
-from audio_transcriber import AudioTranscriber  # Importing the new class for audio transcription
+Usage:
+    python main.py [--workers 4] [--patient NAME] [--dry-run]
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+STRUCTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "structure")
+sys.path.append(STRUCTURE_DIR)
+
+from backend.settings import OUTPUT_PATH, configure_logging  # noqa: E402
+
+RECORDS_PATH = os.path.join(OUTPUT_PATH, "audio_records")
+BATCH_PATH = os.path.join(OUTPUT_PATH, "batch")
+
+
+def discover_recordings(records_path=RECORDS_PATH, patient=None):
+    """
+    Find the session recordings to process, skipping the chunk files left by older versions.
+
+    Args:
+        records_path (str): Folder containing one sub-folder of WAV files per patient.
+        patient (str): Only return this patient's recordings (optional).
+
+    Returns:
+        list: (patient_name, path) tuples, sorted by path.
+    """
+    recordings = []
+    for folder, _, files in os.walk(records_path):
+        name = os.path.basename(folder)
+        if patient and name != patient:
+            continue
+        for file in files:
+            if file.lower().endswith(".wav") and not file.startswith("chunk_"):
+                recordings.append((name, os.path.abspath(os.path.join(folder, file))))
+    return sorted(recordings, key=lambda item: item[1])
+
+
+def fingerprint(path):
+    """Size and modification time of a file, so a replaced recording is processed again."""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class Checkpoint:
+    def __init__(self, path):
+        """
+        Progress of a batch run: the fingerprint of every finished recording and the last
+        error of failed ones. Rewritten atomically after each recording.
+
+        Args:
+            path (str): Path of the checkpoint JSON file.
+        """
+        self.path = path
+        self.done = {}
+        self.failed = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                state = json.load(file)
+            self.done = state.get("done", {})
+            self.failed = state.get("failed", {})
+
+    def is_done(self, path):
+        return self.done.get(path) == fingerprint(path)
+
+    def mark_done(self, path, file_fingerprint):
+        self.done[path] = file_fingerprint
+        self.failed.pop(path, None)
+        self.save()
+
+    def mark_failed(self, path, error):
+        self.failed[path] = error
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"done": self.done, "failed": self.failed}, file, indent=4)
+        os.replace(temp_path, self.path)
+
+
+def _init_worker():
+    configure_logging()
+
+
+def process_recording(patient_name, path, summarize=True):
+    """
+    Transcribe (and summarize) one recording. Runs in a worker process.
+
+    Returns:
+        dict: The recording, its fingerprint, transcript, summary, mood and processing time.
+    """
+    from backend.agents.audio_agent import AudioAgent
+    from backend.session_store import _timestamp_from_name
+
+    start = time.perf_counter()
+    file_fingerprint = fingerprint(path)
+    audio_agent = AudioAgent(openai_api_key=os.getenv("OPENAI_API_KEY"), patient_data={"name": patient_name})
+    transcript = audio_agent.transcribe_long_audio(path)
+    if not transcript:
+        raise RuntimeError("transcription returned no text")
+    mood = audio_agent.analyze_sentiment(transcript)[0]["label"]
+
+    summary = None
+    if summarize:
+        summary = audio_agent.summarize_transcript(transcript)
+        if summary is None:
+            raise RuntimeError("summary generation failed")
+        # Archived sessions are dated by their recording, not by the day of the backfill
+        _, recorded_at = _timestamp_from_name(path)
+        if recorded_at is not None:
+            summary["date"] = str(recorded_at.date())
+    return {
+        "patient_name": patient_name,
+        "audio_file": path,
+        "fingerprint": file_fingerprint,
+        "transcript": transcript,
+        "mood": mood,
+        "summary": summary,
+        "seconds": round(time.perf_counter() - start, 1),
+    }
+
+
+def run_batch(recordings, results_path, checkpoint, workers=4, summarize=True, save=True):
+    """
+    Process recordings across a process pool. Results are written as they complete,
+    so an interrupted run loses at most the recordings still in flight.
+
+    Args:
+        recordings (list): (patient_name, path) tuples still to process.
+        results_path (str): JSON Lines file the results are appended to.
+        checkpoint (Checkpoint): Progress of the run, updated after each recording.
+        workers (int): Number of worker processes.
+        summarize (bool): Also summarize the transcripts.
+        save (bool): Save each summary to the patient's folder and the session store.
+
+    Returns:
+        tuple: Number of processed and failed recordings.
+    """
+    from backend.agents.audio_agent import save_summary_to_json, summary_file_name
+
+    os.makedirs(os.path.dirname(os.path.abspath(results_path)), exist_ok=True)
+    processed = failed = 0
+    with open(results_path, "a") as results, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {executor.submit(process_recording, patient_name, path, summarize): path
+                   for patient_name, path in recordings}
+        try:
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    logging.error(f"Failed to process {path}: {e}")
+                    checkpoint.mark_failed(path, str(e))
+                    continue
+
+                result["processed_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+                results.write(json.dumps(result) + "\n")
+                results.flush()
+                # Saved from this process only, so the summary files and trends have a single writer
+                if save and result["summary"] is not None:
+                    save_summary_to_json(result["summary"], file_name=summary_file_name(path),
+                                         transcript=result["transcript"], mood=result["mood"], audio_file=path)
+                checkpoint.mark_done(path, result["fingerprint"])
+                processed += 1
+                logging.info(f"[{processed + failed}/{len(futures)}] {path} done in {result['seconds']}s")
+        except KeyboardInterrupt:
+            logging.warning("Interrupted: finished recordings are checkpointed, rerun to resume.")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return processed, failed
 
 
 def main():
-    """Main function to run the psychology AI tool."""
-    print("Initializing Psychology AI Tool...")
-
-    # Initialize components
-    speech_to_text = SpeechToText()
-    nlp_processor = NLPProcessor()
-    mood_music = MoodMusic()
-    image_generator = ImageGenerator()
-    data_manager = DataManager()
-    ui = UI()
-
-    # Initialize the AudioTranscriber class
-    api_key = "YOUR_OPENAI_API_KEY"  # Make sure to replace with your actual API key
-    audio_transcriber = AudioTranscriber(api_key)
-
-    # Step 1: Real-time Speech-to-Text using the AudioTranscriber class
-    print("Starting real-time transcription...")
-    audio_transcriber.record_audio()  # Recording the audio
-    live_transcription = audio_transcriber.transcribe_audio()  # Transcribing the recorded audio
-
-    # Step 2: NLP Processing
-    print("Processing transcription for bullet points and emotion analysis...")
-    bullet_points = nlp_processor.summarize_conversation(live_transcription)
-    detected_emotion = nlp_processor.analyze_emotion(live_transcription)
-
-    # Step 3: Music Recommendation
-    print("Recommending music based on detected emotion...")
-    mood_music.recommend_and_play_music(detected_emotion)
-
-    # Step 4: Image Generation
-    print("Generating therapeutic image...")
-    therapeutic_image = image_generator.generate_image(live_transcription, detected_emotion)
-
-    # Step 5: Save Session Data
-    print("Saving session data...")
-    data_manager.save_session_data(live_transcription, bullet_points, detected_emotion, therapeutic_image)
-
-    # Step 6: Start User Interface
-    print("Launching User Interface...")
-    ui.start(live_transcription, bullet_points, detected_emotion, therapeutic_image)
+    parser = argparse.ArgumentParser(description="Transcribe and summarize archived session recordings.")
+    parser.add_argument("--records", default=RECORDS_PATH, help="Folder with one sub-folder of recordings per patient.")
+    parser.add_argument("--patient", help="Only process this patient's recordings.")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Worker processes.")
+    parser.add_argument("--results", default=os.path.join(BATCH_PATH, "results.jsonl"), help="JSON Lines results file.")
+    parser.add_argument("--checkpoint", default=os.path.join(BATCH_PATH, "checkpoint.json"), help="Checkpoint file.")
+    parser.add_argument("--no-summary", action="store_true", help="Only transcribe the recordings.")
+    parser.add_argument("--no-save", action="store_true", help="Do not save summaries to the session store.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and process everything again.")
+    parser.add_argument("--dry-run", action="store_true", help="List the recordings that would be processed.")
+    args = parser.parse_args()
+
+    configure_logging()
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.restart:
+        checkpoint.done, checkpoint.failed = {}, {}
+    recordings = discover_recordings(args.records, args.patient)
+    pending = [(name, path) for name, path in recordings if not checkpoint.is_done(path)]
+    print(f"{len(recordings)} recordings found, {len(recordings) - len(pending)} already processed, "
+          f"{len(pending)} to go.")
+    if args.dry_run or not pending:
+        for name, path in pending:
+            print(f"  {name}: {path}")
+        return
+
+    start = time.perf_counter()
+    processed, failed = run_batch(pending, args.results, checkpoint, workers=args.workers,
+                                  summarize=not args.no_summary, save=not args.no_save)
+    print(f"Processed {processed} recordings ({failed} failed) in {time.perf_counter() - start:.0f}s. "
+          f"Results: {args.results}")
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
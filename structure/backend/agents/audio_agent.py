@@ -1,22 +1,34 @@
-import openai
 import json
-import pyaudio
-import wave
 import datetime
 import os
 import logging
-import threading
-from dotenv import load_dotenv
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from backend.audio_encoding import UPLOAD_BUDGET_BYTES, encode_wav, iter_encoded_chunks
+from backend.cache import DiskCache, hash_audio, hash_bytes
+from backend.recording import Recording, WavRecorder
+from backend.sentiment import get_sentiment_backend
+from backend.session_store import get_session_store
+from backend.settings import OUTPUT_PATH, configure_logging
+from backend.summarization import (
+    SINGLE_PASS_MAX_TOKENS, IncrementalSummarizer, MapReduceSummarizer, build_summary_messages, estimate_tokens,
+    with_history,
+)
+from backend.streaming import MicrophoneSource, StreamingTranscriber
+from backend.telemetry import tracer
+from backend.transcription import ConcurrentTranscriber
+from integrations.openai_config import get_openai_config
 
-# Load environment variables
-load_dotenv()
-OUTPUT_PATH = os.getenv("OUTPUT_PATH", "../saved_outputs/")  # Default path if not provided
+
+# Bump when the summary prompt changes so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "2"
+TRANSCRIPTION_MODEL = "whisper-1"
+SUMMARY_MODEL = "gpt-4"
+UPLOAD_FORMAT = os.getenv("MOODSYNC_UPLOAD_FORMAT", "flac")  # "flac", "opus" or "wav"
+HISTORY_QUERY_CHARS = 8000  # part of the transcript used to look up relevant past sessions
 
 class AudioAgent:
-    def __init__(self, openai_api_key, patient_data, target_language="en"):
+    def __init__(self, openai_api_key, patient_data, target_language="en", cache=None, use_cache=True,
+                 openai_config=None, sentiment_backend=None, vector_index=None, use_history=True):
         """
         Initialize the AudioAgent with OpenAI API credentials and patient data.
         
@@ -24,200 +36,423 @@ class AudioAgent:
             openai_api_key (str): OpenAI API key.
             patient_data (dict): Patient-specific information for contextual summaries.
             target_language (str): Language to translate the transcription into (default is 'en' for English).
+            cache (DiskCache): Cache for transcripts and summaries (defaults to one under OUTPUT_PATH).
+            use_cache (bool): Set to False to always call the API.
+            openai_config (OpenAIConfig): OpenAI client to use (defaults to the shared client).
+            sentiment_backend (SentimentBackend): Local mood classifier (defaults to the configured backend).
+            vector_index (VectorIndex): Index of past sessions (defaults to the shared index).
+            use_history (bool): Add the most relevant notes from the patient's past sessions to summary prompts.
         """
         self.openai_api_key = openai_api_key
         self.patient_data = patient_data
         self.target_language = target_language
-        openai.api_key = self.openai_api_key
+        self._openai_config = openai_config
+        if use_cache and cache is None:
+            cache = DiskCache(os.path.join(OUTPUT_PATH, 'cache', 'audio_agent.sqlite'), ttl=30 * 24 * 3600)
+        self.cache = cache if use_cache else None
+        self.sentiment_backend = sentiment_backend or get_sentiment_backend()
+        self._vector_index = vector_index
+        self.use_history = use_history
+
+    @property
+    def openai_config(self):
+        """OpenAI client, resolved on first use (defaults to the shared client)."""
+        if self._openai_config is None:
+            self._openai_config = get_openai_config(self.openai_api_key)
+        return self._openai_config
+
+    @property
+    def vector_index(self):
+        """Index of past sessions, loaded on first use (defaults to the shared index)."""
+        if self._vector_index is None:
+            # NumPy is only loaded once history is actually needed
+            from backend.vector_index import get_vector_index
+
+            self._vector_index = get_vector_index()
+        return self._vector_index
 
-    def capture_audio(self, chunk_size=1024, rate=44100):
+    def _new_recording_path(self):
         """
-        Captures real-time audio from the microphone and saves it to a file.
-        The recording will stop when the user presses Enter.
+        Builds the path of a new recording in the patient's audio folder.
         
         Returns:
-            str: Path to the saved audio file.
+            str: Path for the new WAV file.
         """
-        audio_format = pyaudio.paInt16
-        channels = 1
-        
-        # Define dynamic output folder and file name
         output_folder = os.path.join(OUTPUT_PATH, 'audio_records', self.patient_data["name"])
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
-        
-        output_file = os.path.join(output_folder, f'{self.patient_data["name"]}_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.wav')
+        return os.path.join(output_folder, f'{self.patient_data["name"]}_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.wav')
 
-        audio = pyaudio.PyAudio()
-        stream = audio.open(format=audio_format, channels=channels, 
-                            rate=rate, input=True, frames_per_buffer=chunk_size)
+    def start_recording(self, source=None, chunk_size=1024, rate=44100, downsample=False):
+        """
+        Starts recording in the background. Frames are written to the WAV file
+        as they arrive, so memory use does not grow with the session length.
+        
+        Args:
+            source: Audio source to read from (defaults to the microphone).
+            chunk_size (int): Frames read from the microphone at a time.
+            rate (int): Microphone sample rate in Hz.
+            downsample (bool): Store 16 kHz mono audio, which is all Whisper needs.
+        
+        Returns:
+            Recording: Running recording; call stop() to finalize it and get the file path.
+        """
+        source = source or MicrophoneSource(rate=rate, chunk_size=chunk_size)
+        source.open()
+        recorder = WavRecorder(self._new_recording_path(), rate=source.rate, channels=source.channels,
+                               sampwidth=source.sampwidth, downsample=downsample)
+        return Recording(source, recorder).start()
 
-        frames = []
+    def capture_audio(self, chunk_size=1024, rate=44100, downsample=False):
+        """
+        Captures real-time audio from the microphone and saves it to a file.
+        The recording will stop when the user presses Enter.
         
-        # Start recording in a separate thread so we can listen for Enter to stop
-        def record_audio():
-            print("Recording... Press Enter to stop.")
-            while True:
-                data = stream.read(chunk_size)
-                frames.append(data)
-                if stop_recording_event.is_set():
-                    break
-
-        stop_recording_event = threading.Event()  # Event to control stopping the recording
-        recording_thread = threading.Thread(target=record_audio)
-        recording_thread.start()
+        Args:
+            chunk_size (int): Frames read from the microphone at a time.
+            rate (int): Microphone sample rate in Hz.
+            downsample (bool): Store 16 kHz mono audio, which is all Whisper needs.
+        
+        Returns:
+            str: Path to the saved audio file.
+        """
+        recording = self.start_recording(chunk_size=chunk_size, rate=rate, downsample=downsample)
+        print("Recording... Press Enter to stop.")
 
         # Wait for user to press Enter to stop the recording
         input("Press Enter to stop the recording...\n")
-        stop_recording_event.set()  # Signal to stop recording
-
-        # Clean up and save the audio
-        stream.stop_stream()
-        stream.close()
-        audio.terminate()
+        return recording.stop()
 
-        with wave.open(output_file, 'wb') as wf:
-            wf.setnchannels(channels)
-            wf.setsampwidth(audio.get_sample_size(audio_format))
-            wf.setframerate(rate)
-            wf.writeframes(b''.join(frames))
+    def stream_transcription(self, source=None, on_partial=None, window_duration=10.0, overlap_duration=1.0,
+                             record=True, downsample=False, mood_tracker=None, summarizer=None):
+        """
+        Starts live transcription: audio is transcribed in rolling, overlapping
+        windows while the recording is still running.
+        
+        Args:
+            source: Audio source to read from (defaults to the microphone).
+                A WavFileSource can be used to replay a recording instead.
+            on_partial (callable): Optional callback receiving (window_index, window_text, full_text).
+            window_duration (float): Length of each transcribed window in seconds.
+            overlap_duration (float): Overlap between consecutive windows in seconds.
+            record (bool): Also save the session audio to the patient's folder
+                (available as the transcriber's output_file).
+            downsample (bool): Store the recording as 16 kHz mono.
+            mood_tracker (MoodTracker): Tracker fed with each transcribed window, so the
+                music and lights follow the mood during the session.
+            summarizer (IncrementalSummarizer): Running summary fed with each transcribed window
+                (see incremental_summarizer).
+        
+        Returns:
+            StreamingTranscriber: Running transcriber; call stop() to end the recording
+            and get the full transcript, or read its text/partials while it runs.
+        """
+        source = source or MicrophoneSource()
+        source.open()
+        streamer = StreamingTranscriber(
+            self.transcribe_audio,
+            window_duration=window_duration,
+            overlap_duration=overlap_duration,
+        )
+        streamer.output_file = None
+        if record:
+            recorder = WavRecorder(self._new_recording_path(), rate=source.rate, channels=source.channels,
+                                   sampwidth=source.sampwidth, downsample=downsample)
+            streamer.add_frame_sink(recorder)
+            streamer.output_file = recorder.output_file
+        listeners = [listener for listener in (mood_tracker, summarizer) if listener is not None]
+        if listeners:
+            callback = on_partial
 
-        recording_thread.join()  # Ensure the recording thread finishes
-        logging.info(f"Recording saved to {output_file}")
-        return output_file
+            def on_partial(window_index, window_text, full_text):
+                for listener in listeners:
+                    listener.on_partial(window_index, window_text, full_text)
+                if callback is not None:
+                    callback(window_index, window_text, full_text)
+        return streamer.start(source, on_partial=on_partial)
 
-    def split_audio(self, audio_file, chunk_duration=300):
+    def split_audio(self, audio_file, max_bytes=UPLOAD_BUDGET_BYTES, upload_format=None):
         """
-        Splits an audio file into smaller chunks of a specified duration.
+        Splits an audio file into in-memory chunks ready for upload. Audio is converted to
+        16 kHz mono and compressed, and chunks are sized by their encoded bytes so each
+        stays under the API's upload limit. Chunks are cut on the quietest point near each
+        boundary, and nothing is written to disk, so concurrent sessions never clash on chunk files.
         
         Args:
             audio_file (str): Path to the input audio file.
-            chunk_duration (int): Duration of each chunk in seconds.
+            max_bytes (int): Maximum encoded size of each chunk.
+            upload_format (str): "flac", "opus" or "wav" (defaults to UPLOAD_FORMAT).
         
-        Returns:
-            list: Paths to the split audio chunks.
+        Yields:
+            io.BytesIO: Encoded audio chunks, ready for transcribe_audio.
         """
-        audio_chunks = []
         try:
-            with wave.open(audio_file, 'rb') as wf:
-                n_channels = wf.getnchannels()
-                sampwidth = wf.getsampwidth()
-                framerate = wf.getframerate()
-                n_frames = wf.getnframes()
-
-                chunk_frames = chunk_duration * framerate
-                total_chunks = n_frames // chunk_frames + (n_frames % chunk_frames > 0)
-                
-                output_folder = os.path.dirname(audio_file)
-                for i in range(total_chunks):
-                    chunk_file = os.path.join(output_folder, f"chunk_{i+1}.wav")
-                    with wave.open(chunk_file, 'wb') as chunk_wf:
-                        chunk_wf.setnchannels(n_channels)
-                        chunk_wf.setsampwidth(sampwidth)
-                        chunk_wf.setframerate(framerate)
-                        chunk_wf.writeframes(wf.readframes(chunk_frames))
-                    audio_chunks.append(chunk_file)
+            yield from iter_encoded_chunks(audio_file, fmt=upload_format or UPLOAD_FORMAT, max_bytes=max_bytes)
         except Exception as e:
             logging.error(f"Error splitting audio: {e}")
-        return audio_chunks
 
     def transcribe_audio(self, audio_file):
         """
         Transcribes audio to text using OpenAI's Whisper API.
         
+        Args:
+            audio_file (str or file-like): Path to an audio file or an in-memory audio buffer.
+        
         Returns:
             str: Transcribed text.
         """
+        with tracer.span("audio.transcribe", cache_hit=False) as span:
+            try:
+                cache_key = None
+                if self.cache is not None:
+                    cache_key = f"transcript:{TRANSCRIPTION_MODEL}:{hash_audio(audio_file)}"
+                    cached = self.cache.get(cache_key)
+                    if cached is not None:
+                        logging.info("Transcript found in cache.")
+                        span.set(cache_hit=True)
+                        return cached
+
+                # WAV input (recordings, live windows) is compressed before upload;
+                # chunks from split_audio are already encoded
+                name = audio_file if isinstance(audio_file, str) else getattr(audio_file, "name", "")
+                if not name or name.lower().endswith(".wav"):
+                    audio_file = encode_wav(audio_file, fmt=UPLOAD_FORMAT)
+                    span.set(upload_format=audio_file.name.rsplit(".", 1)[-1])
+
+                if hasattr(audio_file, "read"):
+                    logging.info(f"Transcribing {getattr(audio_file, 'name', 'audio buffer')}...")
+                    audio_file.seek(0)
+                    text = self.openai_config.transcribe(audio_file, model=TRANSCRIPTION_MODEL)
+                else:
+                    logging.info(f"Transcribing {audio_file}...")
+                    with open(audio_file, "rb") as file:
+                        text = self.openai_config.transcribe(file, model=TRANSCRIPTION_MODEL)
+                if cache_key is not None:
+                    self.cache.set(cache_key, text)
+                return text
+            except Exception as e:
+                logging.error(f"Error during transcription: {e}")
+                span.set(failed=True)
+                return None
+
+    def transcribe_long_audio(self, audio_file, max_workers=4, max_retries=3):
+        """
+        Transcribes a long audio file by splitting it into smaller chunks
+        and transcribing the chunks concurrently.
+        
+        Args:
+            audio_file (str): Path to the long audio file.
+            max_workers (int): Number of chunks transcribed in parallel.
+            max_retries (int): Number of retries for a failed chunk.
+        
+        Returns:
+            str: Combined transcription of all chunks.
+        """
+        with tracer.span("audio.transcribe_long", max_workers=max_workers) as span:
+            audio_chunks = self.split_audio(audio_file)
+            transcriber = ConcurrentTranscriber(
+                self.transcribe_audio, max_workers=max_workers, max_retries=max_retries
+            )
+            results = transcriber.transcribe(audio_chunks)
+            span.set(chunks=len(results))
+            full_transcription = [text for text in results if text]
+            return " ".join(full_transcription)
+
+    def analyze_sentiment(self, transcript):
+        """
+        Detects the mood of a transcript locally, without calling the API.
+        
+        Args:
+            transcript (str): Transcribed text.
+        
+        Returns:
+            list: [{"label": "calm" | "uplifting" | "neutral", "score": float}].
+        """
+        with tracer.span("audio.sentiment", backend=self.sentiment_backend.name) as span:
+            result = self.sentiment_backend.analyze(transcript)
+            span.set(label=result[0]["label"])
+        return result
+
+    def _chat(self, messages, model=SUMMARY_MODEL, **kwargs):
+        """
+        Sends chat messages to OpenAI through the shared client and returns the reply text.
+        
+        Returns:
+            str: Content of the first choice.
+        """
+        return self.openai_config.chat(model, messages, **kwargs)
+
+    def _stream_chat(self, messages, model=SUMMARY_MODEL, **kwargs):
+        """
+        Same as _chat, but yields the reply text piece by piece as it is generated.
+        """
+        return self.openai_config.stream_chat(model, messages, **kwargs)
+
+    def _patient_context(self):
+        return f"Patient Name: {self.patient_data.get('name', 'Unknown')}, " \
+               f"Age: {self.patient_data.get('age', 'Unknown')}, " \
+               f"History: {self.patient_data.get('history', 'No history provided')}"
+
+    def _saved_session_id(self, transcript):
+        # A transcript summarized again after it was saved must not be given its own notes as history
+        if not self.use_history or not self.patient_data.get("name"):
+            return None
         try:
-            logging.info(f"Transcribing {audio_file}...")
-            with open(audio_file, "rb") as file:
-                response = openai.Audio.transcribe(model="whisper-1", file=file)
-            return response.get("text", "")
+            return get_session_store().session_id_for(self.patient_data["name"], transcript)
         except Exception as e:
-            logging.error(f"Error during transcription: {e}")
+            logging.error(f"Error looking up the saved session: {e}")
             return None
 
-    def transcribe_long_audio(self, audio_file):
+    def history_notes(self, transcript, exclude_key=None):
         """
-        Transcribes a long audio file by splitting it into smaller chunks.
+        Looks up the parts of the patient's past sessions most relevant to a transcript.
+        The notes are capped to a fixed token budget, so prompts do not grow with the history.
         
         Args:
-            audio_file (str): Path to the long audio file.
+            transcript (str): Transcript of the current session.
+            exclude_key (str): History index key of the current session, if it was already saved.
         
         Returns:
-            str: Combined transcription of all chunks.
+            str: One line per past snippet, or "" when history is disabled or nothing relevant is found.
         """
-        audio_chunks = self.split_audio(audio_file)
-        full_transcription = []
-        for chunk in audio_chunks:
-            transcription = self.transcribe_audio(chunk)
-            if transcription:
-                full_transcription.append(transcription)
-        return " ".join(full_transcription)
-
-    def summarize_transcript(self, transcript):
+        if not self.use_history or not self.patient_data.get("name"):
+            return ""
+        with tracer.span("audio.history") as span:
+            try:
+                notes = self.vector_index.context(self.patient_data["name"], transcript[:HISTORY_QUERY_CHARS],
+                                                  exclude_key=exclude_key)
+            except Exception as e:
+                logging.error(f"Error retrieving session history: {e}")
+                span.set(failed=True)
+                return ""
+            span.set(snippets=len(notes.splitlines()), history_tokens=estimate_tokens(notes) if notes else 0)
+        return notes
+
+    def _summary_result(self, summary):
+        return {
+            "patient_name": self.patient_data.get("name"),
+            "date": str(datetime.date.today()),
+            "summary": summary
+        }
+
+    def incremental_summarizer(self, min_tokens=300, stream=True, on_token=None):
+        """
+        Creates a running summary for a session in progress. Pass it to stream_transcription
+        (or feed it with add()), then call finish_incremental_summary when the session ends.
+        Each update adds the notes from previous sessions relevant to it, as summarize_transcript does.
+        
+        Args:
+            min_tokens (int): New transcript tokens collected before the summary is updated.
+            stream (bool): Generate updates token by token, so the summary can be displayed as it is written.
+            on_token (callable): Called from the update thread with each piece of the updates made
+                during the session, as they are written.
+        
+        Returns:
+            IncrementalSummarizer: The running summary.
+        """
+        return IncrementalSummarizer(
+            self._chat, patient_context=self._patient_context(),
+            stream_fn=self._stream_chat if stream else None, min_tokens=min_tokens, on_token=on_token,
+            history_fn=self.history_notes,
+        )
+
+    def finish_incremental_summary(self, summarizer, on_token=None):
+        """
+        Folds the end of the session into a running summary.
+        
+        Args:
+            summarizer (IncrementalSummarizer): Summarizer created by incremental_summarizer.
+            on_token (callable): Called with each piece of the last update as it is written.
+        
+        Returns:
+            dict: A summary of the session in the same format as summarize_transcript, or None if it is empty.
+        """
+        with tracer.span("audio.summarize_incremental") as span:
+            summary = summarizer.update(on_token=on_token)
+            span.set(updates=summarizer.updates, prompt_tokens=summarizer.prompt_tokens,
+                     completion_tokens=summarizer.completion_tokens)
+        summarizer.close()
+        if not summary:
+            return None
+        return self._summary_result(summary)
+
+    def summarize_transcript(self, transcript, mode="auto"):
         """
         Summarizes the transcribed speech using OpenAI's GPT API, incorporating patient data.
+        Long transcripts are summarized in segments that are then merged (map-reduce).
     
         Args:
         transcript (str): Transcribed speech text.
+        mode (str): "single" for one request, "map_reduce" for segment-wise summarization,
+            or "auto" to pick map-reduce when the transcript exceeds the single-pass token budget.
         
         Returns:
         dict: A summary of the session in structured JSON format.
         """
-        patient_context = f"Patient Name: {self.patient_data.get('name', 'Unknown')}, " \
-                      f"Age: {self.patient_data.get('age', 'Unknown')}, " \
-                      f"History: {self.patient_data.get('history', 'No history provided')}"
-
-        preamble = (
-            "You are an assistant helping a therapist interpret patient speech. Your task is to summarize a therapy session transcript "
-            "into key insights and actionable points that reflect the patient's emotional state, challenges, progress, and any therapeutic "
-            "goals mentioned. The summary should be structured and follow the format provided below. Here are some examples of valid summaries:\n\n"
-            "Example 1:\n"
-            "Overview: The patient discussed their recent trauma-related anxiety and fears of relapse. They mentioned feeling overwhelmed and not "
-            "able to manage their emotions during stressful situations.\n"
-            "Key Insights: The patient needs further support in developing coping strategies for anxiety, specifically in high-stress environments.\n"
-            "Emotions or States: Anxiety, frustration, and hopelessness were identified.\n"
-            "Therapeutic Goals: To work on relaxation techniques, mindfulness, and building emotional resilience.\n\n"
-            "Example 2:\n"
-            "Overview: The patient shared their experience of improving their OCD symptoms but still struggles with intrusive thoughts and compulsive behaviors.\n"
-            "Key Insights: The patient showed progress in managing their symptoms, but they need more consistent practice with cognitive-behavioral techniques.\n"
-            "Emotions or States: Frustration with lack of full control over compulsions.\n"
-            "Therapeutic Goals: To continue implementing exposure therapy and work on resisting compulsive rituals.\n\n"
-            "Now, please summarize the following therapy session transcript into key insights and actionable points. Focus on the patient's emotional state, "
-            "challenges, progress, and any therapeutic goals mentioned.\n\n"
-            f"Patient Context:\n{patient_context}\n\n"
-            f"Transcript:\n{transcript}\n\n"
-            f"Provide the summary in the following structure:\n"
-            f"1. **Overview**: Main themes or issues discussed.\n"
-            f"2. **Key Insights**: Actionable takeaways.\n"
-            f"3. **Emotions or States**: Emotional states identified.\n"
-            f"4. **Therapeutic Goals**: Goals or actions for future sessions.\n"
-        )
+        patient_context = self._patient_context()
 
-        try:
-            logging.info("Generating summary...")
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[{"role": "system", "content": preamble}]
+        with tracer.span("audio.summarize", cache_hit=False) as span:
+            # Keyed on the transcript and patient details only, so a cached summary is found
+            # before any history is retrieved, whatever was saved since
+            cache_key = None
+            if self.cache is not None:
+                cache_key = f"summary:{SUMMARY_MODEL}:{SUMMARY_PROMPT_VERSION}:{hash_bytes(transcript, patient_context)}"
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logging.info("Summary found in cache.")
+                    span.set(cache_hit=True)
+                    return cached
+
+            patient_context = with_history(
+                patient_context, self.history_notes(transcript, exclude_key=self._saved_session_id(transcript))
             )
-            summary = response.choices[0].message['content'] if response else ""
-            return {
-                "patient_name": self.patient_data.get("name"),
-                "date": str(datetime.date.today()),
-                "summary": summary
-            }
-        except Exception as e:
-            logging.error(f"Error generating summary: {e}")
-            return None
 
-def save_summary_to_json(summary, file_name=None):
+            if mode == "auto":
+                mode = "map_reduce" if estimate_tokens(transcript) > SINGLE_PASS_MAX_TOKENS else "single"
+            span.set(mode=mode)
+
+            try:
+                logging.info("Generating summary...")
+                if mode == "map_reduce":
+                    summary = MapReduceSummarizer(self._chat).summarize(transcript, patient_context)
+                else:
+                    summary = self._chat(build_summary_messages(transcript, patient_context))
+                result = self._summary_result(summary)
+                if cache_key is not None and summary:
+                    self.cache.set(cache_key, result)
+                return result
+            except Exception as e:
+                logging.error(f"Error generating summary: {e}")
+                span.set(failed=True)
+                return None
+
+def summary_file_name(audio_file):
+    """
+    File name of a recording's saved summary. Saving a session again under the same name
+    replaces its summary file and leaves the session store, trends and history index unchanged.
+
+    Args:
+        audio_file (str): Path of the session recording.
+
+    Returns:
+        str: The summary file name, or None without a recording.
+    """
+    if not audio_file:
+        return None
+    return f"{os.path.splitext(os.path.basename(audio_file))[0]}_session_summary.json"
+
+
+def save_summary_to_json(summary, file_name=None, transcript=None, mood=None, audio_file=None):
     """
-    Save the session summary to a JSON file.
+    Save the session summary to a JSON file, index it in the session store and
+    add it to the patient's mood trend and history index.
     
     Args:
         summary (dict): The summary data to be saved.
         file_name (str): The name of the file to save the summary to (optional).
+        transcript (str): Session transcript, stored alongside the summary (optional).
+        mood (str): Detected mood of the session (optional).
+        audio_file (str): Path of the session recording (optional).
     """
     try:
         output_folder = os.path.join(OUTPUT_PATH, 'saved_summaries', summary["patient_name"])
@@ -233,8 +468,31 @@ def save_summary_to_json(summary, file_name=None):
         logging.info(f"Summary saved to {file_path}")
     except Exception as e:
         logging.error(f"Error saving summary to JSON: {e}")
+        return
+
+    try:
+        session_id = get_session_store().add_session(summary, transcript=transcript, mood=mood, audio_file=audio_file,
+                                                     source_path=os.path.abspath(file_path))
+        if session_id is not None:
+            # NumPy is only loaded once a session is actually saved
+            from backend.analytics import get_mood_analytics
+
+            get_mood_analytics().record_session(summary, sentiment_label=mood)
+    except Exception as e:
+        logging.error(f"Error indexing summary in the session store: {e}")
+        return
+
+    if session_id is not None:
+        try:
+            from backend.vector_index import get_vector_index
+
+            get_vector_index().add_session(summary, transcript=transcript, key=session_id)
+        except Exception as e:
+            logging.error(f"Error adding the session to the history index: {e}")
 
 if __name__ == "__main__":
+    configure_logging()
+
     # Sample patient data (this would normally come from your application context)
     patient_data = {
         "name": "John Doe",
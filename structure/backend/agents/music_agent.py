@@ -1,12 +1,44 @@
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
-from dotenv import load_dotenv
-import openai
 import os 
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from backend.cache import TTLCache
+from backend.settings import configure_logging
+from backend.telemetry import tracer
+from integrations.openai_config import get_openai_config
+
+# Curated queries used when the LLM is slow or unavailable
+FALLBACK_QUERIES = {
+    "calm": "relaxing piano instrumental",
+    "uplifting": "uplifting feel good acoustic playlist",
+    "neutral": "lo-fi chill background playlist",
+    "happy": "happy upbeat pop playlist",
+    "sad": "gentle comforting acoustic songs",
+    "anxious": "calming ambient meditation music",
+    "stressed": "stress relief nature sounds and soft piano",
+    "angry": "soothing instrumental for calming down",
+    "tired": "soft morning acoustic playlist",
+    "motivated": "motivational upbeat instrumental playlist",
+}
+DEFAULT_FALLBACK_QUERY = FALLBACK_QUERIES["calm"]
+
+
+def normalize_emotion(emotion_or_state):
+    """
+    Normalize a detected emotion so equivalent labels share one cache entry.
+
+    Returns:
+        str: Lower-cased emotion without punctuation or extra whitespace.
+    """
+    return " ".join(re.sub(r"[^\w\s-]", " ", str(emotion_or_state).lower()).split())
 
 
 class MusicAgent:
-    def __init__(self, spotify_client_id, spotify_client_secret, redirect_uri, openai_api_key):
+    def __init__(self, spotify_client_id, spotify_client_secret, redirect_uri, openai_api_key, openai_config=None,
+                 query_ttl=24 * 3600, query_cache_size=256, query_store=None, query_timeout=2.0,
+                 spotify_client=None, search_ttl=6 * 3600, device_ttl=30.0):
         """
         Initialize the MusicAgent with Spotify and OpenAI credentials.
 
@@ -15,21 +47,109 @@ class MusicAgent:
             spotify_client_secret (str): Spotify Client Secret.
             redirect_uri (str): Redirect URI for Spotify OAuth.
             openai_api_key (str): OpenAI API key.
+            openai_config (OpenAIConfig): OpenAI client to use (defaults to the shared client).
+            query_ttl (float): Seconds a generated query is reused for the same emotion.
+            query_cache_size (int): Maximum number of emotions kept in memory.
+            query_store (DiskCache): Optional persistent store for generated queries.
+            query_timeout (float): Seconds to wait for the LLM before using the curated fallback query.
+            spotify_client: Spotify client to use instead of building a spotipy client (e.g. a fake for tests).
+            search_ttl (float): Seconds a resolved search result is reused for the same query.
+            device_ttl (float): Seconds the active-device list is reused before it is refreshed.
         """
-        # Spotify Initialization
-        self.sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-            client_id=spotify_client_id,
-            client_secret=spotify_client_secret,
-            redirect_uri=redirect_uri,
-            scope="user-read-playback-state user-modify-playback-state"
-        ))
+        # Spotify Initialization: the spotipy client and its OAuth manager are built on first use
+        self._spotify_credentials = (spotify_client_id, spotify_client_secret, redirect_uri)
+        self._sp = spotify_client
+        self._client_lock = threading.Lock()
+
+        # Spotify caches: resolved search results, active devices and per-mood candidate pools
+        self.search_cache = TTLCache(max_entries=512, ttl=search_ttl)
+        self.device_ttl = device_ttl
+        self._devices = []
+        self._devices_updated = 0.0
+        self._devices_lock = threading.Lock()
+        self._device_refresher = None
+        self._stop_refresh = threading.Event()
+        self.mood_pools = {}
+        self._pool_positions = {}
+
+        # OpenAI Initialization (deferred to the first generated query)
+        self.openai_api_key = openai_api_key
+        self._openai_config = openai_config
+
+        # Emotion -> query memoization
+        self.query_cache = TTLCache(max_entries=query_cache_size, ttl=query_ttl)
+        self.query_store = query_store
+        self.query_timeout = query_timeout
+        self._query_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="music-query")
+        self._pending_queries = {}  # emotion -> future of the LLM request in flight
+        self._pending_lock = threading.Lock()
+
+    @property
+    def sp(self):
+        """Spotify client, created (and authenticated) on first use."""
+        if self._sp is None:
+            with self._client_lock:
+                if self._sp is None:
+                    import spotipy
+                    from spotipy.oauth2 import SpotifyOAuth
+
+                    client_id, client_secret, redirect_uri = self._spotify_credentials
+                    with tracer.span("spotify.connect"):
+                        self._sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
+                            client_id=client_id,
+                            client_secret=client_secret,
+                            redirect_uri=redirect_uri,
+                            scope="user-read-playback-state user-modify-playback-state"
+                        ))
+        return self._sp
+
+    @property
+    def openai_config(self):
+        """OpenAI client, resolved on first use (defaults to the shared client)."""
+        if self._openai_config is None:
+            self._openai_config = get_openai_config(self.openai_api_key)
+        return self._openai_config
+
+    def _request_music_query(self, emotion):
+        """
+        Ask OpenAI GPT for a Spotify search query and remember it.
+
+        Returns:
+            str: Spotify search query.
+        """
+        messages = [
+            {"role": "system", "content": "You are an assistant that helps recommend Spotify music based on emotional states."},
+            {"role": "user", "content": f"The detected emotion is: {emotion}. Suggest a query Spotify can use to play relevant music. Provide a detailed suggestion, such as 'uplifting pop playlist' or 'relaxing piano instrumental'."}
+        ]
+        try:
+            query = self.openai_config.chat(
+                model="gpt-3.5-turbo",
+                messages=messages,
+                max_tokens=100
+            ).strip()
+            if query:
+                self.query_cache.set(emotion, query)
+                if self.query_store is not None:
+                    self.query_store.set(f"music_query:{emotion}", query)
+            return query
+        finally:
+            with self._pending_lock:
+                self._pending_queries.pop(emotion, None)
 
-        # OpenAI Initialization
-        openai.api_key = openai_api_key
+    def _query_request(self, emotion):
+        """Future of the LLM request for an emotion, shared by every caller while it is in flight."""
+        with self._pending_lock:
+            future = self._pending_queries.get(emotion)
+            if future is None:
+                future = self._query_executor.submit(self._request_music_query, emotion)
+                self._pending_queries[emotion] = future
+        return future
 
     def generate_music_query(self, emotion_or_state):
         """
         Use OpenAI GPT to generate a Spotify search query based on the detected emotion or state.
+        Queries are memoized per normalized emotion; if the LLM is slow or fails, a curated
+        fallback query is returned while the LLM answer is stored for next time.
 
         Args:
             emotion_or_state (str): The detected emotion or state (e.g., "calm", "anxious", "motivated").
@@ -37,22 +157,164 @@ class MusicAgent:
         Returns:
             str: Spotify search query (e.g., a song, artist, genre, or mood).
         """
-        try:
-            messages = [
-                {"role": "system", "content": "You are an assistant that helps recommend Spotify music based on emotional states."},
-                {"role": "user", "content": f"The detected emotion is: {emotion_or_state}. Suggest a query Spotify can use to play relevant music. Provide a detailed suggestion, such as 'uplifting pop playlist' or 'relaxing piano instrumental'."}
-            ]
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=100
-            )
-            query = response.choices[0].message["content"].strip()
-            print(f"OpenAI Generated Query: {query}")
-            return query
-        except Exception as e:
-            print(f"Error generating music query: {e}")
+        emotion = normalize_emotion(emotion_or_state)
+        with tracer.span("music.generate_query", emotion=emotion, cache_hit=True) as span:
+            query = self.query_cache.get(emotion)
+            if query is None and self.query_store is not None:
+                query = self.query_store.get(f"music_query:{emotion}")
+                if query is not None:
+                    self.query_cache.set(emotion, query)
+            if query is not None:
+                return query
+
+            span.set(cache_hit=False)
+            fallback = FALLBACK_QUERIES.get(emotion, DEFAULT_FALLBACK_QUERY)
+            future = self._query_request(emotion)
+            try:
+                query = future.result(timeout=self.query_timeout)
+                print(f"OpenAI Generated Query: {query}")
+                return query or fallback
+            except FutureTimeoutError:
+                # The request keeps running and fills the cache when it completes
+                print(f"Music query for '{emotion}' is slow, using fallback: {fallback}")
+                span.set(fallback=True)
+                return fallback
+            except Exception as e:
+                print(f"Error generating music query: {e}")
+                span.set(fallback=True)
+                return fallback
+
+    def warm_query_cache(self, emotions=FALLBACK_QUERIES):
+        """
+        Generate and cache queries for known emotions in the background, so the first
+        mood change of the day does not wait on the LLM.
+
+        Args:
+            emotions (iterable): Emotions to prepare (defaults to the curated ones).
+        """
+        for emotion in emotions:
+            emotion = normalize_emotion(emotion)
+            if emotion not in self.query_cache:
+                self._query_request(emotion)
+
+    @staticmethod
+    def _describe(kind, item):
+        if kind == "playlist":
+            return f"playlist: {item['name']}"
+        return f"{kind}: {item['name']} by {item['artists'][0]['name']}"
+
+    def search_spotify(self, search_query, limit=1):
+        """
+        Search Spotify for tracks, playlists and albums matching a query. Results are cached per query.
+
+        Args:
+            search_query (str): Spotify search query.
+            limit (int): Maximum number of results per type.
+
+        Returns:
+            list: Candidates as dicts with "uri", "kind" and "description", best first
+            (tracks, then playlists, then albums).
+        """
+        cache_key = (search_query, limit)
+        candidates = self.search_cache.get(cache_key)
+        if candidates is not None:
+            return candidates
+
+        print(f"Searching Spotify for: {search_query}...")
+        with tracer.span("spotify.search"):
+            results = self.sp.search(q=search_query, limit=limit, type='track,playlist,album')
+        candidates = []
+        for kind in ("track", "playlist", "album"):
+            # Spotify sometimes returns null entries in playlist results
+            for item in (results.get(f"{kind}s") or {}).get("items") or []:
+                if item:
+                    candidates.append({"uri": item["uri"], "kind": kind, "description": self._describe(kind, item)})
+        self.search_cache.set(cache_key, candidates)
+        return candidates
+
+    def refresh_devices(self):
+        """
+        Fetch the list of available Spotify devices.
+
+        Returns:
+            list: Device dicts as returned by the Spotify API.
+        """
+        with tracer.span("spotify.devices"):
+            devices = self.sp.devices().get("devices", [])
+        with self._devices_lock:
+            self._devices = devices
+            self._devices_updated = time.monotonic()
+        return devices
+
+    def get_active_device(self):
+        """
+        Return the device to play on, refreshing the cached device list only when it is stale.
+
+        Returns:
+            dict: The preferred device (the active one if any), or None.
+        """
+        with self._devices_lock:
+            devices = self._devices
+            fresh = devices and time.monotonic() - self._devices_updated < self.device_ttl
+        if not fresh:
+            devices = self.refresh_devices()
+        if not devices:
             return None
+        return next((d for d in devices if d.get("is_active")), devices[0])
+
+    def start_device_refresh(self, interval=None):
+        """
+        Keep the cached device list up to date from a background thread.
+
+        Args:
+            interval (float): Seconds between refreshes (defaults to half the device TTL).
+        """
+        if self._device_refresher is not None and self._device_refresher.is_alive():
+            return
+        interval = interval or self.device_ttl / 2
+        self._stop_refresh.clear()
+
+        def refresh_loop():
+            while not self._stop_refresh.is_set():
+                try:
+                    self.refresh_devices()
+                except Exception as e:
+                    print(f"Error refreshing Spotify devices: {e}")
+                self._stop_refresh.wait(interval)
+
+        self._device_refresher = threading.Thread(target=refresh_loop, daemon=True, name="spotify-devices")
+        self._device_refresher.start()
+
+    def stop_device_refresh(self):
+        self._stop_refresh.set()
+
+    def close(self):
+        """Stop the device refresh thread and drop the query requests that have not started."""
+        self.stop_device_refresh()
+        self._query_executor.shutdown(wait=False, cancel_futures=True)
+
+    def start_playback(self, candidate):
+        """
+        Play a search candidate on the active device with a single Spotify call.
+
+        Args:
+            candidate (dict): Candidate returned by search_spotify.
+
+        Returns:
+            bool: True if playback was started.
+        """
+        device = self.get_active_device()
+        if device is None:
+            print("No active Spotify devices found. Please start Spotify on a device.")
+            return False
+        print(f"Playing {candidate['description']} on device: {device['name']}")
+        with tracer.span("spotify.start_playback", kind=candidate["kind"]):
+            # Tracks are played as a list of URIs, playlists and albums as a context
+            if candidate["kind"] == "track":
+                self.sp.start_playback(device_id=device["id"], uris=[candidate["uri"]])
+            else:
+                self.sp.start_playback(device_id=device["id"], context_uri=candidate["uri"])
+        return True
 
     def play_music_on_spotify(self, search_query):
         """
@@ -62,46 +324,66 @@ class MusicAgent:
             search_query (str): Spotify search query.
         """
         try:
-            print(f"Searching Spotify for: {search_query}...")
-            # Search Spotify for relevant content
-            results = self.sp.search(q=search_query, limit=1, type='track,playlist,album')
-
-            # Determine the URI of the best result
-            uri = None
-            if results['tracks']['items']:
-                track = results['tracks']['items'][0]
-                uri = track['uri']
-                print(f"Playing track: {track['name']} by {track['artists'][0]['name']}")
-            elif results['playlists']['items']:
-                playlist = results['playlists']['items'][0]
-                uri = playlist['uri']
-                print(f"Playing playlist: {playlist['name']}")
-            elif results['albums']['items']:
-                album = results['albums']['items'][0]
-                uri = album['uri']
-                print(f"Playing album: {album['name']} by {album['artists'][0]['name']}")
-            else:
+            candidates = self.search_spotify(search_query)
+            if not candidates:
                 print("No relevant content found on Spotify.")
                 return
-
-            # Get active Spotify devices
-            devices = self.sp.devices()
-            if devices['devices']:
-                device_id = devices['devices'][0]['id']
-                print(f"Playing on device: {devices['devices'][0]['name']}")
-                self.sp.start_playback(device_id=device_id, context_uri=uri)
-            else:
-                print("No active Spotify devices found. Please start Spotify on a device.")
+            self.start_playback(candidates[0])
         except Exception as e:
             print(f"Error playing music on Spotify: {e}")
 
+    def prefetch_mood_pools(self, emotions=FALLBACK_QUERIES, pool_size=5, background=True):
+        """
+        Resolve a pool of candidate tracks and playlists for each known mood, so that a
+        mood switch only needs the playback call.
+
+        Args:
+            emotions (iterable): Moods to prepare (defaults to the curated ones).
+            pool_size (int): Number of results fetched per type for each mood.
+            background (bool): Run the prefetch in a background thread.
+        """
+        def prefetch():
+            for emotion in emotions:
+                emotion = normalize_emotion(emotion)
+                try:
+                    query = self.generate_music_query(emotion)
+                    candidates = self.search_spotify(query, limit=pool_size)
+                    if candidates:
+                        self.mood_pools[emotion] = candidates
+                except Exception as e:
+                    print(f"Error prefetching music for '{emotion}': {e}")
+
+        if background:
+            threading.Thread(target=prefetch, daemon=True, name="spotify-prefetch").start()
+        else:
+            prefetch()
+
+    def _next_from_pool(self, emotion):
+        """Rotate through a mood's prefetched candidates so repeated switches vary the music."""
+        pool = self.mood_pools.get(emotion)
+        if not pool:
+            return None
+        position = self._pool_positions.get(emotion, 0)
+        self._pool_positions[emotion] = (position + 1) % len(pool)
+        return pool[position % len(pool)]
+
+    @tracer.traced("music.play_for_emotion")
     def play_music_based_on_emotion(self, emotion_or_state):
         """
         End-to-end function to generate a recommendation, search Spotify, and play the music.
+        Moods with a prefetched pool start playing with a single Spotify call.
 
         Args:
             emotion_or_state (str): Detected emotion or state (e.g., "happy", "stressed").
         """
+        candidate = self._next_from_pool(normalize_emotion(emotion_or_state))
+        if candidate is not None:
+            try:
+                self.start_playback(candidate)
+            except Exception as e:
+                print(f"Error playing music on Spotify: {e}")
+            return
+
         # Generate a music query using OpenAI
         search_query = self.generate_music_query(emotion_or_state)
         if search_query:
@@ -110,7 +392,7 @@ class MusicAgent:
 
 
 if __name__ == "__main__":
-    load_dotenv()
+    configure_logging()
 
     # Spotify and OpenAI API credentials
     spotify_client_id = os.getenv("SPOTIFY_CLIENT_ID")
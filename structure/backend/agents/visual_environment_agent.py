@@ -1,38 +1,93 @@
-from phue import Bridge
-import matplotlib.pyplot as plt
+import threading
+
+from backend.lighting import LightingEngine
+from backend.telemetry import tracer
+from backend.visual_assets import VisualAssetCache
+
+# Image shown for each emotional state
+VISUALS = {
+    "calm": "calm_landscape.jpg",
+    "uplifting": "sunrise.jpg",
+    "neutral": "neutral_background.jpg"
+}
 
 class VisualLightAgent:
-    def __init__(self, bridge_ip):
-        self.bridge = Bridge(bridge_ip)
-        self.bridge.connect()
+    def __init__(self, bridge_ip, bridge=None, group_id=0, transition_time=1.0, scenes=None,
+                 asset_dir="", preload_visuals=True):
+        """
+        Args:
+            bridge_ip (str): IP address of the Hue bridge.
+            bridge: Bridge object to use instead of connecting to bridge_ip (e.g. a fake bridge).
+            group_id (int): Hue group of the therapy room (0 means all lights).
+            transition_time (float): Duration of color fades in seconds.
+            scenes (dict): Optional Hue scene id per emotional state, recalled instead of a plain color.
+            asset_dir (str): Folder containing the mood images.
+            preload_visuals (bool): Decode the mood images in the background at startup.
+        """
+        # The bridge connection and lighting engine are set up on the first lighting change
+        self.bridge_ip = bridge_ip
+        self._bridge = bridge
+        self._lighting = None
+        self._lighting_options = {"group_id": group_id, "transition_time": transition_time}
+        self._connect_lock = threading.Lock()
+        self.scenes = scenes or {}
+        self.visuals = VisualAssetCache(VISUALS, asset_dir=asset_dir)
+        self.current_visual = None
+        if preload_visuals:
+            self.visuals.preload()
+
+    @property
+    def bridge(self):
+        """Hue bridge, connected on first use."""
+        if self._bridge is None:
+            with self._connect_lock:
+                if self._bridge is None:
+                    from phue import Bridge
 
+                    with tracer.span("hue.connect"):
+                        bridge = Bridge(self.bridge_ip)
+                        bridge.connect()
+                    self._bridge = bridge
+        return self._bridge
+
+    @property
+    def lighting(self):
+        if self._lighting is None:
+            bridge = self.bridge
+            with self._connect_lock:
+                if self._lighting is None:
+                    self._lighting = LightingEngine(bridge, **self._lighting_options)
+        return self._lighting
+
+    @tracer.traced("visual.adjust_lighting")
     def adjust_lighting(self, emotional_state):
         """
-        Adjust lighting based on emotional state.
+        Adjust lighting based on emotional state. The bridge fades to the new color
+        in one group action when possible, skipping lights that already show it.
         """
         state_to_color = {
             "calm": [0.4, 0.5],  # Calming blue
             "uplifting": [0.5, 0.4],  # Uplifting yellow
             "neutral": [0.33, 0.33]  # Neutral white
         }
+        if emotional_state in self.scenes:
+            self.lighting.activate_scene(self.scenes[emotional_state])
+            return
         color = state_to_color.get(emotional_state, [0.33, 0.33])
-        for light in self.bridge.lights:
-            light.xy = color
+        self.lighting.apply(color)
 
+    @tracer.traced("visual.generate_visual")
     def generate_visual(self, emotional_state):
         """
-        Display visual content based on emotional state.
+        Select the visual content for an emotional state. Images are decoded and
+        downscaled once and kept in memory, and nothing is rendered here, so the call
+        never blocks the pipeline; the dashboard displays current_visual.
+
+        Returns:
+            bytes: Encoded image for the state, or None if it could not be loaded.
         """
-        visuals = {
-            "calm": "calm_landscape.jpg",
-            "uplifting": "sunrise.jpg",
-            "neutral": "neutral_background.jpg"
-        }
-        image_path = visuals.get(emotional_state, "neutral_background.jpg")
-        try:
-            img = plt.imread(image_path)
-            plt.imshow(img)
-            plt.axis('off')
-            plt.show()
-        except Exception as e:
-            print(f"Error displaying visual: {e}")
+        visual = self.visuals.get_for_state(emotional_state)
+        if visual is None:
+            print(f"Error displaying visual: no image available for '{emotional_state}'")
+        self.current_visual = visual
+        return visual
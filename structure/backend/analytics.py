@@ -0,0 +1,214 @@
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+from backend.cache import file_lock, save_npz
+from backend.emotions import EMOTIONS, find_emotions
+from backend.session_store import summary_text
+from backend.settings import OUTPUT_PATH
+from backend.summarization import parse_summary_sections
+
+ANALYTICS_PATH = os.path.join(OUTPUT_PATH, "analytics")
+
+# One-hot dimensions for the orchestrator's sentiment label
+SENTIMENT_LABELS = ("calm", "uplifting", "neutral")
+DIMENSIONS = tuple(EMOTIONS) + tuple(f"sentiment_{label}" for label in SENTIMENT_LABELS)
+
+
+def emotion_vector(summary, sentiment_label=None):
+    """
+    Structured emotion vector of a session, from the summary's "Emotions or States" section
+    (the whole summary if that section is missing) and the sentiment label.
+
+    Args:
+        summary (dict): Summary as returned by AudioAgent.summarize_transcript.
+        sentiment_label (str): Mood label from the sentiment backend (calm, uplifting or neutral).
+
+    Returns:
+        np.ndarray: float32 vector over DIMENSIONS; emotion entries are 1.0 when mentioned.
+    """
+    text = summary.get("emotions_or_states") or parse_summary_sections(summary_text(summary)).get("emotions_or_states")
+    text = text or summary_text(summary)
+    vector = np.zeros(len(DIMENSIONS), dtype=np.float32)
+    for emotion in find_emotions(text):
+        vector[DIMENSIONS.index(emotion)] = 1.0
+    if sentiment_label and sentiment_label.lower() in SENTIMENT_LABELS:
+        vector[len(EMOTIONS) + SENTIMENT_LABELS.index(sentiment_label.lower())] = 1.0
+    return vector
+
+
+class PatientTrend:
+    def __init__(self, dates=None, vectors=None, ema=None, alpha=0.3):
+        """
+        Per-patient emotion history with running aggregates.
+
+        Args:
+            dates (np.ndarray): datetime64[D] date of each session.
+            vectors (np.ndarray): (sessions, dimensions) emotion vectors, in the order sessions were saved.
+            ema (np.ndarray): Exponential moving average of the vectors.
+            alpha (float): Weight of the newest session in the moving average.
+        """
+        dates = dates if dates is not None else np.empty(0, dtype="datetime64[D]")
+        vectors = vectors if vectors is not None else np.empty((0, len(DIMENSIONS)), dtype=np.float32)
+        # Preallocated buffers grown by doubling, so adding a session does not copy the history
+        self._count = len(dates)
+        self._dates = np.array(dates, dtype="datetime64[D]")
+        self._vectors = np.array(vectors, dtype=np.float32).reshape(-1, len(DIMENSIONS))
+        self.ema = ema if ema is not None else np.zeros(len(DIMENSIONS), dtype=np.float32)
+        self.alpha = alpha
+
+    @property
+    def dates(self):
+        return self._dates[:self._count]
+
+    @property
+    def vectors(self):
+        return self._vectors[:self._count]
+
+    @property
+    def totals(self):
+        return self.vectors.sum(axis=0)
+
+    def add(self, date, vector):
+        """Append one session and update the moving average without revisiting older sessions."""
+        self.ema = vector.copy() if not self._count else self.alpha * vector + (1 - self.alpha) * self.ema
+        if self._count == len(self._vectors):
+            capacity = max(8, 2 * self._count)
+            self._dates = np.resize(self._dates, capacity)
+            self._vectors = np.resize(self._vectors, (capacity, len(DIMENSIONS)))
+        self._dates[self._count] = np.datetime64(date, "D")
+        self._vectors[self._count] = vector
+        self._count += 1
+
+    def rolling_mean(self, window=5):
+        """
+        Mean emotion vector over the last `window` sessions at each session, in date order.
+
+        Returns:
+            tuple: (dates, (sessions, dimensions) array).
+        """
+        order = np.argsort(self.dates, kind="stable")
+        vectors = self.vectors[order]
+        cumulative = np.cumsum(np.vstack([np.zeros((1, vectors.shape[1]), dtype=np.float32), vectors]), axis=0)
+        counts = np.minimum(np.arange(1, len(vectors) + 1), window)[:, np.newaxis]
+        starts = np.arange(1, len(vectors) + 1) - counts[:, 0]
+        return self.dates[order], (cumulative[1:] - cumulative[starts]) / counts
+
+    def top_emotions(self, n=5):
+        """
+        Returns:
+            list: (emotion, share of sessions) for the most frequent emotions.
+        """
+        if not len(self.vectors):
+            return []
+        shares = self.vectors[:, :len(EMOTIONS)].mean(axis=0)
+        order = np.argsort(shares)[::-1][:n]
+        return [(DIMENSIONS[i], float(shares[i])) for i in order if shares[i] > 0]
+
+
+class MoodAnalytics:
+    def __init__(self, folder=ANALYTICS_PATH, alpha=0.3):
+        """
+        Keeps a PatientTrend per patient up to date as sessions are saved, persisted
+        as one .npz file per patient so loading a long history is a single read.
+
+        Args:
+            folder (str): Folder of the per-patient .npz files.
+            alpha (float): Weight of the newest session in the moving average.
+        """
+        self.folder = folder
+        self.alpha = alpha
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self._trends = {}
+        self._lock = threading.Lock()
+
+    def _path(self, patient_name):
+        return os.path.join(self.folder, f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', patient_name)}.npz")
+
+    def _load(self, patient_name, reload=False):
+        # Reload when another process (e.g. a job worker) saved a newer version of the file
+        path = self._path(patient_name)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        cached = self._trends.get(patient_name)
+        if cached is not None and cached[1] == mtime and not reload:
+            return cached[0]
+        trend = PatientTrend(alpha=self.alpha)
+        if mtime is not None:
+            with np.load(path) as data:
+                if tuple(data["dimensions"]) == DIMENSIONS:
+                    trend = PatientTrend(data["dates"], data["vectors"], data["ema"], self.alpha)
+                else:
+                    logging.warning(f"Emotion dimensions changed, ignoring {path}; run backfill() to rebuild it.")
+        self._trends[patient_name] = (trend, mtime)
+        return trend
+
+    def _save(self, patient_name, trend):
+        path = self._path(patient_name)
+        save_npz(path, dates=trend.dates, vectors=trend.vectors, ema=trend.ema, dimensions=np.array(DIMENSIONS))
+        self._trends[patient_name] = (trend, os.path.getmtime(path))
+
+    def record_session(self, summary, sentiment_label=None):
+        """
+        Add a saved session to its patient's trend. Safe to call from several processes:
+        the patient's file is re-read and rewritten under a file lock.
+
+        Args:
+            summary (dict): Summary with "patient_name" and "date".
+            sentiment_label (str): Mood label of the session (optional).
+
+        Returns:
+            np.ndarray: The session's emotion vector.
+        """
+        vector = emotion_vector(summary, sentiment_label)
+        patient_name = summary.get("patient_name", "Unknown")
+        with self._lock, file_lock(self._path(patient_name)):
+            trend = self._load(patient_name, reload=True)
+            trend.add(summary.get("date") or np.datetime64("today"), vector)
+            self._save(patient_name, trend)
+        return vector
+
+    def trend(self, patient_name):
+        """
+        Returns:
+            PatientTrend: The patient's emotion history (empty if the patient has no sessions).
+        """
+        with self._lock:
+            return self._load(patient_name)
+
+    def backfill(self, session_store, patient_name=None):
+        """
+        Rebuild trends from the sessions already in a SessionStore (e.g. after importing
+        existing folders). Only needed once; later sessions are added by record_session.
+
+        Returns:
+            int: Number of sessions processed.
+        """
+        sessions = session_store.sessions(patient_name=patient_name, limit=-1)
+        trends = {}
+        for session in sorted(sessions, key=lambda s: (s["date"], s["created_at"])):
+            trend = trends.setdefault(session["patient_name"], PatientTrend(alpha=self.alpha))
+            trend.add(session["date"], emotion_vector(session["summary"], session["mood"]))
+        with self._lock:
+            for name, trend in trends.items():
+                with file_lock(self._path(name)):
+                    self._save(name, trend)
+        return len(sessions)
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_mood_analytics(folder=None):
+    """
+    Returns the process-wide MoodAnalytics, creating it on first use.
+    """
+    global _analytics
+    with _analytics_lock:
+        if _analytics is None:
+            _analytics = MoodAnalytics(folder or ANALYTICS_PATH)
+        return _analytics
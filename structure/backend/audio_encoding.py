@@ -0,0 +1,236 @@
+import io
+import logging
+import shutil
+import subprocess
+import wave
+
+from backend.audio_processing import find_quietest_frame, iter_wav_chunks, wav_bytes
+from backend.recording import WHISPER_SAMPLE_RATE, Resampler
+from backend.telemetry import tracer
+
+# Whisper rejects uploads above 25 MB; keep some room for the multipart overhead
+WHISPER_MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+UPLOAD_BUDGET_BYTES = WHISPER_MAX_UPLOAD_BYTES - 1024 * 1024
+
+# File extension of each upload format (Whisper detects the format from the file name)
+EXTENSIONS = {"flac": "flac", "opus": "ogg", "wav": "wav"}
+
+# Rough encoded size of 16 kHz mono speech, used to size the first chunk before
+# the actual compression ratio of the recording is known
+ENCODED_BYTES_PER_SECOND = {"flac": 20000, "opus": 3000, "wav": 2 * WHISPER_SAMPLE_RATE}
+
+OPUS_BITRATE = "24k"
+
+_encoders = {}
+
+
+def _soundfile_encoder(fmt):
+    try:
+        import soundfile
+    except ImportError:
+        return None
+    format_name, subtype = {"flac": ("FLAC", "PCM_16"), "opus": ("OGG", "OPUS")}[fmt]
+    if subtype not in soundfile.available_subtypes(format_name):
+        return None
+
+    def encode(pcm, rate):
+        buffer = io.BytesIO()
+        with soundfile.SoundFile(buffer, "w", samplerate=rate, channels=1, format=format_name, subtype=subtype) as file:
+            file.buffer_write(pcm, dtype="int16")
+        return buffer.getvalue()
+
+    return encode
+
+
+def _ffmpeg_encoder(fmt):
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    codec = {"flac": ["-c:a", "flac", "-f", "flac"],
+             "opus": ["-c:a", "libopus", "-b:a", OPUS_BITRATE, "-application", "voip", "-f", "ogg"]}[fmt]
+
+    def encode(pcm, rate):
+        command = [ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "s16le", "-ar", str(rate), "-ac", "1",
+                   "-i", "pipe:0", *codec, "pipe:1"]
+        return subprocess.run(command, input=pcm, capture_output=True, check=True).stdout
+
+    return encode
+
+
+def get_encoder(fmt):
+    """
+    Find an encoder for an upload format: soundfile first, then the ffmpeg executable,
+    then plain WAV when neither can produce the format.
+
+    Args:
+        fmt (str): "flac", "opus" or "wav".
+
+    Returns:
+        tuple: (format actually produced, encode(pcm, rate) -> bytes).
+    """
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown upload format {fmt!r}; choose from {sorted(EXTENSIONS)}")
+    if fmt not in _encoders:
+        encoder = None
+        if fmt != "wav":
+            encoder = _soundfile_encoder(fmt) or _ffmpeg_encoder(fmt)
+            if encoder is None:
+                logging.warning(f"No {fmt} encoder available (install soundfile or ffmpeg), uploading WAV.")
+        if encoder is None:
+            _encoders[fmt] = ("wav", lambda pcm, rate: wav_bytes(pcm, 1, 2, rate).getvalue())
+        else:
+            _encoders[fmt] = (fmt, encoder)
+    return _encoders[fmt]
+
+
+def encode_pcm(pcm, rate=WHISPER_SAMPLE_RATE, fmt="flac", name="audio"):
+    """
+    Encode 16-bit mono PCM for upload.
+
+    Args:
+        pcm (bytes): Little-endian 16-bit mono PCM.
+        rate (int): Sample rate in Hz.
+        fmt (str): Upload format ("flac", "opus" or "wav").
+        name (str): File name without extension.
+
+    Returns:
+        io.BytesIO: Encoded audio named with the extension of the produced format.
+    """
+    produced, encoder = get_encoder(fmt)
+    with tracer.span("audio.encode", format=produced, bytes_in=len(pcm)) as span:
+        buffer = io.BytesIO(encoder(bytes(pcm), rate))
+        span.set(bytes_out=len(buffer.getbuffer()))
+    buffer.name = f"{name}.{EXTENSIONS[produced]}"
+    return buffer
+
+
+def decode_to_pcm(audio_file):
+    """
+    Decode an encoded upload back to 16-bit mono PCM (for checks and round-trip tests).
+
+    Returns:
+        tuple: (pcm bytes, sample rate).
+    """
+    name = getattr(audio_file, "name", "")
+    audio_file.seek(0)
+    if name.endswith(".wav"):
+        with wave.open(audio_file, "rb") as wf:
+            return wf.readframes(wf.getnframes()), wf.getframerate()
+    try:
+        import soundfile
+    except ImportError:
+        soundfile = None
+    if soundfile is not None:
+        with soundfile.SoundFile(audio_file) as file:
+            return bytes(file.buffer_read(dtype="int16")), file.samplerate
+    command = [shutil.which("ffmpeg") or "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+               "-f", "s16le", "-ac", "1", "-ar", str(WHISPER_SAMPLE_RATE), "pipe:1"]
+    return subprocess.run(command, input=audio_file.read(), capture_output=True, check=True).stdout, WHISPER_SAMPLE_RATE
+
+
+def encode_wav(audio_file, fmt="flac", name=None, block_frames=1 << 16):
+    """
+    Downmix and resample a whole WAV file to 16 kHz mono and encode it for upload.
+
+    Args:
+        audio_file (str or file-like): WAV file.
+        fmt (str): Upload format.
+        name (str): File name without extension (defaults to the input's name).
+        block_frames (int): Frames converted at a time.
+
+    Returns:
+        io.BytesIO: Encoded audio, or the input unchanged if it is not 16-bit PCM.
+    """
+    source_name = audio_file if isinstance(audio_file, str) else getattr(audio_file, "name", "audio.wav")
+    name = name or source_name.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+    if hasattr(audio_file, "seek"):
+        audio_file.seek(0)
+    with wave.open(audio_file, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            logging.warning("Only 16-bit WAV can be re-encoded, uploading the original file.")
+            if hasattr(audio_file, "seek"):
+                audio_file.seek(0)
+                return audio_file
+            with open(audio_file, "rb") as file:
+                buffer = io.BytesIO(file.read())
+            buffer.name = source_name
+            return buffer
+        resampler = Resampler(wf.getframerate(), WHISPER_SAMPLE_RATE, wf.getnchannels())
+        pcm = bytearray()
+        for frames in iter(lambda: wf.readframes(block_frames), b""):
+            pcm += resampler.process(frames)
+    return encode_pcm(pcm, WHISPER_SAMPLE_RATE, fmt, name)
+
+
+def iter_encoded_chunks(audio_file, fmt="flac", max_bytes=UPLOAD_BUDGET_BYTES, max_duration=1200.0,
+                        search_duration=10.0, window_ms=50, block_frames=1 << 16):
+    """
+    Split a WAV file into encoded upload chunks sized by their encoded bytes.
+
+    Audio is converted to 16 kHz mono as it is read. Each chunk covers as much audio as is
+    expected to fit in max_bytes, based on the compression ratio observed on the previous
+    chunks, and is cut on the quietest point near its end. A chunk that still encodes too
+    large is shortened before being yielded.
+
+    Args:
+        audio_file (str or file-like): WAV file to split.
+        fmt (str): Upload format ("flac", "opus" or "wav").
+        max_bytes (int): Maximum encoded size of a chunk.
+        max_duration (float): Maximum duration of a chunk in seconds, which bounds memory use
+            and keeps several chunks available for concurrent transcription.
+        search_duration (float): How far back from the boundary to look for silence, in seconds.
+        window_ms (int): Length of the window used to measure loudness, in milliseconds.
+        block_frames (int): Frames read from the file at a time.
+
+    Yields:
+        io.BytesIO: Encoded chunks named ``chunk_<n>.<ext>``.
+    """
+    produced, _ = get_encoder(fmt)
+    with wave.open(audio_file, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            # The resampler only handles 16-bit PCM: fall back to WAV chunks sized by raw bytes
+            raw_bytes_per_second = wf.getnchannels() * wf.getsampwidth() * wf.getframerate()
+            yield from iter_wav_chunks(audio_file, chunk_duration=min(max_duration, max_bytes / raw_bytes_per_second))
+            return
+
+        rate = WHISPER_SAMPLE_RATE
+        resampler = Resampler(wf.getframerate(), rate, wf.getnchannels())
+        bytes_per_second = ENCODED_BYTES_PER_SECOND[produced]
+        search_frames = int(search_duration * rate)
+        window_frames = max(1, int(rate * window_ms / 1000))
+        pcm = bytearray()
+        eof = False
+        index = 0
+        while True:
+            target_frames = int(min(max_duration, 0.95 * max_bytes / bytes_per_second) * rate)
+            while len(pcm) // 2 < target_frames and not eof:
+                frames = wf.readframes(block_frames)
+                if frames:
+                    pcm += resampler.process(frames)
+                else:
+                    eof = True
+            n_frames = len(pcm) // 2
+            if not n_frames:
+                break
+
+            cut = n_frames
+            if n_frames >= target_frames:
+                cut = target_frames
+                tail_frames = min(search_frames, cut // 2)
+                if tail_frames > window_frames:
+                    tail_start = cut - tail_frames
+                    offset = find_quietest_frame(memoryview(pcm)[tail_start * 2:cut * 2], 2, 2, window_frames)
+                    if offset is not None:
+                        cut = tail_start + offset
+
+            index += 1
+            while True:
+                chunk = encode_pcm(pcm[:cut * 2], rate, fmt, f"chunk_{index}")
+                size = len(chunk.getbuffer())
+                if size <= max_bytes or cut <= rate:
+                    break
+                cut = int(cut * max_bytes / size * 0.9)
+            # Learn the recording's compression ratio for the next chunks
+            bytes_per_second = max(size / (cut / rate), 1.0)
+            del pcm[:cut * 2]
+            yield chunk
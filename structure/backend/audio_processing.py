@@ -0,0 +1,129 @@
+import io
+import sys
+import wave
+from array import array
+
+# array typecodes for the PCM sample widths we can analyse
+SAMPLE_TYPECODES = {1: "B", 2: "h", 4: "i"}
+
+
+def wav_bytes(frames, n_channels, sampwidth, framerate):
+    """
+    Wrap raw PCM frames in a WAV header.
+
+    Args:
+        frames (bytes-like): Raw PCM frames.
+        n_channels (int): Number of channels.
+        sampwidth (int): Sample width in bytes.
+        framerate (int): Sample rate in Hz.
+
+    Returns:
+        io.BytesIO: In-memory WAV file positioned at the start.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(n_channels)
+        wf.setsampwidth(sampwidth)
+        wf.setframerate(framerate)
+        wf.writeframes(frames)
+    buffer.seek(0)
+    return buffer
+
+
+def frame_energy(frames, sampwidth):
+    """
+    Compute the mean squared amplitude of a block of PCM frames.
+
+    Returns:
+        float: Energy of the block, or None if the sample width is not supported.
+    """
+    typecode = SAMPLE_TYPECODES.get(sampwidth)
+    if typecode is None or len(frames) < sampwidth:
+        return None
+    samples = array(typecode, bytes(frames[:len(frames) - len(frames) % sampwidth]))
+    if sys.byteorder == "big" and sampwidth > 1:
+        samples.byteswap()
+    if sampwidth == 1:
+        # 8-bit WAV samples are unsigned and centred on 128
+        return sum((s - 128) ** 2 for s in samples) / len(samples)
+    return sum(s * s for s in samples) / len(samples)
+
+
+def find_quietest_frame(frames, frame_size, sampwidth, window_frames, step_frames=None):
+    """
+    Find the start of the quietest window in a block of PCM frames.
+
+    Args:
+        frames (memoryview): Raw PCM frames to search.
+        frame_size (int): Size of one frame in bytes (channels * sample width).
+        sampwidth (int): Sample width in bytes.
+        window_frames (int): Length of the analysis window in frames.
+        step_frames (int): Distance between two analysed windows (defaults to the window length).
+
+    Returns:
+        int: Frame offset of the middle of the quietest window, or None if it cannot be analysed.
+    """
+    step_frames = step_frames or window_frames
+    n_frames = len(frames) // frame_size
+    best_offset, best_energy = None, None
+    for start in range(0, n_frames - window_frames + 1, step_frames):
+        energy = frame_energy(frames[start * frame_size:(start + window_frames) * frame_size], sampwidth)
+        if energy is None:
+            return None
+        # Prefer later windows on ties so chunks stay close to the target length
+        if best_energy is None or energy <= best_energy:
+            best_offset, best_energy = start + window_frames // 2, energy
+    return best_offset
+
+
+def iter_wav_chunks(audio_file, chunk_duration=300, search_duration=10.0, window_ms=50):
+    """
+    Split a WAV file into in-memory chunks, cutting on the quietest point
+    near each chunk boundary so words are not split across chunks.
+
+    Args:
+        audio_file (str or file-like): WAV file to split.
+        chunk_duration (float): Maximum duration of each chunk in seconds.
+        search_duration (float): How far back from the boundary to look for silence, in seconds.
+        window_ms (int): Length of the window used to measure loudness, in milliseconds.
+
+    Yields:
+        io.BytesIO: A complete WAV file for each chunk, named ``chunk_<n>.wav``.
+    """
+    with wave.open(audio_file, "rb") as wf:
+        n_channels = wf.getnchannels()
+        sampwidth = wf.getsampwidth()
+        framerate = wf.getframerate()
+        frame_size = n_channels * sampwidth
+
+        chunk_frames = max(1, int(chunk_duration * framerate))
+        search_frames = min(int(search_duration * framerate), chunk_frames // 2)
+        window_frames = max(1, int(framerate * window_ms / 1000))
+
+        carry = b""
+        index = 0
+        while True:
+            needed = chunk_frames - len(carry) // frame_size
+            block = carry + wf.readframes(needed) if needed > 0 else carry
+            if not block:
+                break
+            view = memoryview(block)
+            n_frames = len(view) // frame_size
+
+            cut = n_frames
+            if n_frames == chunk_frames and search_frames > window_frames:
+                # Full chunk: look for silence in its tail before cutting
+                tail_start = n_frames - search_frames
+                offset = find_quietest_frame(view[tail_start * frame_size:], frame_size, sampwidth, window_frames)
+                if offset is not None:
+                    cut = tail_start + offset
+
+            index += 1
+            chunk = wav_bytes(view[:cut * frame_size], n_channels, sampwidth, framerate)
+            chunk.name = f"chunk_{index}.wav"
+            carry = bytes(view[cut * frame_size:])
+            view.release()
+            yield chunk
+
+            if n_frames < chunk_frames and not carry:
+                break
@@ -0,0 +1,232 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def hash_bytes(*parts):
+    """
+    Compute a SHA-256 digest over one or more bytes or str parts.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(part)
+        digest.update(b"\x00")  # separator so ("ab", "c") and ("a", "bc") differ
+    return digest.hexdigest()
+
+
+def hash_audio(audio_file, block_size=1 << 20):
+    """
+    Compute the content hash of an audio file path or in-memory buffer.
+
+    Returns:
+        str: Hex SHA-256 digest of the audio bytes.
+    """
+    digest = hashlib.sha256()
+    if hasattr(audio_file, "getbuffer"):
+        digest.update(audio_file.getbuffer())
+    elif hasattr(audio_file, "read"):
+        position = audio_file.tell()
+        audio_file.seek(0)
+        for block in iter(lambda: audio_file.read(block_size), b""):
+            digest.update(block)
+        audio_file.seek(position)
+    else:
+        with open(audio_file, "rb") as file:
+            for block in iter(lambda: file.read(block_size), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Exclusive lock shared by every process of the machine, held on a companion lock file
+    (path + ".lock") for the duration of the with block.
+    """
+    with open(path + ".lock", "a+b") as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 s
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def save_npz(path, **arrays):
+    """
+    Atomically replace an .npz file: arrays are written to a unique temporary file in the
+    same folder, then moved over path, so readers never see a partial file.
+    """
+    import numpy as np
+
+    folder, name = os.path.split(path)
+    fd, temporary = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=folder or ".")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(temporary, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary)
+        raise
+
+
+class DiskCache:
+    def __init__(self, path, max_entries=5000, ttl=None):
+        """
+        Persistent key/value cache stored in a SQLite file, with
+        least-recently-used and time-to-live eviction.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            max_entries (int): Maximum number of entries kept; the least recently used are evicted first.
+            ttl (float): Lifetime of an entry in seconds (None keeps entries until evicted by size).
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key, default=None):
+        """
+        Returns:
+            The cached value, or default if the key is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return default
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return default
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(value)
+
+    def set(self, key, value):
+        """Store a JSON-serializable value, evicting old entries if the cache is full."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl,))
+        if self.max_entries is not None:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, max_entries=256, ttl=None):
+        """
+        Thread-safe in-memory cache with least-recently-used and time-to-live eviction.
+
+        Args:
+            max_entries (int): Maximum number of entries kept.
+            ttl (float): Lifetime of an entry in seconds (None keeps entries until evicted by size).
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, created_at = entry
+            if self.ttl is not None and time.monotonic() - created_at > self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,70 @@
+import re
+
+# Emotion vocabulary, with the word stems that count towards each emotion. Shared by the session
+# store (emotion filter) and the mood analytics (session vectors); kept free of NumPy so the
+# session store can use it without loading the analytics.
+EMOTIONS = {
+    "anxiety": ("anxi", "worr", "nervous", "panic", "fear", "afraid", "scared", "apprehens"),
+    "sadness": ("sad", "depress", "grief", "griev", "unhappy", "low mood", "melanchol"),
+    "hopelessness": ("hopeless", "despair", "helpless", "worthless"),
+    "anger": ("anger", "angry", "irritab", "resent", "rage", "hostil"),
+    "frustration": ("frustrat", "annoy"),
+    "stress": ("stress", "overwhelm", "pressure", "tension", "tense"),
+    "distress": ("distress", "upset", "disturb", "perturb", "troubled"),
+    "guilt": ("guilt", "shame", "ashamed", "regret", "embarrass"),
+    "loneliness": ("lonel", "isolat", "alone", "abandon"),
+    "inadequacy": ("inadequa", "insecur", "self-doubt", "self worth", "self-worth", "low self-esteem", "inferior"),
+    "confusion": ("confus", "uncertain", "ambivalen", "conflicted"),
+    "fatigue": ("tired", "fatigue", "exhaust", "drained", "burnout", "burn out"),
+    "empathy": ("empath", "compassion", "concern"),
+    "calm": ("calm", "relax", "peace", "relief", "relieved", "serene"),
+    "hope": ("hope", "optimis", "encourag", "confiden", "resilien"),
+    "joy": ("joy", "happy", "happi", "excite", "cheer", "grateful", "gratitude", "pride", "proud"),
+    "motivation": ("motivat", "determin", "engaged", "eager"),
+}
+
+
+def _stem_pattern(emotion, stem):
+    # A stem does not match where a longer stem of another emotion does ("hope" in "hopeless")
+    longer = [other[len(stem):] for name, stems in EMOTIONS.items() if name != emotion
+              for other in stems if other.startswith(stem)]
+    return re.escape(stem) + "".join(f"(?!{re.escape(rest)})" for rest in longer)
+
+
+_EMOTION_PATTERNS = {
+    emotion: re.compile(r"\b(?:" + "|".join(_stem_pattern(emotion, stem) for stem in stems) + r")[\w-]*",
+                        re.IGNORECASE)
+    for emotion, stems in EMOTIONS.items()
+}
+# A negation shortly before a mention ("no longer anxious", "not sad", "without fear", "didn't feel angry")
+_NEGATION = re.compile(r"(?:\b(?:not|no|never|without|denies|denied)|n't)(?:\s+[\w-]+){0,2}\s+$", re.IGNORECASE)
+_NEGATION_WINDOW = 40  # characters before a mention searched for a negation
+
+
+def _negated(text, start):
+    return _NEGATION.search(text[max(0, start - _NEGATION_WINDOW):start]) is not None
+
+
+def find_emotions(text):
+    """
+    Emotions of the vocabulary mentioned in a text. Mentions right after a negation
+    ("no longer anxious", "without fear") do not count.
+
+    Args:
+        text (str): Text to search, e.g. a summary's "Emotions or States" section.
+
+    Returns:
+        list: Emotion names, in vocabulary order.
+    """
+    text = text or ""
+    return [emotion for emotion, pattern in _EMOTION_PATTERNS.items()
+            if any(not _negated(text, match.start()) for match in pattern.finditer(text))]
+
+
+def emotion_name(term):
+    """
+    Vocabulary emotion a term refers to ("anxious" -> "anxiety"), or the lower-cased term
+    for words outside the vocabulary (e.g. sentiment labels such as "uplifting").
+    """
+    found = find_emotions(term)
+    return found[0] if found else term.lower()
@@ -0,0 +1,452 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from backend.cache import hash_bytes
+from backend.settings import OUTPUT_PATH, configure_logging
+from backend.telemetry import tracer
+
+JOB_DB_PATH = os.path.join(OUTPUT_PATH, "jobs", "jobs.sqlite")
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def job_id_for(kind, payload):
+    """
+    Deterministic job id, so submitting the same work twice returns the existing job.
+
+    Returns:
+        str: Hex digest of the job kind and canonical payload.
+    """
+    return hash_bytes(kind, json.dumps(payload, sort_keys=True, default=str))[:32]
+
+
+class JobQueue:
+    def __init__(self, db_path=JOB_DB_PATH, lease_duration=300.0):
+        """
+        Persistent job queue stored in SQLite, shared by the dashboard, the orchestrator
+        and any number of worker processes.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+            lease_duration (float): Seconds a worker owns a job without reporting progress.
+                Jobs whose lease expires (e.g. because the worker crashed) are picked up again.
+        """
+        self.db_path = db_path
+        self.lease_duration = lease_duration
+        folder = os.path.dirname(db_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+                "progress REAL NOT NULL DEFAULT 0, message TEXT, result TEXT, error TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL DEFAULT 3, "
+                "worker TEXT, lease_expires REAL, created_at REAL NOT NULL, updated_at REAL NOT NULL, spans TEXT)"
+            )
+            # Databases created before spans were stored on jobs
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "spans" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN spans TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def _connect(self):
+        # One connection per thread; SQLite handles locking between processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def submit(self, kind, payload, job_id=None, max_attempts=3):
+        """
+        Add a job unless one with the same id already exists.
+
+        Args:
+            kind (str): Handler name (e.g. "transcribe", "summarize", "curate", "session").
+            payload (dict): JSON-serializable job arguments.
+            job_id (str): Explicit id (defaults to a hash of kind and payload).
+            max_attempts (int): Attempts before the job is marked as failed.
+
+        Returns:
+            str: The job id.
+        """
+        job_id = job_id or job_id_for(kind, payload)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, kind, payload, status, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, default=str), QUEUED, max_attempts, now, now),
+            )
+        return job_id
+
+    def get(self, job_id):
+        """
+        Returns:
+            dict: Job fields with payload and result decoded, or None if the job does not exist.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list(self, status=None, limit=100):
+        with self._connect() as conn:
+            if status:
+                rows = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?",
+                                    (status, limit)).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def claim(self, worker_id, kinds=None):
+        """
+        Atomically take the oldest queued job, or a running job whose lease expired.
+
+        Args:
+            worker_id (str): Identifier of the claiming worker.
+            kinds (list): Only claim jobs of these kinds (None for any).
+
+        Returns:
+            dict: The claimed job, or None if there is nothing to do.
+        """
+        now = time.time()
+        query = ("SELECT * FROM jobs WHERE (status = ? OR (status = ? AND lease_expires < ?))")
+        params = [QUEUED, RUNNING, now]
+        if kinds:
+            query += f" AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        query += " ORDER BY created_at LIMIT 1"
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            if row["status"] == RUNNING:
+                logging.warning(f"Recovering job {row['id']} abandoned by worker {row['worker']}")
+            if row["attempts"] >= row["max_attempts"]:
+                conn.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                             (FAILED, row["error"] or "worker lost", now, row["id"]))
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, lease_expires = ?, "
+                "updated_at = ? WHERE id = ?",
+                (RUNNING, worker_id, now + self.lease_duration, now, row["id"]),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return _row_to_job(row)
+
+    def report_progress(self, job_id, progress=None, message=None, worker_id=None):
+        """
+        Record progress (0 to 1) of a running job and extend its lease.
+
+        Args:
+            job_id (str): The job.
+            progress (float): Progress to record (None to only extend the lease).
+            message (str): Optional description of the current step.
+            worker_id (str): Only update the job while this worker still owns it.
+
+        Returns:
+            bool: False if the job is no longer running (for this worker).
+        """
+        now = time.time()
+        query = ("UPDATE jobs SET progress = COALESCE(?, progress), message = COALESCE(?, message), "
+                 "lease_expires = ?, updated_at = ? WHERE id = ? AND status = ?")
+        params = [progress, message, now + self.lease_duration, now, job_id, RUNNING]
+        if worker_id is not None:
+            query += " AND worker = ?"
+            params.append(worker_id)
+        with self._connect() as conn:
+            return conn.execute(query, params).rowcount > 0
+
+    def _spans_with(self, conn, job_id, spans):
+        # Spans of earlier attempts are kept, so failed attempts still show in the timing panel
+        row = conn.execute("SELECT spans FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        previous = json.loads(row["spans"]) if row and row["spans"] else []
+        return json.dumps(previous + list(spans or []), default=str)
+
+    def complete(self, job_id, result, worker_id, spans=None):
+        """
+        Store the result of a job. Ignored if the job is no longer running for this worker
+        (e.g. its lease expired and another worker claimed it).
+
+        Args:
+            spans (list): Telemetry spans of the attempt (Span.to_dict() output), added to the job's spans.
+
+        Returns:
+            bool: True if the result was stored.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, progress = 1, error = NULL, lease_expires = NULL, "
+                "spans = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (DONE, json.dumps(result, default=str), self._spans_with(conn, job_id, spans), time.time(), job_id,
+                 worker_id, RUNNING),
+            ).rowcount
+        if not updated:
+            logging.warning(f"Discarding result of job {job_id}: no longer owned by worker {worker_id}")
+        return updated > 0
+
+    def fail(self, job_id, error, worker_id, spans=None):
+        """
+        Record a failed attempt; the job is queued again until it runs out of attempts.
+        Ignored if the job is no longer running for this worker.
+
+        Args:
+            spans (list): Telemetry spans of the attempt (Span.to_dict() output), added to the job's spans.
+
+        Returns:
+            bool: True if the failure was recorded.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END, "
+                "error = ?, lease_expires = NULL, spans = ?, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (QUEUED, FAILED, str(error), self._spans_with(conn, job_id, spans), time.time(), job_id, worker_id,
+                 RUNNING),
+            ).rowcount
+        if not updated:
+            logging.warning(f"Ignoring failure of job {job_id}: no longer owned by worker {worker_id}")
+        return updated > 0
+
+    def retry(self, job_id):
+        """Queue a failed job again with a fresh set of attempts."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, progress = 0, error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job_id, FAILED),
+            )
+
+    def wait(self, job_id, timeout=None, poll_interval=0.5):
+        """
+        Block until a job is done or failed.
+
+        Returns:
+            dict: The finished job, or the job in its current state if the timeout expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in (DONE, FAILED):
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
+
+
+class _Transaction:
+    """Context manager committing on success and rolling back on error (autocommit connection)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn.in_transaction:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def _row_to_job(row):
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    job["spans"] = json.loads(job["spans"]) if job["spans"] else []
+    return job
+
+
+# Job handlers. Each takes the job payload and a progress callback and returns a JSON-serializable result.
+
+def _audio_agent(payload):
+    from backend.agents.audio_agent import AudioAgent
+
+    return AudioAgent(openai_api_key=os.getenv("OPENAI_API_KEY"), patient_data=payload.get("patient_data", {}))
+
+
+def _music_agent():
+    # Built once per worker process and reused by later jobs
+    from backend.registry import get_registry
+
+    return get_registry().get("music")
+
+
+def handle_transcribe(payload, progress):
+    audio_agent = _audio_agent(payload)
+    progress(0.05, "transcribing")
+    transcript = audio_agent.transcribe_long_audio(payload["audio_file"])
+    if not transcript:
+        raise RuntimeError("transcription returned no text")
+    # Detected here so the session can be saved with its mood
+    progress(0.9, "detecting mood")
+    return {"transcript": transcript, "mood": audio_agent.analyze_sentiment(transcript)[0]["label"]}
+
+
+def handle_summarize(payload, progress):
+    audio_agent = _audio_agent(payload)
+    progress(0.05, "summarizing")
+    summary = audio_agent.summarize_transcript(payload["transcript"])
+    if summary is None:
+        raise RuntimeError("summary generation failed")
+    return summary
+
+
+def handle_curate(payload, progress):
+    _music_agent().play_music_based_on_emotion(payload["emotion"])
+    return {"emotion": payload["emotion"]}
+
+
+def handle_session(payload, progress):
+    """
+    Transcribe a recording, summarize it, detect its mood and save the session,
+    reporting progress between the steps. Music is curated when an emotion is given.
+    """
+    audio_agent = _audio_agent(payload)
+    progress(0.05, "transcribing")
+    transcript = audio_agent.transcribe_long_audio(payload["audio_file"])
+    if not transcript:
+        raise RuntimeError("transcription returned no text")
+    progress(0.6, "summarizing")
+    summary = audio_agent.summarize_transcript(transcript)
+    if summary is None:
+        raise RuntimeError("summary generation failed")
+    mood = payload.get("emotion") or audio_agent.analyze_sentiment(transcript)[0]["label"]
+    result = {"transcript": transcript, "summary": summary, "mood": mood}
+    from backend.agents.audio_agent import save_summary_to_json, summary_file_name
+
+    # Named after the recording, so a job that is claimed again does not save the session twice
+    save_summary_to_json(summary, file_name=summary_file_name(payload["audio_file"]), transcript=transcript,
+                         mood=mood, audio_file=payload["audio_file"])
+    if payload.get("emotion"):
+        progress(0.9, "curating music")
+        handle_curate({"emotion": payload["emotion"]}, progress)
+    return result
+
+
+HANDLERS = {
+    "transcribe": handle_transcribe,
+    "summarize": handle_summarize,
+    "curate": handle_curate,
+    "session": handle_session,
+}
+
+
+def worker_loop(db_path=JOB_DB_PATH, kinds=None, poll_interval=1.0, stop_event=None, worker_id=None):
+    """
+    Claim and run jobs until stop_event is set.
+
+    Args:
+        db_path (str): Job database path.
+        kinds (list): Only run jobs of these kinds (None for all registered handlers).
+        poll_interval (float): Seconds to sleep when the queue is empty.
+        stop_event: threading/multiprocessing Event used to stop the loop.
+        worker_id (str): Identifier recorded on claimed jobs.
+    """
+    queue = JobQueue(db_path)
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    kinds = kinds or list(HANDLERS)
+    logging.info(f"Worker {worker_id} started for {kinds}")
+    while stop_event is None or not stop_event.is_set():
+        job = queue.claim(worker_id, kinds)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        logging.info(f"Worker {worker_id} running {job['kind']} job {job['id']} (attempt {job['attempts']})")
+
+        def progress(value, message=None, job_id=job["id"]):
+            queue.report_progress(job_id, value, message, worker_id=worker_id)
+
+        # Renew the lease while the handler runs, so a long step is not mistaken for a lost worker
+        done = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(queue, job["id"], worker_id, done),
+                                     daemon=True, name="job-heartbeat")
+        heartbeat.start()
+        # The job's spans are stored with it, so the submitter can show them under its own session id
+        with tracer.session(job["payload"].get("session_id")), tracer.collect() as spans:
+            try:
+                with tracer.span(f"job.{job['kind']}", attempt=job["attempts"]):
+                    result = HANDLERS[job["kind"]](job["payload"], progress)
+            except Exception as e:
+                logging.error(f"Job {job['id']} failed: {e}")
+                done.set()
+                queue.fail(job["id"], f"{e.__class__.__name__}: {e}", worker_id, [s.to_dict() for s in spans])
+            else:
+                done.set()
+                queue.complete(job["id"], result, worker_id, [s.to_dict() for s in spans])
+        heartbeat.join()
+
+
+def _heartbeat(queue, job_id, worker_id, done):
+    while not done.wait(queue.lease_duration / 3):
+        if not queue.report_progress(job_id, worker_id=worker_id):
+            logging.warning(f"Job {job_id} is no longer owned by worker {worker_id}")
+            return
+
+
+class WorkerPool:
+    def __init__(self, db_path=JOB_DB_PATH, processes=2, kinds=None):
+        """
+        Pool of worker processes consuming the job queue.
+
+        Args:
+            db_path (str): Job database path.
+            processes (int): Number of worker processes.
+            kinds (list): Job kinds the workers accept (None for all).
+        """
+        self.db_path = db_path
+        self.processes = processes
+        self.kinds = kinds
+        self._stop_event = multiprocessing.Event()
+        self._workers = []
+
+    def start(self):
+        for _ in range(self.processes):
+            worker = multiprocessing.Process(
+                target=worker_loop,
+                kwargs={"db_path": self.db_path, "kinds": self.kinds, "stop_event": self._stop_event},
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def stop(self, timeout=10):
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Run MoodSync job workers.")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes.")
+    parser.add_argument("--db", default=JOB_DB_PATH, help="Path of the job database.")
+    parser.add_argument("--kinds", nargs="*", help="Job kinds to accept (default: all).")
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.db, processes=args.workers, kinds=args.kinds).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.telemetry import submit_with_context, tracer
+
+
+class LightingEngine:
+    def __init__(self, bridge, group_id=0, transition_time=1.0, max_workers=8, state_ttl=10.0, tolerance=0.005):
+        """
+        Apply colors to Hue lights with as few bridge requests as possible.
+
+        Lights already showing the target color are skipped. When every light of the group
+        needs the change, one group action updates them all at once; otherwise the remaining
+        lights are updated concurrently. Fades are delegated to the bridge's transition time.
+
+        Args:
+            bridge: phue.Bridge (or any object with get_api, set_group and set_light).
+            group_id (int): Hue group covering the room (0 is the bridge's all-lights group).
+            transition_time (float): Fade duration in seconds, performed by the bridge.
+            max_workers (int): Maximum number of concurrent per-light requests.
+            state_ttl (float): Seconds the known light states are trusted before re-reading the bridge.
+            tolerance (float): Maximum xy difference considered as the same color.
+        """
+        self.bridge = bridge
+        self.group_id = group_id
+        self.transition_time = transition_time
+        self.state_ttl = state_ttl
+        self.tolerance = tolerance
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hue")
+        self._states = {}
+        self._states_updated = 0.0
+        self._lock = threading.Lock()
+
+    def _light_states(self):
+        """
+        Current xy color and on/off state of every light of the group, read with a single
+        bridge request when stale.
+
+        Returns:
+            dict: {light_id: {"xy": [x, y], "on": bool, "bri": int}}.
+        """
+        with self._lock:
+            if self._states and time.monotonic() - self._states_updated < self.state_ttl:
+                return dict(self._states)
+        with tracer.span("hue.get_state"):
+            api = self.bridge.get_api()
+        lights = api.get("lights", {})
+        if self.group_id != 0:
+            # Group 0 is every light; other groups only cover their own lights
+            members = set(api.get("groups", {}).get(str(self.group_id), {}).get("lights", []))
+            lights = {light_id: info for light_id, info in lights.items() if light_id in members}
+        states = {
+            int(light_id): {
+                "xy": info.get("state", {}).get("xy"),
+                "on": info.get("state", {}).get("on", False),
+                "bri": info.get("state", {}).get("bri"),
+            }
+            for light_id, info in lights.items()
+        }
+        with self._lock:
+            self._states = states
+            self._states_updated = time.monotonic()
+        return dict(states)
+
+    def _matches(self, state, xy, brightness):
+        if not state["on"] or state["xy"] is None:
+            return False
+        if brightness is not None and state["bri"] != brightness:
+            return False
+        return all(abs(a - b) <= self.tolerance for a, b in zip(state["xy"], xy))
+
+    def _remember(self, light_ids, xy, brightness):
+        with self._lock:
+            for light_id in light_ids:
+                state = self._states.setdefault(light_id, {"xy": None, "on": False, "bri": None})
+                state.update(xy=list(xy), on=True)
+                if brightness is not None:
+                    state["bri"] = brightness
+
+    def invalidate(self):
+        """Forget the known light states (e.g. after lights were changed from another app)."""
+        with self._lock:
+            self._states = {}
+
+    def apply(self, xy, brightness=None, transition_time=None):
+        """
+        Set all lights of the group to a color.
+
+        Args:
+            xy (list): CIE xy color coordinates.
+            brightness (int): Optional brightness (1-254).
+            transition_time (float): Fade duration in seconds (defaults to the engine's).
+
+        Returns:
+            int: Number of bridge requests sent to change the lights.
+        """
+        transition_time = self.transition_time if transition_time is None else transition_time
+        command = {"on": True, "xy": list(xy), "transitiontime": int(round(transition_time * 10))}
+        if brightness is not None:
+            command["bri"] = brightness
+
+        states = self._light_states()
+        pending = [light_id for light_id, state in states.items() if not self._matches(state, xy, brightness)]
+        with tracer.span("hue.apply", lights=len(states), changed=len(pending)) as span:
+            if not pending:
+                return 0
+
+            if len(pending) == len(states):
+                # Everything changes: one group action instead of one request per light
+                self.bridge.set_group(self.group_id, command)
+                span.set(group_action=True)
+                self._remember(pending, xy, brightness)
+                return 1
+
+            futures = {
+                submit_with_context(self._executor, self.bridge.set_light, light_id, command): light_id
+                for light_id in pending
+            }
+            updated = []
+            for future, light_id in futures.items():
+                try:
+                    future.result()
+                    updated.append(light_id)
+                except Exception as e:
+                    logging.error(f"Error updating light {light_id}: {e}")
+            self._remember(updated, xy, brightness)
+            return len(futures)
+
+    def activate_scene(self, scene_id, transition_time=None):
+        """
+        Recall a scene stored on the bridge for the engine's group with a single request.
+
+        Args:
+            scene_id (str): Id of the Hue scene.
+            transition_time (float): Fade duration in seconds (defaults to the engine's).
+        """
+        transition_time = self.transition_time if transition_time is None else transition_time
+        with tracer.span("hue.activate_scene", scene=scene_id):
+            self.bridge.activate_scene(self.group_id, scene_id, transition_time=int(round(transition_time * 10)))
+        # Lights now show the scene's colors, which we do not know
+        self.invalidate()
@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.sentiment import MOOD_LABELS, get_sentiment_backend
+from backend.settings import configure_logging
+from backend.telemetry import submit_with_context, tracer
+
+
+class MoodTracker:
+    def __init__(self, sentiment_backend=None, music_agent=None, visual_agent=None, on_change=None,
+                 initial_mood="neutral", alpha=0.3, margin=0.15, confirmations=2, cooldown=60.0, min_words=5,
+                 clock=time.monotonic):
+        """
+        Smoothed, real-time mood estimate fed with incremental transcript segments.
+
+        Each segment is classified locally and folded into an exponential moving average
+        per mood. The tracked mood only switches when another mood leads the average by
+        `margin` (hysteresis) for `confirmations` consecutive segments, and at most once
+        per `cooldown` seconds (debounce), so the music and lights follow lasting changes
+        instead of every sentence.
+
+        Args:
+            sentiment_backend (SentimentBackend): Mood classifier (defaults to the configured backend).
+            music_agent (MusicAgent): Plays music for the new mood on each switch (optional).
+            visual_agent (VisualLightAgent): Adjusts lights and visuals on each switch (optional).
+            on_change (callable): Called with (new_mood, previous_mood) on each switch (optional).
+            initial_mood (str): Mood assumed at the start of the session.
+            alpha (float): Weight of the newest segment in the moving average.
+            margin (float): Lead over the current mood needed to switch.
+            confirmations (int): Consecutive segments the new mood must lead for.
+            cooldown (float): Minimum seconds between two switches.
+            min_words (int): Segments with fewer words are ignored.
+            clock (callable): Time source in seconds (replays pass simulated times to update instead).
+        """
+        self.sentiment_backend = sentiment_backend or get_sentiment_backend()
+        self.music_agent = music_agent
+        self.visual_agent = visual_agent
+        self.on_change = on_change
+        self.alpha = alpha
+        self.margin = margin
+        self.confirmations = confirmations
+        self.cooldown = cooldown
+        self.min_words = min_words
+        self.clock = clock
+
+        self.mood = initial_mood
+        self.scores = {label: 1.0 if label == initial_mood else 0.0 for label in MOOD_LABELS}
+        self.history = []
+        self._candidate = None
+        self._candidate_count = 0
+        self._last_switch = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mood-actions")
+
+    def update(self, text, now=None):
+        """
+        Fold a transcript segment into the mood estimate.
+
+        Args:
+            text (str): New transcript segment.
+            now (float): Time of the segment in seconds (defaults to the tracker's clock).
+
+        Returns:
+            str: The new mood if this segment caused a switch, else None.
+        """
+        if len(text.split()) < self.min_words:
+            return None
+        now = self.clock() if now is None else now
+        prediction = self.sentiment_backend.predict([text])[0]
+
+        with self._lock:
+            for label in MOOD_LABELS:
+                observed = prediction["score"] if label == prediction["label"] else 0.0
+                self.scores[label] = (1 - self.alpha) * self.scores[label] + self.alpha * observed
+
+            leader = max(self.scores, key=self.scores.get)
+            if leader == self.mood or self.scores[leader] - self.scores[self.mood] < self.margin:
+                self._candidate, self._candidate_count = None, 0
+                return None
+            if leader != self._candidate:
+                self._candidate, self._candidate_count = leader, 0
+            self._candidate_count += 1
+            if self._candidate_count < self.confirmations:
+                return None
+            if self._last_switch is not None and now - self._last_switch < self.cooldown:
+                return None
+
+            previous, self.mood = self.mood, leader
+            self._last_switch = now
+            self._candidate, self._candidate_count = None, 0
+            self.history.append({"time": now, "mood": leader, "previous": previous, "scores": dict(self.scores)})
+
+        logging.info(f"Mood changed from {previous} to {leader}")
+        submit_with_context(self._executor, self._apply, leader, previous)
+        return leader
+
+    def on_partial(self, window_index, window_text, full_text):
+        """StreamingTranscriber callback: feeds each transcribed window to update."""
+        self.update(window_text)
+
+    def _apply(self, mood, previous):
+        # Runs on the tracker's own thread so transcription never waits for Spotify or the bridge
+        with tracer.span("mood.switch", mood=mood, previous=previous):
+            actions = []
+            if self.music_agent is not None:
+                actions.append(("music", self.music_agent.play_music_based_on_emotion))
+            if self.visual_agent is not None:
+                actions.append(("lighting", self.visual_agent.adjust_lighting))
+                actions.append(("visual", self.visual_agent.generate_visual))
+            if self.on_change is not None:
+                actions.append(("callback", lambda mood: self.on_change(mood, previous)))
+            for name, action in actions:
+                try:
+                    action(mood)
+                except Exception as e:
+                    logging.error(f"Error applying mood {mood} ({name}): {e}")
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def replay_transcript(tracker, transcript, words_per_second=2.5, segment_duration=10.0, speed=1.0, sleep=time.sleep):
+    """
+    Feed a recorded transcript to a tracker as if it were spoken live.
+
+    The transcript is cut into segments of segment_duration seconds of speech, and each
+    segment is passed with its simulated time, so debouncing behaves as in a real session
+    at any replay speed.
+
+    Args:
+        tracker (MoodTracker): Tracker to feed.
+        transcript (str): Full transcript text.
+        words_per_second (float): Assumed speaking rate.
+        segment_duration (float): Seconds of speech per segment (the live window length).
+        speed (float): Replay speed; 1.0 is real time, larger is faster, 0 does not wait at all.
+        sleep (callable): Sleep function (replaceable for tests).
+
+    Returns:
+        list: The tracker's switches ({"time", "mood", "previous", "scores"}) during the replay.
+    """
+    words = transcript.split()
+    segment_words = max(1, int(words_per_second * segment_duration))
+    start = len(tracker.history)
+    for i in range(0, len(words), segment_words):
+        if speed:
+            sleep(segment_duration / speed)
+        tracker.update(" ".join(words[i:i + segment_words]), now=(i // segment_words + 1) * segment_duration)
+    return tracker.history[start:]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Replay a transcript through the mood tracker.")
+    parser.add_argument("transcript", help="Text file containing the transcript.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed (1 is real time, 0 is instant).")
+    parser.add_argument("--cooldown", type=float, default=60.0, help="Minimum seconds between mood switches.")
+    args = parser.parse_args()
+
+    with open(args.transcript) as file:
+        text = file.read()
+    for switch in replay_transcript(MoodTracker(cooldown=args.cooldown), text, speed=args.speed):
+        print(f"{switch['time']:7.1f}s  {switch['previous']} -> {switch['mood']}")
@@ -1,21 +1,226 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.jobs import JobQueue
+from backend.telemetry import tracer
+
+
+class StageFailed(Exception):
+    """Raised by a stage whose output is unusable, so that its dependents are skipped."""
+
+
+class Stage:
+    def __init__(self, name, fn, depends_on=(), timeout=None):
+        """
+        One step of the session pipeline.
+
+        Args:
+            name (str): Unique stage name; its result is stored under this key.
+            fn (callable): Function called with the results of its dependencies as keyword
+                arguments. Blocking functions run in a worker thread; coroutine functions are awaited.
+            depends_on (tuple): Names of the stages whose results this stage needs.
+            timeout (float): Maximum run time in seconds (None for no limit).
+        """
+        self.name = name
+        self.fn = fn
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+
+
+class DagExecutor:
+    def __init__(self, stages, max_workers=8):
+        """
+        Run stages as soon as their dependencies are done, so independent stages run concurrently.
+
+        Args:
+            stages (list): Stage objects; dependencies refer to other stages or to run() inputs.
+            max_workers (int): Size of the thread pool used for blocking stages.
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage")
+
+    async def run(self, **inputs):
+        """
+        Execute the graph.
+
+        Args:
+            **inputs: Initial values available to stages as if they were stage results.
+
+        Returns:
+            dict: {"results": {name: value}, "errors": {name: message}, "timings": {name: seconds}}.
+        """
+        for stage in self.stages.values():
+            missing = [dep for dep in stage.depends_on if dep not in self.stages and dep not in inputs]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+        results, errors, timings = dict(inputs), {}, {}
+        tasks = {}
+
+        async def run_stage(stage):
+            # Wait for the dependencies; a failed dependency skips this stage
+            for dep in stage.depends_on:
+                if dep in tasks:
+                    await tasks[dep]
+                if dep in errors:
+                    errors[stage.name] = f"skipped: dependency '{dep}' failed"
+                    return
+            kwargs = {dep: results[dep] for dep in stage.depends_on}
+            start = time.perf_counter()
+            with tracer.span(f"stage.{stage.name}") as span:
+                try:
+                    if asyncio.iscoroutinefunction(stage.fn):
+                        call = stage.fn(**kwargs)
+                    else:
+                        # Run in a copy of the current context so spans inside the stage nest under it
+                        loop = asyncio.get_running_loop()
+                        context = contextvars.copy_context()
+                        call = loop.run_in_executor(self._executor, lambda: context.run(stage.fn, **kwargs))
+                    results[stage.name] = await asyncio.wait_for(call, timeout=stage.timeout)
+                except asyncio.TimeoutError:
+                    errors[stage.name] = f"timed out after {stage.timeout}s"
+                except Exception as e:
+                    errors[stage.name] = f"{e.__class__.__name__}: {e}"
+                finally:
+                    timings[stage.name] = time.perf_counter() - start
+                if stage.name in errors:
+                    span.status, span.error = "error", errors[stage.name]
+                    logging.error(f"Stage '{stage.name}' failed: {errors[stage.name]}")
+
+        for name, stage in self.stages.items():
+            tasks[name] = asyncio.ensure_future(run_stage(stage))
+        await asyncio.gather(*tasks.values())
+        return {"results": results, "errors": errors, "timings": timings}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+# Default per-stage timeouts in seconds
+STAGE_TIMEOUTS = {
+    "transcript": 600,
+    "mood": 30,
+    "music": 30,
+    "lighting": 15,
+    "visual": 15,
+    "session_structure": 300,
+}
+
+
 class TherapySessionManager:
-    def __init__(self, openai_config, music_agent, visual_agent, audio_agent):
-        self.openai_config = openai_config
+    def __init__(self, music_agent, visual_agent, audio_agent, *legacy_args, stage_timeouts=None, job_queue=None,
+                 openai_config=None):
+        """
+        Run therapy sessions through the agents.
+
+        The former signature (openai_config, music_agent, visual_agent, audio_agent,
+        stage_timeouts=None, job_queue=None) is still accepted with a DeprecationWarning;
+        the OpenAIConfig is ignored since the agents hold their own client.
+
+        Args:
+            music_agent (MusicAgent): Agent playing music for the detected mood.
+            visual_agent (VisualLightAgent): Agent driving the lights and visuals.
+            audio_agent (AudioAgent): Agent transcribing and summarizing the recording.
+            stage_timeouts (dict): Per-stage timeouts in seconds overriding STAGE_TIMEOUTS.
+            job_queue (JobQueue): Queue used by submit_audio (the default queue if omitted).
+        """
+        if legacy_args or openai_config is not None:
+            warnings.warn("TherapySessionManager no longer takes an OpenAIConfig; pass the music, visual and "
+                          "audio agents, and stage_timeouts and job_queue as keywords", DeprecationWarning,
+                          stacklevel=2)
+        if legacy_args:
+            if len(legacy_args) > 3:
+                raise TypeError(f"TherapySessionManager takes at most 6 positional arguments "
+                                f"({3 + len(legacy_args)} given)")
+            legacy = dict(zip(("audio_agent", "stage_timeouts", "job_queue"), legacy_args))
+            music_agent, visual_agent, audio_agent = visual_agent, audio_agent, legacy["audio_agent"]
+            stage_timeouts = legacy.get("stage_timeouts", stage_timeouts)
+            job_queue = legacy.get("job_queue", job_queue)
         self.music_agent = music_agent
         self.visual_agent = visual_agent
         self.audio_agent = audio_agent
+        self.stage_timeouts = dict(STAGE_TIMEOUTS, **(stage_timeouts or {}))
+        self.job_queue = job_queue
+        self.last_run = None
 
-    def process_audio(self, audio_file):
-        transcript = self.audio_agent.transcribe_audio(audio_file)
+    def _transcribe(self, audio_file):
+        # Split on silence so sessions over Whisper's 25 MB upload limit are transcribed too
+        transcript = self.audio_agent.transcribe_long_audio(audio_file)
         if not transcript:
-            return "Error processing audio."
-        
+            raise StageFailed("transcription returned no text")
+        return transcript
+
+    def _detect_mood(self, transcript):
         sentiment = self.audio_agent.analyze_sentiment(transcript)
-        mood = sentiment[0]['label'].lower()
-        
-        self.music_agent.curate_music(mood)
-        self.visual_agent.adjust_lighting(mood)
-        self.visual_agent.generate_visual(mood)
-
-        session_structure = self.audio_agent.generate_session_structure(transcript)
-        return session_structure
+        return sentiment[0]['label'].lower()
+
+    def build_stages(self):
+        """
+        Build the session pipeline: the music, lighting and visual stages only need
+        the mood, and the session structure only needs the transcript.
+
+        Returns:
+            list: Stage objects.
+        """
+        timeouts = self.stage_timeouts
+        return [
+            Stage("transcript", self._transcribe, ("audio_file",), timeouts["transcript"]),
+            Stage("mood", self._detect_mood, ("transcript",), timeouts["mood"]),
+            Stage("music", lambda mood: self.music_agent.play_music_based_on_emotion(mood), ("mood",), timeouts["music"]),
+            Stage("lighting", lambda mood: self.visual_agent.adjust_lighting(mood), ("mood",), timeouts["lighting"]),
+            Stage("visual", lambda mood: self.visual_agent.generate_visual(mood), ("mood",), timeouts["visual"]),
+            Stage("session_structure", lambda transcript: self.audio_agent.summarize_transcript(transcript),
+                  ("transcript",), timeouts["session_structure"]),
+        ]
+
+    async def aprocess_audio(self, audio_file, session_id=None):
+        """
+        Run the whole session pipeline for an audio file.
+
+        Args:
+            audio_file (str): Path to the session recording.
+            session_id (str): Id used to group the telemetry spans of this session (generated if omitted).
+
+        Returns:
+            dict: Stage results, errors and timings (see DagExecutor.run), plus the session id.
+        """
+        executor = DagExecutor(self.build_stages())
+        with tracer.session(session_id) as session_id, tracer.span("session.process_audio"):
+            try:
+                run = await executor.run(audio_file=audio_file)
+            finally:
+                executor.shutdown()
+        run["session_id"] = session_id
+        self.last_run = run
+        return run
+
+    def process_audio(self, audio_file, session_id=None):
+        run = asyncio.run(self.aprocess_audio(audio_file, session_id=session_id))
+        if "transcript" in run["errors"]:
+            return "Error processing audio."
+        return run["results"].get("session_structure")
+
+    def submit_audio(self, audio_file, emotion=None):
+        """
+        Queue the transcription and summary of a recording for the worker processes
+        instead of running them in this process. Lighting and visuals stay local since
+        they drive the devices in the therapy room.
+
+        Args:
+            audio_file (str): Path to the session recording (must be readable by the workers).
+            emotion (str): Optional mood to curate music for once the summary is done.
+
+        Returns:
+            str: Job id; submitting the same recording again returns the same id.
+        """
+        if self.job_queue is None:
+            self.job_queue = JobQueue()
+        payload = {"audio_file": os.path.abspath(audio_file), "patient_data": self.audio_agent.patient_data}
+        if emotion:
+            payload["emotion"] = emotion
+        return self.job_queue.submit("session", payload)
@@ -0,0 +1,154 @@
+import logging
+import threading
+import wave
+
+WHISPER_SAMPLE_RATE = 16000
+
+
+class Resampler:
+    def __init__(self, in_rate, out_rate=WHISPER_SAMPLE_RATE, channels=1):
+        """
+        Streaming converter from 16-bit PCM at any rate and channel count
+        to 16-bit mono PCM at the target rate, using linear interpolation.
+
+        Args:
+            in_rate (int): Sample rate of the incoming audio in Hz.
+            out_rate (int): Sample rate of the produced audio in Hz.
+            channels (int): Number of interleaved channels in the incoming audio.
+        """
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self._step = in_rate / out_rate
+        self._position = 0.0  # position of the next output sample, relative to the previous block
+        self._last = None  # last input sample of the previous block
+
+    def _to_mono(self, frames):
+        import numpy as np
+
+        usable = len(frames) - len(frames) % (2 * self.channels)
+        samples = np.frombuffer(frames[:usable], dtype="<i2")
+        if self.channels == 1:
+            return samples
+        return samples.reshape(-1, self.channels).sum(axis=1, dtype=np.int64) // self.channels
+
+    def process(self, frames):
+        """
+        Convert one block of frames; state is kept so consecutive blocks join seamlessly.
+
+        Returns:
+            bytes: Converted little-endian 16-bit mono PCM.
+        """
+        # Imported here so that importing the audio agent does not load NumPy
+        import numpy as np
+
+        samples = self._to_mono(frames)
+        if not len(samples):
+            return b""
+        if self._last is not None:
+            samples = np.concatenate(([self._last], samples))
+            position = self._position
+        else:
+            position = self._position + 1  # first block: nothing to interpolate from yet
+            samples = np.concatenate((samples[:1], samples))
+
+        # Output positions falling inside this block, interpolated all at once
+        last_index = len(samples) - 1
+        count = max(0, int(np.ceil((last_index - position) / self._step)))
+        positions = position + self._step * np.arange(count)
+        positions = positions[positions < last_index]
+        out = np.trunc(np.interp(positions, np.arange(len(samples)), samples)).astype("<i2")
+        self._position = position + self._step * len(positions) - last_index
+        self._last = int(samples[-1])
+        return out.tobytes()
+
+
+class WavRecorder:
+    def __init__(self, output_file, rate, channels=1, sampwidth=2, downsample=False):
+        """
+        Write audio frames to a WAV file as they arrive, so memory use stays
+        constant however long the session is.
+
+        Args:
+            output_file (str): Path of the WAV file to write.
+            rate (int): Sample rate of the incoming frames in Hz.
+            channels (int): Number of channels of the incoming frames.
+            sampwidth (int): Sample width of the incoming frames in bytes.
+            downsample (bool): Store 16 kHz mono audio, which is all Whisper needs.
+        """
+        self.output_file = output_file
+        self._resampler = None
+        if downsample and sampwidth == 2 and (rate != WHISPER_SAMPLE_RATE or channels != 1):
+            self._resampler = Resampler(rate, WHISPER_SAMPLE_RATE, channels)
+            rate, channels = WHISPER_SAMPLE_RATE, 1
+        elif downsample and sampwidth != 2:
+            logging.warning("Downsampling is only supported for 16-bit audio, keeping original format.")
+
+        self._wf = wave.open(output_file, "wb")
+        self._wf.setnchannels(channels)
+        self._wf.setsampwidth(sampwidth)
+        self._wf.setframerate(rate)
+        self._lock = threading.Lock()
+
+    def write(self, frames):
+        if self._resampler is not None:
+            frames = self._resampler.process(frames)
+        with self._lock:
+            if self._wf is not None:
+                # writeframesraw skips rewriting the header on every block; close() fixes it up
+                self._wf.writeframesraw(frames)
+
+    def close(self):
+        with self._lock:
+            if self._wf is not None:
+                self._wf.close()
+                self._wf = None
+        return self.output_file
+
+
+class Recording:
+    def __init__(self, source, recorder):
+        """
+        Background recording that pumps frames from an audio source into a recorder.
+
+        Args:
+            source: Opened audio source with read/close methods.
+            recorder (WavRecorder): Destination of the recorded frames.
+        """
+        self.source = source
+        self.recorder = recorder
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                data = self.source.read()
+                if not data:
+                    break
+                self.recorder.write(data)
+        except Exception as e:
+            logging.error(f"Error while recording audio: {e}")
+        finally:
+            self.source.close()
+
+    @property
+    def is_recording(self):
+        return self._thread.is_alive()
+
+    def stop(self):
+        """
+        Stop the recording and finalize the WAV file.
+
+        Returns:
+            str: Path to the saved audio file.
+        """
+        self._stop_event.set()
+        self._thread.join()
+        output_file = self.recorder.close()
+        logging.info(f"Recording saved to {output_file}")
+        return output_file
@@ -0,0 +1,222 @@
+import atexit
+import importlib
+import logging
+import os
+import threading
+import time
+
+from backend.telemetry import tracer
+
+# Modules that are slow to import, loaded ahead of time by warm_imports
+HEAVY_MODULES = ("openai", "spotipy", "phue", "numpy", "requests")
+
+
+class AgentRegistry:
+    def __init__(self):
+        """
+        Builds agents and clients on first use, once per process, and can warm them up
+        in the background so the first request does not pay for imports and connections.
+        """
+        self._factories = {}
+        self._closers = {}
+        self._instances = {}
+        self._building = {}
+        self._lock = threading.Lock()
+        self.build_times = {}
+
+    def register(self, name, factory, close=None):
+        """
+        Register how to build a component.
+
+        Args:
+            name (str): Component name.
+            factory (callable): Called without arguments to build the component.
+            close (callable): Optional function called with the component by close(),
+                e.g. to stop its background threads.
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._closers[name] = close
+            self._instances.pop(name, None)
+
+    def get(self, name):
+        """
+        Return a component, building it on first use. Concurrent callers wait for a single build.
+
+        Raises:
+            KeyError: If no factory is registered under name.
+        """
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            factory = self._factories[name]
+            event = self._building.get(name)
+            owner = event is None
+            if owner:
+                event = self._building[name] = threading.Event()
+        if not owner:
+            event.wait()
+            with self._lock:
+                if name in self._instances:
+                    return self._instances[name]
+            # The build failed in the other thread: try again here and surface the error
+            return self.get(name)
+
+        try:
+            start = time.perf_counter()
+            with tracer.span("registry.build", component=name):
+                instance = factory()
+            with self._lock:
+                self._instances[name] = instance
+                self.build_times[name] = time.perf_counter() - start
+            return instance
+        finally:
+            with self._lock:
+                del self._building[name]
+            event.set()
+
+    def close(self):
+        """Close the components built so far, in reverse build order; they are rebuilt on next use."""
+        with self._lock:
+            instances = list(self._instances.items())
+            self._instances.clear()
+        for name, instance in reversed(instances):
+            close = self._closers.get(name)
+            if close is None:
+                continue
+            try:
+                close(instance)
+            except Exception as e:
+                logging.warning(f"Could not close {name}: {e}")
+
+    def is_ready(self, name):
+        with self._lock:
+            return name in self._instances
+
+    def warm(self, names=None, background=True):
+        """
+        Build components ahead of their first use; failures are logged, not raised.
+
+        Args:
+            names (list): Components to build (defaults to all registered ones).
+            background (bool): Build from a daemon thread instead of blocking the caller.
+
+        Returns:
+            threading.Thread: The warm-up thread, or None when run in the foreground.
+        """
+        names = list(names or self._factories)
+
+        def build_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logging.warning(f"Could not warm up {name}: {e}")
+
+        if not background:
+            build_all()
+            return None
+        thread = threading.Thread(target=build_all, daemon=True, name="registry-warmup")
+        thread.start()
+        return thread
+
+
+def warm_imports(modules=HEAVY_MODULES, background=True):
+    """
+    Import slow modules ahead of time so the first agent built does not pay for them.
+    Modules that are not installed are skipped.
+
+    Returns:
+        threading.Thread: The import thread, or None when run in the foreground.
+    """
+    def import_all():
+        for module in modules:
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                pass
+
+    if not background:
+        import_all()
+        return None
+    thread = threading.Thread(target=import_all, daemon=True, name="import-warmup")
+    thread.start()
+    return thread
+
+
+def _build_music_agent():
+    from backend.agents.music_agent import MusicAgent
+
+    agent = MusicAgent(
+        spotify_client_id=os.getenv("SPOTIFY_CLIENT_ID"),
+        spotify_client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
+        redirect_uri=os.getenv("REDIRECT_URI"),
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+    )
+    # Generate the mood queries, resolve their playlists and keep the device list fresh in
+    # the background, so a mood switch only needs the playback call
+    agent.warm_query_cache()
+    agent.prefetch_mood_pools()
+    agent.start_device_refresh()
+    return agent
+
+
+def _build_visual_agent():
+    from backend.agents.visual_environment_agent import VisualLightAgent
+
+    return VisualLightAgent(bridge_ip=os.getenv("HUE_BRIDGE_IP"), asset_dir=os.getenv("MOODSYNC_VISUALS_DIR", ""))
+
+
+def _build_openai_config():
+    from integrations.openai_config import get_openai_config
+
+    return get_openai_config()
+
+
+def _build_sentiment_backend():
+    from backend.sentiment import get_sentiment_backend
+
+    return get_sentiment_backend()
+
+
+def _build_session_store():
+    from backend.session_store import get_session_store
+
+    return get_session_store()
+
+
+def _build_mood_analytics():
+    from backend.analytics import get_mood_analytics
+
+    return get_mood_analytics()
+
+
+def _build_vector_index():
+    from backend.vector_index import get_vector_index
+
+    return get_vector_index()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Returns the process-wide registry with the default components: "openai", "music",
+    "visual", "sentiment", "session_store", "mood_analytics" and "vector_index", configured from the environment.
+    The registry is closed when the process exits.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = AgentRegistry()
+            _registry.register("openai", _build_openai_config)
+            _registry.register("music", _build_music_agent, close=lambda agent: agent.close())
+            _registry.register("visual", _build_visual_agent)
+            _registry.register("sentiment", _build_sentiment_backend)
+            _registry.register("session_store", _build_session_store)
+            _registry.register("mood_analytics", _build_mood_analytics)
+            _registry.register("vector_index", _build_vector_index)
+            atexit.register(_registry.close)
+        return _registry
@@ -0,0 +1,239 @@
+import logging
+import math
+import os
+import re
+import threading
+
+# Mood vocabulary shared by the music and lighting agents
+MOOD_LABELS = ("calm", "uplifting", "neutral")
+
+# Labels of common sentiment/emotion models mapped onto the mood vocabulary: tense or angry
+# speech gets calming music and light, low or positive speech gets uplifting ones.
+LABEL_TO_MOOD = {
+    "positive": "uplifting",
+    "negative": "calm",
+    "neutral": "neutral",
+    "joy": "uplifting",
+    "surprise": "uplifting",
+    "sadness": "uplifting",
+    "anger": "calm",
+    "fear": "calm",
+    "disgust": "calm",
+}
+
+# word: (valence, arousal), both between -1 and 1
+LEXICON = {
+    # negative, high arousal
+    "anxious": (-0.7, 0.7), "anxiety": (-0.7, 0.7), "worried": (-0.6, 0.5), "worry": (-0.6, 0.5),
+    "nervous": (-0.6, 0.6), "panic": (-0.9, 0.9), "scared": (-0.7, 0.7), "afraid": (-0.7, 0.6),
+    "fear": (-0.7, 0.7), "terrified": (-0.9, 0.9), "stressed": (-0.7, 0.7), "stress": (-0.6, 0.6),
+    "overwhelmed": (-0.7, 0.6), "pressure": (-0.4, 0.5), "tense": (-0.5, 0.6), "angry": (-0.8, 0.8),
+    "anger": (-0.8, 0.8), "furious": (-0.9, 0.9), "mad": (-0.6, 0.7), "frustrated": (-0.6, 0.6),
+    "frustrating": (-0.6, 0.6), "annoyed": (-0.5, 0.5), "irritated": (-0.5, 0.5), "hate": (-0.8, 0.7),
+    "upset": (-0.6, 0.5), "restless": (-0.4, 0.6), "distress": (-0.7, 0.6),
+    "conflict": (-0.5, 0.5), "fight": (-0.6, 0.7), "attack": (-0.7, 0.8), "war": (-0.7, 0.7),
+    "destruction": (-0.7, 0.6), "crisis": (-0.7, 0.7), "guilty": (-0.6, 0.3), "ashamed": (-0.6, 0.2),
+    # negative, low arousal
+    "sad": (-0.7, -0.4), "sadness": (-0.7, -0.4), "depressed": (-0.8, -0.6), "depression": (-0.8, -0.6),
+    "down": (-0.4, -0.4), "tired": (-0.4, -0.7), "exhausted": (-0.6, -0.7), "lonely": (-0.7, -0.4),
+    "alone": (-0.4, -0.3), "empty": (-0.6, -0.6), "hopeless": (-0.9, -0.5), "helpless": (-0.8, -0.3),
+    "worthless": (-0.9, -0.4), "bored": (-0.3, -0.7), "numb": (-0.5, -0.7), "hurt": (-0.6, 0.1),
+    "cry": (-0.6, 0.1), "crying": (-0.6, 0.1), "grief": (-0.8, -0.3), "lost": (-0.5, -0.2),
+    "bad": (-0.5, 0.0), "terrible": (-0.8, 0.3), "awful": (-0.8, 0.3), "worse": (-0.6, 0.1),
+    "difficult": (-0.4, 0.2), "hard": (-0.3, 0.2), "problem": (-0.4, 0.2), "pain": (-0.7, 0.2),
+    "suffering": (-0.8, 0.1), "fail": (-0.6, 0.1), "failed": (-0.6, 0.1), "failure": (-0.7, 0.1),
+    "inadequate": (-0.6, -0.1), "unhappy": (-0.7, -0.2), "miserable": (-0.8, -0.2),
+    # positive, low arousal
+    "calm": (0.6, -0.6), "relaxed": (0.7, -0.7), "peaceful": (0.7, -0.6), "safe": (0.6, -0.4),
+    "content": (0.6, -0.4), "comfortable": (0.6, -0.4), "relief": (0.6, -0.4), "relieved": (0.6, -0.4),
+    "rested": (0.5, -0.5), "okay": (0.2, -0.2), "fine": (0.3, -0.2), "better": (0.5, 0.0),
+    "grateful": (0.7, -0.1), "thankful": (0.7, -0.1), "accept": (0.4, -0.3), "understood": (0.5, -0.2),
+    # positive, high arousal
+    "happy": (0.8, 0.5), "joy": (0.9, 0.6), "excited": (0.8, 0.8), "great": (0.7, 0.4),
+    "good": (0.5, 0.2), "love": (0.8, 0.5), "proud": (0.7, 0.5), "hopeful": (0.6, 0.3),
+    "hope": (0.5, 0.3), "motivated": (0.7, 0.6), "confident": (0.7, 0.4), "energized": (0.7, 0.8),
+    "wonderful": (0.9, 0.5), "amazing": (0.9, 0.6), "enjoy": (0.7, 0.4), "enjoyed": (0.7, 0.4),
+    "fun": (0.7, 0.6), "laugh": (0.7, 0.6), "progress": (0.5, 0.3), "improve": (0.5, 0.3),
+    "improved": (0.5, 0.3), "strong": (0.5, 0.4), "success": (0.7, 0.5), "optimistic": (0.7, 0.4),
+}
+NEGATIONS = {"not", "no", "never", "nothing", "nobody", "neither", "nor", "without", "hardly"}
+INTENSIFIERS = {"very": 1.5, "really": 1.4, "so": 1.3, "extremely": 1.8, "too": 1.3, "quite": 1.2, "completely": 1.6}
+
+_WORD = re.compile(r"[a-z']+")
+
+
+def split_windows(transcript, window_words=150):
+    """
+    Split a transcript into windows of about window_words words.
+
+    Returns:
+        list: Window texts.
+    """
+    words = transcript.split()
+    return [" ".join(words[i:i + window_words]) for i in range(0, len(words), window_words)]
+
+
+class SentimentBackend:
+    """Base class of sentiment backends; subclasses implement predict."""
+
+    name = None
+
+    def predict(self, texts):
+        """
+        Classify a batch of texts.
+
+        Args:
+            texts (list): Texts to classify.
+
+        Returns:
+            list: One {"label", "score"} dict per text, with a label from MOOD_LABELS.
+        """
+        raise NotImplementedError
+
+    def analyze(self, transcript, window_words=150):
+        """
+        Mood of a whole transcript: its windows are classified in one batch and the
+        label with the highest length-weighted score wins.
+
+        Returns:
+            list: [{"label": str, "score": float}], as returned by a HuggingFace pipeline.
+        """
+        windows = split_windows(transcript or "", window_words)
+        if not windows:
+            return [{"label": "neutral", "score": 1.0}]
+        totals = dict.fromkeys(MOOD_LABELS, 0.0)
+        weights = [len(window.split()) for window in windows]
+        for prediction, weight in zip(self.predict(windows), weights):
+            totals[prediction["label"]] += prediction["score"] * weight
+        label = max(totals, key=totals.get)
+        return [{"label": label, "score": totals[label] / sum(weights)}]
+
+
+class LexiconSentiment(SentimentBackend):
+    name = "lexicon"
+
+    def __init__(self, lexicon=None, neutral_threshold=0.15, negation_window=3):
+        """
+        Offline sentiment from a valence/arousal word lexicon, with negation and intensifiers.
+
+        Args:
+            lexicon (dict): word: (valence, arousal) (defaults to LEXICON).
+            neutral_threshold (float): Valence below which a text is considered neutral.
+            negation_window (int): Number of words after a negation whose valence is flipped.
+        """
+        self.lexicon = lexicon or LEXICON
+        self.neutral_threshold = neutral_threshold
+        self.negation_window = negation_window
+
+    def scores(self, text):
+        """
+        Returns:
+            tuple: (valence, arousal) of a text, both between -1 and 1.
+        """
+        valence = arousal = 0.0
+        matched = 0
+        negated = 0
+        boost = 1.0
+        for word in _WORD.findall(text.lower()):
+            if word in NEGATIONS or word.endswith("n't"):
+                negated = self.negation_window
+                continue
+            if word in INTENSIFIERS:
+                boost = INTENSIFIERS[word]
+                continue
+            entry = self.lexicon.get(word)
+            if entry is not None:
+                word_valence, word_arousal = entry
+                if negated:
+                    word_valence = -0.5 * word_valence
+                valence += word_valence * boost
+                arousal += word_arousal * boost
+                matched += 1
+            boost = 1.0
+            negated = max(negated - 1, 0)
+        if not matched:
+            return 0.0, 0.0
+        # Squash the summed valence into (-1, 1): more emotional words mean a stronger score
+        return valence / math.sqrt(valence * valence + 4), max(-1.0, min(1.0, arousal / matched))
+
+    def label(self, valence, arousal):
+        """Map valence and arousal onto the mood vocabulary."""
+        if abs(valence) < self.neutral_threshold:
+            return "neutral"
+        if valence < 0:
+            # Tense or angry speech is met with calm, low speech is lifted
+            return "calm" if arousal >= 0 else "uplifting"
+        return "uplifting" if arousal >= 0 else "calm"
+
+    def predict(self, texts):
+        predictions = []
+        for text in texts:
+            valence, arousal = self.scores(text)
+            label = self.label(valence, arousal)
+            score = 1.0 - abs(valence) if label == "neutral" else abs(valence)
+            predictions.append({"label": label, "score": round(score, 4)})
+        return predictions
+
+
+class TransformersSentiment(SentimentBackend):
+    name = "transformers"
+
+    def __init__(self, model="distilbert-base-uncased-finetuned-sst-2-english", batch_size=16, min_score=0.6):
+        """
+        Sentiment from a small HuggingFace model run locally on the CPU.
+        Requires the transformers package; the model is loaded on first use.
+
+        Args:
+            model (str): Sentiment or emotion classification model.
+            batch_size (int): Windows classified per forward pass.
+            min_score (float): Predictions less confident than this are reported as neutral.
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.min_score = min_score
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    def _get_pipeline(self):
+        with self._lock:
+            if self._pipeline is None:
+                from transformers import pipeline
+
+                self._pipeline = pipeline("text-classification", model=self.model, device=-1)
+            return self._pipeline
+
+    def predict(self, texts):
+        outputs = self._get_pipeline()(list(texts), batch_size=self.batch_size, truncation=True)
+        predictions = []
+        for output in outputs:
+            label = LABEL_TO_MOOD.get(output["label"].lower(), "neutral")
+            if output["score"] < self.min_score:
+                label = "neutral"
+            predictions.append({"label": label, "score": float(output["score"])})
+        return predictions
+
+
+BACKENDS = {
+    LexiconSentiment.name: LexiconSentiment,
+    TransformersSentiment.name: TransformersSentiment,
+}
+
+
+def get_sentiment_backend(name=None, **kwargs):
+    """
+    Create a sentiment backend by name (defaults to MOODSYNC_SENTIMENT_BACKEND, then "lexicon").
+    Falls back to the lexicon backend when the requested one cannot be loaded.
+
+    Returns:
+        SentimentBackend: The backend.
+    """
+    name = name or os.getenv("MOODSYNC_SENTIMENT_BACKEND", LexiconSentiment.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend {name!r}; choose from {sorted(BACKENDS)}")
+    if name == TransformersSentiment.name:
+        try:
+            import transformers  # noqa: F401
+        except ImportError:
+            logging.warning("transformers is not installed, using the lexicon sentiment backend.")
+            return LexiconSentiment()
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,340 @@
+import datetime
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import wave
+
+from backend.emotions import emotion_name, find_emotions
+from backend.settings import OUTPUT_PATH, configure_logging
+from backend.summarization import parse_summary_sections
+
+SESSION_DB_PATH = os.path.join(OUTPUT_PATH, "sessions.sqlite")
+
+# "<patient>_<YYYYmmdd_HHMMSS>" as used in saved summary and recording file names
+_TIMESTAMP = re.compile(r"^(?P<name>.+?)_(?P<stamp>\d{8}_\d{6})")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    "id INTEGER PRIMARY KEY, patient_name TEXT NOT NULL, date TEXT NOT NULL, created_at TEXT NOT NULL, "
+    "mood TEXT, summary TEXT NOT NULL, transcript TEXT, recording_id INTEGER, source_path TEXT UNIQUE)",
+    "CREATE INDEX IF NOT EXISTS sessions_patient_date ON sessions (patient_name, date)",
+    "CREATE INDEX IF NOT EXISTS sessions_date ON sessions (date)",
+    "CREATE INDEX IF NOT EXISTS sessions_mood ON sessions (mood, date)",
+    "CREATE TABLE IF NOT EXISTS session_emotions ("
+    "session_id INTEGER NOT NULL, emotion TEXT NOT NULL, PRIMARY KEY (emotion, session_id)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS recordings ("
+    "id INTEGER PRIMARY KEY, patient_name TEXT NOT NULL, recorded_at TEXT NOT NULL, path TEXT UNIQUE NOT NULL, "
+    "duration REAL, sample_rate INTEGER, channels INTEGER, size_bytes INTEGER)",
+    "CREATE INDEX IF NOT EXISTS recordings_patient_date ON recordings (patient_name, recorded_at)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts USING fts5(patient_name, summary, transcript)",
+)
+
+
+def summary_text(summary):
+    """
+    Text of a saved summary, for both the {"summary": text} format and the older
+    per-section format.
+
+    Returns:
+        str: Summary text.
+    """
+    if summary.get("summary"):
+        return summary["summary"] if isinstance(summary["summary"], str) else json.dumps(summary["summary"])
+    sections = ("overview", "key_insights", "emotions_or_states", "therapeutic_goals")
+    return "\n\n".join(summary[key] for key in sections if summary.get(key))
+
+
+def extract_emotions(summary, mood=None):
+    """
+    Emotions of a session: the vocabulary emotions (backend.emotions) mentioned in the
+    summary's "Emotions or States" section, plus the detected mood.
+
+    Returns:
+        list: Lower-case emotion names.
+    """
+    section = summary.get("emotions_or_states") or parse_summary_sections(summary_text(summary)).get("emotions_or_states", "")
+    emotions = [mood.lower()] if mood else []
+    emotions.extend(emotion for emotion in find_emotions(section) if emotion not in emotions)
+    return emotions
+
+
+def _timestamp_from_name(path):
+    match = _TIMESTAMP.match(os.path.basename(path))
+    if not match:
+        return None, None
+    return match.group("name"), datetime.datetime.strptime(match.group("stamp"), "%Y%m%d_%H%M%S")
+
+
+class SessionStore:
+    def __init__(self, path=SESSION_DB_PATH):
+        """
+        Indexed store of therapy sessions (summaries, transcripts, moods) and recordings,
+        with full-text search over summaries and transcripts.
+
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    def _insert_session(self, summary, transcript, mood, recording_id, source_path, created_at):
+        patient_name = summary.get("patient_name", "Unknown")
+        date = summary.get("date") or created_at.strftime("%Y-%m-%d")
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO sessions (patient_name, date, created_at, mood, summary, transcript, recording_id, source_path) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (patient_name, date, created_at.isoformat(timespec="seconds"), mood, json.dumps(summary),
+             transcript, recording_id, source_path),
+        )
+        if not cursor.rowcount:
+            return None
+        session_id = cursor.lastrowid
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO session_emotions (session_id, emotion) VALUES (?, ?)",
+            [(session_id, emotion) for emotion in extract_emotions(summary, mood)],
+        )
+        self._conn.execute(
+            "INSERT INTO sessions_fts (rowid, patient_name, summary, transcript) VALUES (?, ?, ?, ?)",
+            (session_id, patient_name, summary_text(summary), transcript or ""),
+        )
+        return session_id
+
+    def add_session(self, summary, transcript=None, mood=None, audio_file=None, source_path=None, created_at=None):
+        """
+        Store a session summary.
+
+        Args:
+            summary (dict): Summary as returned by AudioAgent.summarize_transcript.
+            transcript (str): Session transcript (optional).
+            mood (str): Detected mood of the session (optional).
+            audio_file (str): Path of the session recording, indexed as well (optional).
+            source_path (str): JSON file the summary was saved to; a session is stored once per file.
+            created_at (datetime): Time of the session (defaults to now).
+
+        Returns:
+            int: Id of the stored session, or None if it was already stored.
+        """
+        created_at = created_at or datetime.datetime.now()
+        with self._lock:
+            recording_id = self._insert_recording(audio_file) if audio_file else None
+            session_id = self._insert_session(summary, transcript, mood, recording_id, source_path, created_at)
+            self._conn.commit()
+        return session_id
+
+    def _insert_recording(self, path, patient_name=None):
+        path = os.path.abspath(path)
+        row = self._conn.execute("SELECT id FROM recordings WHERE path = ?", (path,)).fetchone()
+        if row:
+            return row["id"]
+        name, recorded_at = _timestamp_from_name(path)
+        patient_name = patient_name or name or os.path.basename(os.path.dirname(path))
+        recorded_at = recorded_at or datetime.datetime.fromtimestamp(os.path.getmtime(path))
+        duration = sample_rate = channels = None
+        try:
+            with wave.open(path, "rb") as wav:
+                sample_rate, channels = wav.getframerate(), wav.getnchannels()
+                duration = wav.getnframes() / sample_rate
+        except (wave.Error, EOFError) as e:
+            logging.warning(f"Could not read WAV header of {path}: {e}")
+        cursor = self._conn.execute(
+            "INSERT INTO recordings (patient_name, recorded_at, path, duration, sample_rate, channels, size_bytes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (patient_name, recorded_at.isoformat(timespec="seconds"), path, duration, sample_rate, channels,
+             os.path.getsize(path)),
+        )
+        return cursor.lastrowid
+
+    def add_recording(self, path, patient_name=None):
+        """
+        Index a WAV recording (duration, format and size are read from its header).
+
+        Returns:
+            int: Id of the recording.
+        """
+        with self._lock:
+            recording_id = self._insert_recording(path, patient_name)
+            self._conn.commit()
+        return recording_id
+
+    def import_folders(self, output_path=OUTPUT_PATH):
+        """
+        Bulk import the saved_summaries JSON files and audio_records WAV files of an
+        output folder in a single transaction. Files already imported are skipped.
+
+        Returns:
+            dict: Number of newly imported "sessions" and "recordings".
+        """
+        counts = {"sessions": 0, "recordings": 0}
+        summary_files = glob.glob(os.path.join(output_path, "saved_summaries", "**", "*.json"), recursive=True)
+        audio_files = [
+            path for path in glob.glob(os.path.join(output_path, "audio_records", "**", "*.wav"), recursive=True)
+            if not os.path.basename(path).startswith("chunk_")
+        ]
+        with self._lock:
+            known = {row["path"] for row in self._conn.execute("SELECT path FROM recordings")}
+            for path in audio_files:
+                if os.path.abspath(path) not in known:
+                    self._insert_recording(path)
+                    counts["recordings"] += 1
+            for path in summary_files:
+                try:
+                    with open(path) as file:
+                        summary = json.load(file)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Skipping unreadable summary {path}: {e}")
+                    continue
+                _, created_at = _timestamp_from_name(path)
+                created_at = created_at or datetime.datetime.fromtimestamp(os.path.getmtime(path))
+                if self._insert_session(summary, None, None, None, os.path.abspath(path), created_at):
+                    counts["sessions"] += 1
+            self._conn.commit()
+        logging.info(f"Imported {counts['sessions']} sessions and {counts['recordings']} recordings from {output_path}")
+        return counts
+
+    def sessions(self, patient_name=None, start_date=None, end_date=None, emotion=None, limit=100):
+        """
+        Query sessions, most recent first.
+
+        Args:
+            patient_name (str): Only this patient's sessions.
+            start_date (str): First date included ("YYYY-MM-DD").
+            end_date (str): Last date included ("YYYY-MM-DD").
+            emotion (str): Only sessions with this mood or emotion ("anxious" finds the "anxiety" sessions).
+            limit (int): Maximum number of sessions returned.
+
+        Returns:
+            list: Session dicts with the summary decoded.
+        """
+        query = "SELECT s.* FROM sessions s"
+        conditions, params = [], []
+        if emotion:
+            query += " JOIN session_emotions e ON e.session_id = s.id AND e.emotion = ?"
+            params.append(emotion_name(emotion))
+        if patient_name:
+            conditions.append("s.patient_name = ?")
+            params.append(patient_name)
+        if start_date:
+            conditions.append("s.date >= ?")
+            params.append(str(start_date))
+        if end_date:
+            conditions.append("s.date <= ?")
+            params.append(str(end_date))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY s.date DESC, s.created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            return [self._row_to_session(row) for row in rows]
+
+    def session_id_for(self, patient_name, transcript):
+        """
+        Returns:
+            int: Id of the patient's most recent session with this transcript, or None if it was not saved.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM sessions WHERE patient_name = ? AND transcript = ? ORDER BY created_at DESC LIMIT 1",
+                (patient_name, transcript),
+            ).fetchone()
+        return row[0] if row else None
+
+    def search(self, text, patient_name=None, limit=20):
+        """
+        Full-text search over summaries and transcripts (FTS5 query syntax).
+
+        Returns:
+            list: Matching session dicts, best match first.
+        """
+        query = ("SELECT s.* FROM sessions_fts f JOIN sessions s ON s.id = f.rowid WHERE sessions_fts MATCH ?")
+        params = [text]
+        if patient_name:
+            query += " AND s.patient_name = ?"
+            params.append(patient_name)
+        query += " ORDER BY f.rank LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            return [self._row_to_session(row) for row in rows]
+
+    def recordings(self, patient_name=None, start_date=None, end_date=None):
+        """
+        Returns:
+            list: Recording dicts (path, duration, sample rate...), most recent first.
+        """
+        query, params = "SELECT * FROM recordings WHERE 1 = 1", []
+        if patient_name:
+            query += " AND patient_name = ?"
+            params.append(patient_name)
+        if start_date:
+            query += " AND recorded_at >= ?"
+            params.append(str(start_date))
+        if end_date:
+            # Dates compare as prefixes of the ISO timestamps, so include the whole last day
+            query += " AND recorded_at < ?"
+            params.append(f"{end_date}T99")
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY recorded_at DESC", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def patients(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT patient_name FROM sessions UNION SELECT patient_name FROM recordings ORDER BY 1"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _row_to_session(self, row):
+        session = dict(row)
+        session["summary"] = json.loads(session["summary"])
+        session["emotions"] = [
+            emotion for (emotion,) in
+            self._conn.execute("SELECT emotion FROM session_emotions WHERE session_id = ?", (session["id"],))
+        ]
+        return session
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store(path=None):
+    """
+    Returns the process-wide SessionStore, creating it on first use.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(path or SESSION_DB_PATH)
+        return _store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Import saved summaries and recordings into the session store.")
+    parser.add_argument("folders", nargs="*", default=[OUTPUT_PATH], help="Output folders to import.")
+    parser.add_argument("--db", default=SESSION_DB_PATH, help="Path of the session database.")
+    args = parser.parse_args()
+
+    store = SessionStore(args.db)
+    for folder in args.folders:
+        store.import_folders(folder)
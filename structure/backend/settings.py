@@ -0,0 +1,17 @@
+import logging
+import os
+
+from dotenv import load_dotenv
+
+# Load environment variables from the .env file once, before any module reads them
+load_dotenv()
+
+OUTPUT_PATH = os.getenv("OUTPUT_PATH", "../saved_outputs/")  # Default path if not provided
+
+
+def configure_logging(level=logging.INFO):
+    """
+    Configure the root logger. Called by entry points (dashboard, workers, scripts)
+    rather than at import time, so importing an agent never reconfigures logging.
+    """
+    logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - %(message)s')
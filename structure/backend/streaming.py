@@ -0,0 +1,240 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.audio_processing import wav_bytes
+from backend.telemetry import submit_with_context
+
+
+class MicrophoneSource:
+    def __init__(self, rate=44100, chunk_size=1024, channels=1):
+        """
+        Live audio source reading 16-bit PCM from the default microphone.
+
+        Args:
+            rate (int): Sample rate in Hz.
+            chunk_size (int): Number of frames returned by each read.
+            channels (int): Number of channels to record.
+        """
+        self.rate = rate
+        self.chunk_size = chunk_size
+        self.channels = channels
+        self.sampwidth = 2
+        self._audio = None
+        self._stream = None
+
+    def open(self):
+        import pyaudio
+
+        self._audio = pyaudio.PyAudio()
+        self.sampwidth = self._audio.get_sample_size(pyaudio.paInt16)
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=self.channels,
+                                        rate=self.rate, input=True, frames_per_buffer=self.chunk_size)
+
+    def read(self):
+        return self._stream.read(self.chunk_size, exception_on_overflow=False)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+        if self._audio is not None:
+            self._audio.terminate()
+        self._stream, self._audio = None, None
+
+
+class WavFileSource:
+    def __init__(self, audio_file, chunk_size=1024, realtime=True):
+        """
+        Fake microphone replaying a WAV file, for running the live pipeline without audio hardware.
+
+        Args:
+            audio_file (str): Path to the WAV file to replay.
+            chunk_size (int): Number of frames returned by each read.
+            realtime (bool): Pace reads at the recording's real speed instead of as fast as possible.
+        """
+        self.audio_file = audio_file
+        self.chunk_size = chunk_size
+        self.realtime = realtime
+        self._wf = None
+        self._next_read = None
+
+    def open(self):
+        self._wf = wave.open(self.audio_file, "rb")
+        self.rate = self._wf.getframerate()
+        self.channels = self._wf.getnchannels()
+        self.sampwidth = self._wf.getsampwidth()
+        self._next_read = time.monotonic()
+
+    def read(self):
+        """
+        Returns:
+            bytes: The next block of frames, or b"" once the file is exhausted.
+        """
+        if self.realtime:
+            delay = self._next_read - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_read += self.chunk_size / self.rate
+        return self._wf.readframes(self.chunk_size)
+
+    def close(self):
+        if self._wf is not None:
+            self._wf.close()
+            self._wf = None
+
+
+def merge_transcripts(previous, new, max_overlap_words=12):
+    """
+    Append a window transcript to the running text, dropping the words
+    repeated because consecutive windows overlap.
+
+    Args:
+        previous (str): Transcript accumulated so far.
+        new (str): Transcript of the latest window.
+        max_overlap_words (int): Longest repeated run of words to look for.
+
+    Returns:
+        str: The merged transcript.
+    """
+    if not previous:
+        return new.strip()
+    prev_words, new_words = previous.split(), new.split()
+
+    def normalize(word):
+        return word.strip(".,!?;:\"'").lower()
+
+    for size in range(min(max_overlap_words, len(prev_words), len(new_words)), 0, -1):
+        if [normalize(w) for w in prev_words[-size:]] == [normalize(w) for w in new_words[:size]]:
+            new_words = new_words[size:]
+            break
+    return " ".join(prev_words + new_words)
+
+
+class StreamingTranscriber:
+    def __init__(self, transcribe_fn, window_duration=10.0, overlap_duration=1.0, max_workers=2):
+        """
+        Transcribe audio while it is being recorded, using rolling, slightly
+        overlapping windows handed from a recording thread to a pool of transcribers.
+
+        Args:
+            transcribe_fn (callable): Function taking an in-memory WAV buffer and returning its text.
+            window_duration (float): Length of each transcribed window in seconds.
+            overlap_duration (float): Audio shared by consecutive windows, in seconds.
+            max_workers (int): Number of windows transcribed concurrently.
+        """
+        self.transcribe_fn = transcribe_fn
+        self.window_duration = window_duration
+        self.overlap_duration = min(overlap_duration, window_duration / 2)
+        self.max_workers = max_workers
+
+        self.partials = queue.Queue()
+        self.text = ""
+        self._stop_event = threading.Event()
+        self._windows = queue.Queue()
+        self._producer = None
+        self._collector = None
+        self._frame_sinks = []
+
+    def add_frame_sink(self, sink):
+        """
+        Register a sink (e.g. a WavRecorder) receiving every raw block of frames
+        read from the source. Its close() method is called when recording ends.
+        """
+        self._frame_sinks.append(sink)
+
+    def start(self, source, on_partial=None):
+        """
+        Start recording from the source and transcribing in the background.
+
+        Args:
+            source: Opened audio source with read/close methods (MicrophoneSource or WavFileSource).
+            on_partial (callable): Optional callback receiving (window_index, window_text, full_text).
+
+        Returns:
+            StreamingTranscriber: self, so the call can be chained.
+        """
+        self._producer = threading.Thread(target=self._record, args=(source,), daemon=True)
+        # The collector runs in a copy of the caller's context so transcription spans keep their session
+        self._collector = threading.Thread(target=contextvars.copy_context().run,
+                                           args=(self._collect, on_partial), daemon=True)
+        self._producer.start()
+        self._collector.start()
+        return self
+
+    def stop(self):
+        """Stop recording, wait for the remaining windows and return the full transcript."""
+        self._stop_event.set()
+        self.join()
+        return self.text
+
+    def join(self, timeout=None):
+        for thread in (self._producer, self._collector):
+            if thread is not None:
+                thread.join(timeout)
+
+    def _record(self, source):
+        window_bytes = int(self.window_duration * source.rate) * source.channels * source.sampwidth
+        overlap_bytes = int(self.overlap_duration * source.rate) * source.channels * source.sampwidth
+        min_tail_bytes = int(0.5 * source.rate) * source.channels * source.sampwidth
+        buffer = bytearray()
+        fresh = 0  # bytes received since the last window was emitted
+        params = (source.channels, source.sampwidth, source.rate)
+        try:
+            while not self._stop_event.is_set():
+                data = source.read()
+                if not data:
+                    break
+                for sink in self._frame_sinks:
+                    sink.write(data)
+                buffer.extend(data)
+                fresh += len(data)
+                if len(buffer) >= window_bytes:
+                    self._windows.put(wav_bytes(bytes(buffer), *params))
+                    del buffer[:len(buffer) - overlap_bytes]
+                    fresh = 0
+            if fresh >= min_tail_bytes:
+                self._windows.put(wav_bytes(bytes(buffer), *params))
+        except Exception as e:
+            logging.error(f"Error while streaming audio: {e}")
+        finally:
+            source.close()
+            for sink in self._frame_sinks:
+                sink.close()
+            self._windows.put(None)
+
+    def _collect(self, on_partial):
+        # Windows are submitted as they arrive but their results are applied in order
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stream") as executor:
+            futures = queue.Queue()
+
+            def submit():
+                while True:
+                    window = self._windows.get()
+                    if window is None:
+                        futures.put(None)
+                        return
+                    futures.put(submit_with_context(executor, self.transcribe_fn, window))
+
+            submitter = threading.Thread(target=contextvars.copy_context().run, args=(submit,), daemon=True)
+            submitter.start()
+            index = 0
+            while True:
+                future = futures.get()
+                if future is None:
+                    break
+                try:
+                    window_text = future.result() or ""
+                except Exception as e:
+                    logging.error(f"Error transcribing live window {index + 1}: {e}")
+                    window_text = ""
+                self.text = merge_transcripts(self.text, window_text)
+                self.partials.put((index, window_text))
+                if on_partial:
+                    on_partial(index, window_text, self.text)
+                index += 1
+            submitter.join()
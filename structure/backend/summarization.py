@@ -0,0 +1,380 @@
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.telemetry import submit_with_context
+
+# Static instructions and few-shot examples. They are kept identical across calls and
+# placed first in the prompt so the provider can reuse its cached prefix.
+SUMMARY_PREAMBLE = (
+    "You are an assistant helping a therapist interpret patient speech. Your task is to summarize a therapy session transcript "
+    "into key insights and actionable points that reflect the patient's emotional state, challenges, progress, and any therapeutic "
+    "goals mentioned. The summary should be structured and follow the format provided below. Here are some examples of valid summaries:\n\n"
+    "Example 1:\n"
+    "Overview: The patient discussed their recent trauma-related anxiety and fears of relapse. They mentioned feeling overwhelmed and not "
+    "able to manage their emotions during stressful situations.\n"
+    "Key Insights: The patient needs further support in developing coping strategies for anxiety, specifically in high-stress environments.\n"
+    "Emotions or States: Anxiety, frustration, and hopelessness were identified.\n"
+    "Therapeutic Goals: To work on relaxation techniques, mindfulness, and building emotional resilience.\n\n"
+    "Example 2:\n"
+    "Overview: The patient shared their experience of improving their OCD symptoms but still struggles with intrusive thoughts and compulsive behaviors.\n"
+    "Key Insights: The patient showed progress in managing their symptoms, but they need more consistent practice with cognitive-behavioral techniques.\n"
+    "Emotions or States: Frustration with lack of full control over compulsions.\n"
+    "Therapeutic Goals: To continue implementing exposure therapy and work on resisting compulsive rituals.\n\n"
+    "Provide the summary in the following structure:\n"
+    "1. **Overview**: Main themes or issues discussed.\n"
+    "2. **Key Insights**: Actionable takeaways.\n"
+    "3. **Emotions or States**: Emotional states identified.\n"
+    "4. **Therapeutic Goals**: Goals or actions for future sessions.\n"
+)
+
+SEGMENT_PREAMBLE = (
+    "You are an assistant helping a therapist interpret patient speech. You will receive one segment of a longer therapy "
+    "session transcript. Write concise notes on this segment only: themes and issues discussed, emotional states expressed, "
+    "progress or setbacks, and any goals or actions mentioned. Keep the patient's own wording for important statements."
+)
+
+INCREMENTAL_PREAMBLE = SUMMARY_PREAMBLE + (
+    "\nThe session is still in progress. You will receive the current summary and the newest part of the transcript. "
+    "Return the complete updated summary in the same four-section structure: fold in what the new part adds and keep "
+    "earlier points unless the new part contradicts them. Keep each section concise."
+)
+
+# Token budgets sized for an 8k-token context window
+SINGLE_PASS_MAX_TOKENS = 5000
+SEGMENT_MAX_TOKENS = 2500
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Section titles of the summary structure, with the keys used for them in saved summaries
+SUMMARY_SECTIONS = {
+    "Overview": "overview",
+    "Key Insights": "key_insights",
+    "Emotions or States": "emotions_or_states",
+    "Therapeutic Goals": "therapeutic_goals",
+}
+_SECTION_HEADER = re.compile(
+    r"^\s*(?:\d+\.\s*)?\**\s*(" + "|".join(SUMMARY_SECTIONS) + r")\s*\**\s*:\s*\**\s*",
+    re.MULTILINE | re.IGNORECASE,
+)
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a text, using tiktoken when it is installed.
+
+    Returns:
+        int: Token count (exact with tiktoken, about 4 characters per token otherwise).
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return len(text) // 4 + 1
+    return len(tiktoken.get_encoding("cl100k_base").encode(text))
+
+
+def parse_summary_sections(summary_text):
+    """
+    Split a generated summary into its four sections. Both "Overview: ..." and
+    "1. **Overview**: ..." headers are recognized.
+
+    Returns:
+        dict: Section text per key ("overview", "key_insights", "emotions_or_states", "therapeutic_goals");
+            sections missing from the summary are left out.
+    """
+    titles = {title.lower(): key for title, key in SUMMARY_SECTIONS.items()}
+    matches = list(_SECTION_HEADER.finditer(summary_text or ""))
+    sections = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(summary_text)
+        sections[titles[match.group(1).lower()]] = summary_text[match.end():end].strip()
+    return sections
+
+
+def segment_transcript(transcript, max_tokens=SEGMENT_MAX_TOKENS):
+    """
+    Split a transcript into segments of at most max_tokens, breaking on sentence boundaries.
+
+    Args:
+        transcript (str): Full session transcript.
+        max_tokens (int): Token budget of each segment.
+
+    Returns:
+        list: Transcript segments, in order.
+    """
+    segments, current, current_tokens = [], [], 0
+    for sentence in _SENTENCE_END.split(transcript.strip()):
+        pieces = [sentence]
+        if estimate_tokens(sentence) > max_tokens:
+            # A single run-on sentence (common in raw transcripts) is split on words
+            words = sentence.split()
+            step = max(1, max_tokens * 3 // 4)
+            pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                segments.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        segments.append(" ".join(current))
+    return segments
+
+
+def with_history(patient_context, notes):
+    """
+    Append notes from previous sessions (see AudioAgent.history_notes) to the patient context.
+
+    Returns:
+        str: The patient context, with the notes when there are any.
+    """
+    if not notes:
+        return patient_context
+    return f"{patient_context}\n\nRelevant notes from previous sessions:\n{notes}"
+
+
+def build_summary_messages(transcript, patient_context):
+    """
+    Build the chat messages for a single-pass summary: the static preamble
+    first, then the session-specific content.
+
+    Returns:
+        list: Chat messages.
+    """
+    return [
+        {"role": "system", "content": SUMMARY_PREAMBLE},
+        {"role": "user", "content": (
+            "Summarize the following therapy session transcript into key insights and actionable points. Focus on the "
+            "patient's emotional state, challenges, progress, and any therapeutic goals mentioned.\n\n"
+            f"Patient Context:\n{patient_context}\n\n"
+            f"Transcript:\n{transcript}"
+        )},
+    ]
+
+
+def build_incremental_messages(summary, new_text, patient_context):
+    """
+    Build the chat messages folding a new transcript segment into a running summary.
+    The prompt holds the summary so far, not the transcript it was built from.
+
+    Returns:
+        list: Chat messages.
+    """
+    return [
+        {"role": "system", "content": INCREMENTAL_PREAMBLE},
+        {"role": "user", "content": (
+            f"Patient Context:\n{patient_context}\n\n"
+            f"Current summary:\n{summary or '(none yet, the session has just started)'}\n\n"
+            f"New transcript:\n{new_text}"
+        )},
+    ]
+
+
+class IncrementalSummarizer:
+    def __init__(self, chat_fn, patient_context="", stream_fn=None, min_tokens=300,
+                 max_delta_tokens=SEGMENT_MAX_TOKENS, background=True, on_token=None, history_fn=None):
+        """
+        Keep a running four-section summary of a session in progress. New transcript text
+        is buffered and folded into the summary once enough of it has arrived, so each
+        request only carries the current summary and the new text, and the final summary
+        is ready moments after the session ends.
+
+        Args:
+            chat_fn (callable): Function taking a list of chat messages and returning the reply text.
+            patient_context (str): Patient details included in every prompt.
+            stream_fn (callable): Optional function taking chat messages and yielding the reply
+                piece by piece; used instead of chat_fn so the summary can be shown as it is written.
+            min_tokens (int): New transcript tokens buffered before a background update.
+            max_delta_tokens (int): Largest amount of new text folded in one request.
+            background (bool): Fold updates on a worker thread as text arrives (else only in update/finalize).
+            on_token (callable): Called with each piece of the background updates as it is written,
+                from the update thread (only when the summarizer streams).
+            history_fn (callable): Optional function taking query text and returning notes from the
+                patient's previous sessions; each update adds the notes relevant to its new text
+                and the summary so far to the patient context.
+        """
+        self.chat_fn = chat_fn
+        self.patient_context = patient_context
+        self.stream_fn = stream_fn
+        self.min_tokens = min_tokens
+        self.max_delta_tokens = max_delta_tokens
+        self.background = background
+        self.on_token = on_token
+        self.history_fn = history_fn
+
+        self.text = ""  # last complete summary
+        self.draft = ""  # summary being written (equals text between updates)
+        self.updates = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+        self._pending = []
+        self._pending_tokens = 0
+        self._seen_words = 0
+        self._lock = threading.Lock()
+        self._fold_lock = threading.Lock()
+        self._future = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary-update")
+
+    @property
+    def sections(self):
+        """The running summary split into its sections (see parse_summary_sections)."""
+        return parse_summary_sections(self.text)
+
+    @property
+    def updating(self):
+        """True while an update is being written (draft then holds the partial summary)."""
+        return self._fold_lock.locked()
+
+    def add(self, text):
+        """
+        Add new transcript text; an update is started in the background once
+        min_tokens of new text are waiting and no other update is running.
+        """
+        text = text.strip()
+        if not text:
+            return
+        with self._lock:
+            self._pending.append(text)
+            self._pending_tokens += estimate_tokens(text)
+            start = (self.background and self._pending_tokens >= self.min_tokens
+                     and (self._future is None or self._future.done()))
+            if start:
+                self._future = submit_with_context(self._executor, self._fold_pending, self.on_token)
+
+    def on_partial(self, window_index, window_text, full_text):
+        """StreamingTranscriber callback: adds the words the window appended to the transcript."""
+        # Consecutive windows overlap, so the new words are taken from the merged transcript
+        words = full_text.split()
+        self.add(" ".join(words[self._seen_words:]))
+        self._seen_words = len(words)
+
+    def _fold_pending(self, on_token=None):
+        with self._fold_lock:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        return
+                    new_text = " ".join(self._pending)
+                    self._pending, self._pending_tokens = [], 0
+                parts = segment_transcript(new_text, self.max_delta_tokens)
+                for i, part in enumerate(parts):
+                    try:
+                        self._fold(part, on_token)
+                    except Exception as e:
+                        logging.error(f"Error updating the running summary: {e}")
+                        # Nothing is lost: the unfolded text is retried with the next update
+                        rest = " ".join(parts[i:])
+                        with self._lock:
+                            self._pending.insert(0, rest)
+                            self._pending_tokens += estimate_tokens(rest)
+                        self.draft = self.text
+                        return
+                # Text that arrived during the update waits for the next trigger unless it is already due
+                with self._lock:
+                    if not self._pending or self._pending_tokens < self.min_tokens:
+                        return
+
+    def _fold(self, new_text, on_token=None):
+        patient_context = self.patient_context
+        if self.history_fn is not None:
+            patient_context = with_history(patient_context, self.history_fn(f"{new_text}\n{self.text}"))
+        messages = build_incremental_messages(self.text, new_text, patient_context)
+        if self.stream_fn is None:
+            summary = self.chat_fn(messages)
+        else:
+            pieces = []
+            for piece in self.stream_fn(messages):
+                pieces.append(piece)
+                self.draft = "".join(pieces)
+                if on_token is not None:
+                    on_token(piece)
+            summary = "".join(pieces)
+        if not summary:
+            raise ValueError("empty summary")
+        self.prompt_tokens += sum(estimate_tokens(m["content"]) for m in messages)
+        self.completion_tokens += estimate_tokens(summary)
+        self.updates += 1
+        self.text = self.draft = summary.strip()
+
+    def update(self, on_token=None):
+        """
+        Fold all waiting text into the summary now, after the running background update.
+
+        Args:
+            on_token (callable): Called with each piece of the summary as it is written
+                (only when the summarizer streams).
+
+        Returns:
+            str: The updated summary.
+        """
+        self._fold_pending(on_token)
+        return self.text
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class MapReduceSummarizer:
+    def __init__(self, chat_fn, max_workers=4, segment_tokens=SEGMENT_MAX_TOKENS):
+        """
+        Summarize long transcripts by summarizing segments in parallel (map)
+        and merging the segment notes into the final four-section summary (reduce).
+
+        Args:
+            chat_fn (callable): Function taking a list of chat messages and returning the reply text.
+            max_workers (int): Number of segments summarized concurrently.
+            segment_tokens (int): Token budget of each transcript segment.
+        """
+        self.chat_fn = chat_fn
+        self.max_workers = max_workers
+        self.segment_tokens = segment_tokens
+
+    def _summarize_segment(self, index, total, segment):
+        messages = [
+            {"role": "system", "content": SEGMENT_PREAMBLE},
+            {"role": "user", "content": f"Segment {index + 1} of {total}:\n{segment}"},
+        ]
+        return self.chat_fn(messages)
+
+    def _map(self, texts):
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(texts)))) as executor:
+            futures = [
+                submit_with_context(executor, self._summarize_segment, i, len(texts), text)
+                for i, text in enumerate(texts)
+            ]
+            return [future.result() for future in futures]
+
+    def summarize(self, transcript, patient_context):
+        """
+        Args:
+            transcript (str): Full session transcript.
+            patient_context (str): Patient details included in the final prompt.
+
+        Returns:
+            str: Summary following the Overview / Key Insights / Emotions or States / Therapeutic Goals structure.
+        """
+        segments = segment_transcript(transcript, self.segment_tokens)
+        logging.info(f"Summarizing {len(segments)} transcript segments...")
+        notes = [note for note in self._map(segments) if note]
+
+        # Very long sessions: condense the notes again until they fit in one reduce prompt
+        while len(notes) > 1 and estimate_tokens("\n\n".join(notes)) > SINGLE_PASS_MAX_TOKENS:
+            groups = segment_transcript("\n\n".join(notes), self.segment_tokens)
+            if len(groups) >= len(notes):
+                break
+            notes = [note for note in self._map(groups) if note]
+
+        combined = "\n\n".join(f"Segment {i + 1} notes:\n{note}" for i, note in enumerate(notes))
+        messages = [
+            {"role": "system", "content": SUMMARY_PREAMBLE},
+            {"role": "user", "content": (
+                "The session was too long to process at once, so it was split into segments that were summarized "
+                "separately. Combine the segment notes below into one summary of the whole session.\n\n"
+                f"Patient Context:\n{patient_context}\n\n"
+                f"{combined}"
+            )},
+        ]
+        return self.chat_fn(messages)
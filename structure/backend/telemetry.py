@@ -0,0 +1,305 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar("moodsync_current_span", default=None)
+_current_session = contextvars.ContextVar("moodsync_current_session", default=None)
+_current_collector = contextvars.ContextVar("moodsync_span_collector", default=None)
+
+
+class Span:
+    def __init__(self, name, session_id=None, parent=None, attributes=None):
+        """
+        Timing record of one operation (an API call, a pipeline stage, ...).
+
+        Args:
+            name (str): Operation name, e.g. "openai.transcribe" or "session.music".
+            session_id (str): Therapy session the operation belongs to.
+            parent (Span): Enclosing span, if any.
+            attributes (dict): Extra measurements (bytes_uploaded, prompt_tokens, cache_hit, ...).
+        """
+        self.name = name
+        self.session_id = session_id
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attributes):
+        """Add or update measurements on the span."""
+        self.attributes.update(attributes)
+
+    def incr(self, name, value=1):
+        """Add to a numeric measurement (e.g. bytes or tokens over several calls)."""
+        self.attributes[name] = self.attributes.get(name, 0) + value
+
+    def finish(self, error=None):
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.status = "error"
+            self.error = f"{error.__class__.__name__}: {error}"
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a finished span from to_dict() output (e.g. one recorded by a job worker)."""
+        span = cls.__new__(cls)
+        span.name = data["name"]
+        span.session_id = data.get("session_id")
+        span.trace_id = data.get("trace_id")
+        span.span_id = data["span_id"]
+        span.parent_id = data.get("parent_id")
+        span.attributes = dict(data.get("attributes") or {})
+        span.start_time = data.get("start_time")
+        span._start = None
+        duration_ms = data.get("duration_ms")
+        span.duration = duration_ms / 1000 if duration_ms is not None else None
+        span.status = data.get("status", "ok")
+        span.error = data.get("error")
+        return span
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "session_id": self.session_id,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class LoggingExporter:
+    """Write every finished span as one JSON line to the "moodsync.telemetry" logger."""
+
+    def __init__(self, level=logging.INFO):
+        self.logger = logging.getLogger("moodsync.telemetry")
+        self.level = level
+
+    def export(self, span):
+        self.logger.log(self.level, json.dumps(span.to_dict(), default=str))
+
+
+class JsonlFileExporter:
+    """Append every finished span as one JSON line to a file."""
+
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a") as file:
+            file.write(line + "\n")
+
+
+class OpenTelemetryExporter:
+    """Forward finished spans to OpenTelemetry (requires the opentelemetry-api package)."""
+
+    def __init__(self, tracer_name="moodsync"):
+        from opentelemetry import trace
+
+        self._trace = trace
+        self._tracer = trace.get_tracer(tracer_name)
+
+    def export(self, span):
+        attributes = {k: v for k, v in span.attributes.items() if isinstance(v, (str, bool, int, float))}
+        if span.session_id:
+            attributes["session.id"] = span.session_id
+        otel_span = self._tracer.start_span(span.name, start_time=int(span.start_time * 1e9), attributes=attributes)
+        if span.status == "error":
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span.error))
+        otel_span.end(end_time=int((span.start_time + span.duration) * 1e9))
+
+
+class Tracer:
+    def __init__(self, exporters=None, max_spans=10000):
+        """
+        Collects spans in memory (for the dashboard) and forwards them to exporters.
+
+        Args:
+            exporters (list): Objects with an export(span) method.
+            max_spans (int): Number of recent spans kept in memory.
+        """
+        self.exporters = list(exporters or [])
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def session(self, session_id=None):
+        """
+        Attribute all spans started inside the block (including in worker threads started
+        with copy_context) to a therapy session.
+
+        Yields:
+            str: The session id.
+        """
+        session_id = session_id or uuid.uuid4().hex
+        token = _current_session.set(session_id)
+        try:
+            yield session_id
+        finally:
+            _current_session.reset(token)
+
+    @contextmanager
+    def collect(self):
+        """
+        Gather the spans finished inside the block (including in worker threads started
+        with copy_context), e.g. to send a job's spans back to the process that submitted it.
+
+        Yields:
+            list: Spans, appended to as they finish.
+        """
+        spans = []
+        token = _current_collector.set(spans)
+        try:
+            yield spans
+        finally:
+            _current_collector.reset(token)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time the enclosed block.
+
+        Yields:
+            Span: The running span, to which measurements can be added with set()/incr().
+        """
+        span = Span(name, session_id=_current_session.get(), parent=_current_span.get(), attributes=attributes)
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish(error)
+            self._record(span)
+
+    def traced(self, name=None):
+        """Decorator recording a span around every call of the function."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name or fn.__qualname__):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _record(self, span):
+        with self._lock:
+            self._spans.append(span)
+        collector = _current_collector.get()
+        if collector is not None:
+            collector.append(span)
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logging.error(f"Error exporting span {span.name}: {e}")
+
+    def import_spans(self, spans):
+        """
+        Add spans recorded in another process (as to_dict() output), so summary() includes them.
+        Spans already known are skipped, and imported spans are not exported again.
+
+        Args:
+            spans (list): Span dicts.
+
+        Returns:
+            int: Number of spans added.
+        """
+        added = 0
+        with self._lock:
+            known = {span.span_id for span in self._spans}
+            for data in spans or []:
+                if data["span_id"] in known:
+                    continue
+                known.add(data["span_id"])
+                self._spans.append(Span.from_dict(data))
+                added += 1
+        return added
+
+    def spans(self, session_id=None):
+        """
+        Returns:
+            list: Finished spans, optionally only those of one session.
+        """
+        with self._lock:
+            spans = list(self._spans)
+        if session_id is not None:
+            spans = [s for s in spans if s.session_id == session_id]
+        return spans
+
+    def summary(self, session_id=None):
+        """
+        Aggregate spans per operation name.
+
+        Returns:
+            list: One dict per operation with calls, total/max time, errors and summed numeric measurements.
+        """
+        rows = {}
+        for span in self.spans(session_id):
+            row = rows.setdefault(span.name, {"stage": span.name, "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0})
+            duration_ms = span.duration * 1000
+            row["calls"] += 1
+            row["total_ms"] += duration_ms
+            row["max_ms"] = max(row["max_ms"], duration_ms)
+            row["errors"] += span.status == "error"
+            for key, value in span.attributes.items():
+                if isinstance(value, bool):
+                    row[key] = row.get(key, 0) + int(value)
+                elif isinstance(value, (int, float)):
+                    row[key] = row.get(key, 0) + value
+        for row in rows.values():
+            row["total_ms"] = round(row["total_ms"], 1)
+            row["max_ms"] = round(row["max_ms"], 1)
+        return sorted(rows.values(), key=lambda row: -row["total_ms"])
+
+
+def current_span():
+    """Return the running span of the current context, or None."""
+    return _current_span.get()
+
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """Submit a call to an executor so that it runs in a copy of the caller's telemetry context."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _default_exporters():
+    exporters = []
+    if os.getenv("MOODSYNC_TELEMETRY_LOG", "0") == "1":
+        exporters.append(LoggingExporter())
+    if os.getenv("MOODSYNC_TELEMETRY_FILE"):
+        exporters.append(JsonlFileExporter(os.getenv("MOODSYNC_TELEMETRY_FILE")))
+    if os.getenv("MOODSYNC_TELEMETRY_OTEL", "0") == "1":
+        exporters.append(OpenTelemetryExporter())
+    return exporters
+
+
+# Process-wide tracer used by all agents
+tracer = Tracer(_default_exporters())
@@ -0,0 +1,89 @@
+import logging
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from backend.telemetry import submit_with_context
+
+
+class TranscriptionError(Exception):
+    """Raised when a chunk could not be transcribed after all retries."""
+
+
+class ConcurrentTranscriber:
+    def __init__(self, transcribe_fn, max_workers=4, max_retries=3, backoff_base=1.0, backoff_max=30.0):
+        """
+        Transcribe audio chunks concurrently with a bounded worker pool.
+
+        Args:
+            transcribe_fn (callable): Function taking one chunk and returning its text.
+                It should raise (or return None) on failure so the chunk can be retried.
+            max_workers (int): Maximum number of chunks transcribed at the same time.
+            max_retries (int): Number of retries per chunk after the first attempt.
+            backoff_base (float): Initial delay in seconds before a retry, doubled on each attempt.
+            backoff_max (float): Upper bound for the delay between two attempts.
+        """
+        self.transcribe_fn = transcribe_fn
+        self.max_workers = max(1, int(max_workers))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _transcribe_with_retry(self, index, chunk):
+        """
+        Transcribe a single chunk, retrying with exponential backoff and jitter.
+
+        Returns:
+            str: Transcribed text of the chunk.
+        """
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                text = self.transcribe_fn(chunk)
+                if text is not None:
+                    return text
+                last_error = TranscriptionError(f"Empty response for chunk {index + 1}")
+            except Exception as e:
+                last_error = e
+
+            if attempt < self.max_retries:
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                delay = random.uniform(0, delay)
+                logging.warning(f"Chunk {index + 1} failed ({last_error}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+        raise TranscriptionError(f"Chunk {index + 1} failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def transcribe(self, chunks):
+        """
+        Transcribe all chunks and return their texts in the original order.
+        Chunks are pulled from the iterable lazily, so at most a few of them
+        are held in memory at any time.
+
+        Args:
+            chunks (iterable): Audio chunks (file paths or file-like objects).
+
+        Returns:
+            list: One entry per chunk, the transcribed text or None if the chunk failed.
+        """
+        results = []
+        pending = {}
+        max_in_flight = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="transcribe") as executor:
+            for index, chunk in enumerate(chunks):
+                results.append(None)
+                pending[submit_with_context(executor, self._transcribe_with_retry, index, chunk)] = index
+                if len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._collect(future, pending.pop(future), results)
+            for future in list(pending):
+                self._collect(future, pending.pop(future), results)
+        return results
+
+    def _collect(self, future, index, results):
+        """Store the result of a finished chunk, logging chunks that failed."""
+        try:
+            results[index] = future.result()
+        except TranscriptionError as e:
+            logging.error(str(e))
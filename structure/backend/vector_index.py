@@ -0,0 +1,312 @@
+import logging
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from backend.cache import file_lock, hash_bytes, save_npz
+from backend.session_store import summary_text
+from backend.settings import OUTPUT_PATH
+from backend.summarization import estimate_tokens, segment_transcript
+
+VECTOR_INDEX_PATH = os.path.join(OUTPUT_PATH, "vector_index")
+EMBEDDING_MODEL = "text-embedding-ada-002"
+SNIPPET_TOKENS = 150  # size of the indexed transcript snippets
+CONTEXT_TOKEN_BUDGET = 600  # prior-session context added to a summary prompt
+
+_WORD = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by did do does for from had has have he her him his i if in is it its just me my "
+    "no not of on or our she so that the their them then there they this to up was we were what when which who will "
+    "with you your".split()
+)
+
+
+class HashingEmbedder:
+    name = "hashing"
+
+    def __init__(self, dim=1024):
+        """
+        Local embedding without any model: words and word pairs are hashed into a fixed
+        number of signed buckets. Captures shared vocabulary only, but needs no network.
+
+        Args:
+            dim (int): Number of dimensions.
+        """
+        self.dim = dim
+
+    def embed(self, texts):
+        """
+        Returns:
+            np.ndarray: One L2-normalized float32 row per text.
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = [word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                bucket = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, bucket % self.dim] += 1.0 if bucket & 0x80000000 else -1.0
+        # Dampen repeated words, then normalize so dot products are cosine similarities
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return _normalize(vectors)
+
+
+class OpenAIEmbedder:
+    def __init__(self, openai_config=None, model=EMBEDDING_MODEL, batch_size=64):
+        """
+        Embeddings from the OpenAI API.
+
+        Args:
+            openai_config (OpenAIConfig): OpenAI client to use (defaults to the shared client).
+            model (str): Embedding model.
+            batch_size (int): Texts sent per request.
+        """
+        self._openai_config = openai_config
+        self.model = model
+        self.batch_size = batch_size
+        self.name = f"openai-{model}"
+
+    @property
+    def openai_config(self):
+        if self._openai_config is None:
+            from integrations.openai_config import get_openai_config
+
+            self._openai_config = get_openai_config()
+        return self._openai_config
+
+    def embed(self, texts):
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            rows.extend(self.openai_config.embed(texts[start:start + self.batch_size], model=self.model))
+        return _normalize(np.array(rows, dtype=np.float32))
+
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+    "openai": OpenAIEmbedder,
+}
+
+
+def get_embedder(name=None):
+    """
+    Create an embedder by name (defaults to MOODSYNC_EMBEDDINGS, then "openai" when an API key
+    is configured and the local "hashing" embedder otherwise).
+
+    Returns:
+        HashingEmbedder or OpenAIEmbedder: The embedder.
+    """
+    name = name or os.getenv("MOODSYNC_EMBEDDINGS") or ("openai" if os.getenv("OPENAI_API_KEY") else "hashing")
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder {name!r}; choose from {sorted(EMBEDDERS)}")
+    return EMBEDDERS[name]()
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def session_snippets(summary, transcript=None, max_tokens=SNIPPET_TOKENS):
+    """
+    Cut a session into the snippets stored in the index: the summary, and the
+    transcript in chunks of about max_tokens.
+
+    Returns:
+        list: (kind, text) tuples, kind being "summary" or "transcript".
+    """
+    snippets = [("summary", part) for part in segment_transcript(summary_text(summary), max_tokens * 2)]
+    if transcript:
+        snippets.extend(("transcript", part) for part in segment_transcript(transcript, max_tokens))
+    return [(kind, text) for kind, text in snippets if text.strip()]
+
+
+class VectorIndex:
+    def __init__(self, folder=VECTOR_INDEX_PATH, embedder=None):
+        """
+        Cosine-similarity index over past summaries and transcripts, one .npz file per
+        patient, appended to as sessions are saved. Files live in a sub-folder per
+        embedder so vectors of different models are never compared.
+
+        Args:
+            folder (str): Root folder of the index files.
+            embedder: Object with a name and an embed(texts) method returning normalized rows
+                (defaults to get_embedder()).
+        """
+        self.embedder = embedder or get_embedder()
+        self.folder = os.path.join(folder, self.embedder.name)
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        self._patients = {}
+        self._lock = threading.Lock()
+
+    def _path(self, patient_name):
+        return os.path.join(self.folder, f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', patient_name)}.npz")
+
+    def _load(self, patient_name, reload=False):
+        # Reload when another process (e.g. a job worker) saved a newer version of the file
+        path = self._path(patient_name)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        cached = self._patients.get(patient_name)
+        if cached is not None and cached[1] == mtime and not reload:
+            return cached[0]
+        entries = None
+        if mtime is not None:
+            with np.load(path) as data:
+                entries = {key: data[key] for key in data.files}
+        self._patients[patient_name] = (entries, mtime)
+        return entries
+
+    def _save(self, patient_name, entries):
+        path = self._path(patient_name)
+        save_npz(path, **entries)
+        self._patients[patient_name] = (entries, os.path.getmtime(path))
+
+    def add_session(self, summary, transcript=None, key=None):
+        """
+        Index a saved session. Only the new snippets are embedded; a session already
+        indexed under the same key is skipped. Safe to call from several processes: the
+        patient's file is re-read and rewritten under a file lock.
+
+        Args:
+            summary (dict): Summary with "patient_name" and "date".
+            transcript (str): Session transcript (optional).
+            key (str): Unique id of the session (e.g. its session store id).
+
+        Returns:
+            int: Number of snippets added.
+        """
+        patient_name = summary.get("patient_name", "Unknown")
+        date = str(summary.get("date") or np.datetime64("today"))
+        key = str(key) if key is not None else hash_bytes(date, summary_text(summary))
+        snippets = session_snippets(summary, transcript)
+        if not snippets:
+            return 0
+        with self._lock:
+            entries = self._load(patient_name)
+            if entries is not None and key in entries["keys"]:
+                return 0
+        vectors = self.embedder.embed([text for _, text in snippets])
+
+        new = {
+            "vectors": vectors,
+            "texts": np.array([text for _, text in snippets]),
+            "kinds": np.array([kind for kind, _ in snippets]),
+            "dates": np.array([date] * len(snippets)),
+            "keys": np.array([key] * len(snippets)),
+        }
+        with self._lock, file_lock(self._path(patient_name)):
+            entries = self._load(patient_name, reload=True)
+            if entries is not None:
+                if key in entries["keys"]:
+                    return 0
+                new = {name: np.concatenate([entries[name], values]) for name, values in new.items()}
+            self._save(patient_name, new)
+        return len(snippets)
+
+    def search(self, patient_name, query, k=5, exclude_key=None):
+        """
+        Find the past snippets of a patient most similar to a query.
+
+        Args:
+            exclude_key (str): Leave out the snippets of this session (e.g. the one being summarized again).
+
+        Returns:
+            list: Up to k dicts with "text", "kind", "date" and "score" (cosine similarity), best first.
+        """
+        with self._lock:
+            entries = self._load(patient_name)
+        if entries is None or not len(entries["vectors"]):
+            return []
+        scores = entries["vectors"] @ self.embedder.embed([query])[0]
+        candidates = len(scores)
+        if exclude_key is not None:
+            excluded = entries["keys"] == str(exclude_key)
+            scores[excluded] = -np.inf
+            candidates -= int(excluded.sum())
+            if not candidates:
+                return []
+        k = min(k, candidates)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"text": str(entries["texts"][i]), "kind": str(entries["kinds"][i]), "date": str(entries["dates"][i]),
+             "score": float(scores[i])}
+            for i in top
+        ]
+
+    def context(self, patient_name, query, token_budget=CONTEXT_TOKEN_BUDGET, k=10, min_score=0.1, exclude_key=None):
+        """
+        Build the prior-session notes for a prompt: the most relevant snippets that fit in
+        token_budget, so the prompt size stays flat however long the patient's history is.
+
+        Args:
+            exclude_key (str): Session left out of the notes (see search).
+
+        Returns:
+            str: One line per snippet (empty when nothing relevant is indexed).
+        """
+        lines, seen, used = [], set(), 0
+        for hit in self.search(patient_name, query, k=k, exclude_key=exclude_key):
+            if hit["score"] < min_score:
+                break
+            # Recurring statements are only worth their tokens once
+            if hit["text"] in seen:
+                continue
+            seen.add(hit["text"])
+            line = f"- [{hit['date']}, {hit['kind']}] {hit['text']}"
+            tokens = estimate_tokens(line)
+            if used + tokens > token_budget:
+                continue
+            lines.append(line)
+            used += tokens
+        return "\n".join(lines)
+
+    def backfill(self, session_store, patient_name=None):
+        """
+        Index the sessions already in a SessionStore (e.g. after importing existing folders).
+
+        Returns:
+            int: Number of snippets added.
+        """
+        added = 0
+        for session in session_store.sessions(patient_name=patient_name, limit=-1):
+            added += self.add_session(session["summary"], transcript=session["transcript"], key=session["id"])
+        return added
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index(folder=None):
+    """
+    Returns the process-wide VectorIndex, creating it on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = VectorIndex(folder or VECTOR_INDEX_PATH)
+        return _index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from backend.session_store import get_session_store
+    from backend.settings import configure_logging
+
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Index saved sessions or search a patient's history.")
+    parser.add_argument("--backfill", action="store_true", help="Index every session in the session store.")
+    parser.add_argument("--patient", help="Patient to search (or to backfill only).")
+    parser.add_argument("--query", help="Text to search the patient's history for.")
+    args = parser.parse_args()
+
+    index = get_vector_index()
+    if args.backfill:
+        logging.info(f"Indexed {index.backfill(get_session_store(), args.patient)} snippets.")
+    if args.patient and args.query:
+        for hit in index.search(args.patient, args.query):
+            print(f"{hit['score']:.3f}  [{hit['date']}, {hit['kind']}] {hit['text'][:120]}")
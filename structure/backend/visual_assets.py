@@ -0,0 +1,128 @@
+import io
+import logging
+import os
+import threading
+
+from backend.cache import TTLCache
+from backend.telemetry import tracer
+
+
+class VisualAssetCache:
+    def __init__(self, assets, asset_dir="", max_size=(1280, 720), max_entries=16, image_format="JPEG", quality=85):
+        """
+        Decode, downscale and re-encode mood images once, then serve them from memory.
+
+        Args:
+            assets (dict): Image file name per emotional state.
+            asset_dir (str): Folder containing the images.
+            max_size (tuple): Bounding box (width, height) images are downscaled to.
+            max_entries (int): Maximum number of encoded images kept in memory.
+            image_format (str): Format of the encoded bytes ("JPEG" or "PNG").
+            quality (int): JPEG quality of the encoded bytes.
+        """
+        self.assets = dict(assets)
+        self.asset_dir = asset_dir
+        self.max_size = max_size
+        self.image_format = image_format
+        self.quality = quality
+        self._cache = TTLCache(max_entries=max_entries)
+        self._failed = {}  # name -> modification time of the file when it failed to load (None if missing)
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def _encode(self, path):
+        """
+        Read an image file and return it downscaled and encoded. Without Pillow the
+        original file bytes are returned unchanged.
+
+        Returns:
+            bytes: Encoded image.
+        """
+        try:
+            from PIL import Image
+        except ImportError:
+            logging.warning("Pillow is not installed, serving visuals without downscaling.")
+            with open(path, "rb") as file:
+                return file.read()
+
+        with Image.open(path) as image:
+            image.thumbnail(self.max_size)
+            if self.image_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, format=self.image_format, quality=self.quality, optimize=True)
+        return buffer.getvalue()
+
+    def _mtime(self, name):
+        try:
+            return os.path.getmtime(os.path.join(self.asset_dir, name))
+        except OSError:
+            return None
+
+    def get(self, name):
+        """
+        Return the encoded image for an asset name, decoding it on first use.
+        Concurrent requests for the same image wait for a single decode. A missing or
+        corrupt file is not read again until it is created or modified.
+
+        Args:
+            name (str): Asset file name, e.g. "sunrise.jpg".
+
+        Returns:
+            bytes: Encoded image, or None if it could not be loaded.
+        """
+        data = self._cache.get(name)
+        if data is not None:
+            return data
+        if name in self._failed and self._failed[name] == self._mtime(name):
+            return None
+
+        with self._lock:
+            event = self._loading.get(name)
+            owner = event is None
+            if owner:
+                event = self._loading[name] = threading.Event()
+        if not owner:
+            event.wait()
+            return self._cache.get(name)
+
+        mtime = self._mtime(name)
+        try:
+            with tracer.span("visual.decode_asset", asset=name) as span:
+                data = self._encode(os.path.join(self.asset_dir, name))
+                span.set(bytes=len(data))
+            self._cache.set(name, data)
+            self._failed.pop(name, None)
+            return data
+        except Exception as e:
+            logging.error(f"Error loading visual {name}: {e}")
+            self._failed[name] = mtime
+            return None
+        finally:
+            with self._lock:
+                del self._loading[name]
+            event.set()
+
+    def get_for_state(self, emotional_state, default_state="neutral"):
+        """
+        Returns:
+            bytes: Encoded image for an emotional state (or the default state's image).
+        """
+        name = self.assets.get(emotional_state) or self.assets.get(default_state)
+        return self.get(name) if name else None
+
+    def preload(self, background=True):
+        """
+        Decode every known asset ahead of time.
+
+        Args:
+            background (bool): Load from a daemon thread instead of blocking the caller.
+        """
+        def load_all():
+            for name in set(self.assets.values()):
+                self.get(name)
+
+        if background:
+            threading.Thread(target=load_all, daemon=True, name="visual-preload").start()
+        else:
+            load_all()
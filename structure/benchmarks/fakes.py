@@ -0,0 +1,378 @@
+"""
+Deterministic local stand-ins for the external services used by the agents.
+"""
+import hashlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+import wave
+from array import array
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.vector_index import HashingEmbedder
+
+# Sentences the fake Whisper server draws from, mixing calm, tense and low moments
+SESSION_SENTENCES = (
+    "I have been feeling anxious and stressed about work lately.",
+    "Every morning I worry that something will go wrong.",
+    "My manager keeps adding pressure and I feel overwhelmed.",
+    "Last weekend I went for a walk by the sea and felt calm.",
+    "I felt relaxed and safe with my family for the first time in weeks.",
+    "Some days I am just tired and sad and everything feels empty.",
+    "I did not sleep well and I felt alone most of the evening.",
+    "We talked about the schedule for next week and the new office.",
+    "I am proud of the progress I made with the breathing exercises.",
+    "I was really happy when my friend called me on Sunday.",
+    "Sometimes I get angry and frustrated when people do not listen.",
+    "I think the exercises help me feel better when I panic.",
+)
+
+SUMMARY_TEXT = (
+    "Overview: The patient described work-related stress, poor sleep and moments of calm with family.\n\n"
+    "Key Insights: Breathing exercises help during panic episodes; workload remains the main trigger.\n\n"
+    "Emotions or States: Anxiety, stress, sadness, and relief after calming activities.\n\n"
+    "Therapeutic Goals: Continue breathing exercises, set boundaries at work and improve sleep routine."
+)
+
+
+def _tone_block(rate, pitch, rng):
+    """One second of a speech-like modulated tone with a little noise."""
+    block = array("h")
+    for i in range(rate):
+        t = i / rate
+        envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 4 * t)
+        value = envelope * (math.sin(2 * math.pi * pitch * t) + 0.3 * math.sin(2 * math.pi * 3 * pitch * t))
+        block.append(int(8000 * value) + rng.randint(-200, 200))
+    return block
+
+
+def synthesize_session(path, duration, rate=44100, channels=1, seed=0):
+    """
+    Write a deterministic speech-like 16-bit WAV: utterances of modulated tones (2-8 s)
+    separated by quiet pauses (0.3-1.5 s), streamed to disk so long sessions stay cheap.
+
+    Args:
+        path (str): Output WAV path.
+        duration (float): Length in seconds.
+        rate (int): Sample rate in Hz.
+        channels (int): Number of channels (the same signal on each).
+        seed (int): Random seed of the utterance/pause pattern.
+
+    Returns:
+        str: The path.
+    """
+    rng = random.Random(seed)
+    voices = [_tone_block(rate, pitch, rng) for pitch in (110, 140, 170, 200, 230)]
+    silence = array("h", (rng.randint(-60, 60) for _ in range(rate)))
+    total = int(duration * rate)
+    written = 0
+    speaking = False
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        while written < total:
+            speaking = not speaking
+            length = min(total - written, int(rate * (rng.uniform(2, 8) if speaking else rng.uniform(0.3, 1.5))))
+            source = rng.choice(voices) if speaking else silence
+            mono = array("h")
+            while len(mono) < length:
+                offset = rng.randrange(rate // 2)
+                mono.extend(source[offset:offset + min(rate - offset, length - len(mono))])
+            if channels > 1:
+                frames = array("h", bytes(2 * length * channels))
+                for channel in range(channels):
+                    frames[channel::channels] = mono
+                mono = frames
+            if sys.byteorder == "big":
+                mono.byteswap()
+            wf.writeframes(mono.tobytes())
+            written += length
+    return path
+
+
+# Path suffix -> name of the endpoint in FakeOpenAIServer.stats
+ENDPOINTS = {
+    "/audio/transcriptions": "transcriptions",
+    "/chat/completions": "chat",
+    "/embeddings": "embeddings",
+}
+
+
+class FakeOpenAIServer:
+    def __init__(self, latency=0.2, chat_latency=0.5, embed_latency=0.05, upload_bandwidth=None, seed=0,
+                 host="127.0.0.1", port=0):
+        """
+        Local HTTP server answering the Whisper, chat completion and embedding endpoints of the
+        OpenAI API with deterministic content and configurable latency. Embeddings
+        are computed locally with the hashing embedder.
+
+        Args:
+            latency (float): Seconds added to each transcription request.
+            chat_latency (float): Seconds added to each chat request.
+            embed_latency (float): Seconds added to each embedding request.
+            upload_bandwidth (float): Simulated uplink in bytes per second (None for no upload delay).
+            seed (int): Seed of the generated transcripts.
+            host (str): Interface to listen on.
+            port (int): Port to listen on (0 picks a free port).
+        """
+        self.latency = latency
+        self.chat_latency = chat_latency
+        self.embed_latency = embed_latency
+        self.upload_bandwidth = upload_bandwidth
+        self.seed = seed
+        self.embedder = HashingEmbedder(dim=256)
+        self.stats = defaultdict(lambda: {"requests": 0, "bytes_in": 0, "bytes_out": 0})
+        self.api_keys = defaultdict(int)  # requests per API key sent in the Authorization header
+        self._failures = defaultdict(int)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="fake-openai")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats.clear()
+            self.api_keys.clear()
+
+    def fail_next(self, endpoint, count=1):
+        """
+        Answer the next requests to an endpoint with a server error, to exercise retries.
+
+        Args:
+            endpoint (str): "transcriptions", "chat" or "embeddings".
+            count (int): Number of requests that fail.
+        """
+        with self._lock:
+            self._failures[endpoint] += count
+
+    def _take_failure(self, endpoint):
+        with self._lock:
+            if self._failures[endpoint] <= 0:
+                return False
+            self._failures[endpoint] -= 1
+            return True
+
+    def _record_key(self, authorization):
+        with self._lock:
+            self.api_keys[authorization.split(" ")[-1]] += 1
+
+    def _record(self, endpoint, bytes_in, bytes_out):
+        with self._lock:
+            stats = self.stats[endpoint]
+            stats["requests"] += 1
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+
+    def transcript_for(self, body):
+        """Deterministic transcript for an upload: about one sentence per 4 KB of audio."""
+        rng = random.Random(int(hashlib.sha256(body).hexdigest()[:8], 16) ^ self.seed)
+        return " ".join(rng.choice(SESSION_SENTENCES) for _ in range(max(1, len(body) // 4096)))
+
+    def chat_reply(self, request):
+        messages = request.get("messages", [])
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        if "Spotify" in system:
+            return "relaxing piano instrumental"
+        if "one segment" in system:
+            return "Notes: the patient discussed stress at work, poor sleep and calming walks."
+        return SUMMARY_TEXT
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server._record_key(self.headers.get("Authorization", ""))
+                endpoint = next((name for suffix, name in ENDPOINTS.items() if self.path.endswith(suffix)), None)
+                if endpoint is not None and server._take_failure(endpoint):
+                    data = json.dumps({"error": {"message": "Injected failure", "type": "server_error"}}).encode()
+                    server._record(endpoint, len(body), len(data))
+                    self.send_response(500)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                if self.path.endswith("/audio/transcriptions"):
+                    delay = server.latency
+                    if server.upload_bandwidth:
+                        delay += len(body) / server.upload_bandwidth
+                    time.sleep(delay)
+                    payload = {"text": server.transcript_for(body)}
+                    endpoint = "transcriptions"
+                elif self.path.endswith("/chat/completions"):
+                    request = json.loads(body or b"{}")
+                    content = server.chat_reply(request)
+                    time.sleep(server.chat_latency)
+                    if request.get("stream"):
+                        self._stream(content, len(body))
+                        return
+                    prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+                    payload = {
+                        "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                        "model": request.get("model", "gpt-4"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                                  "total_tokens": prompt_tokens + len(content) // 4},
+                    }
+                    endpoint = "chat"
+                elif self.path.endswith("/embeddings"):
+                    request = json.loads(body or b"{}")
+                    time.sleep(server.embed_latency)
+                    texts = request.get("input", [])
+                    texts = [texts] if isinstance(texts, str) else texts
+                    # Local hashed vectors, so similar texts get similar embeddings
+                    vectors = server.embedder.embed(texts)
+                    payload = {
+                        "object": "list", "model": request.get("model"),
+                        "data": [{"object": "embedding", "index": i, "embedding": vector.tolist()}
+                                 for i, vector in enumerate(vectors)],
+                        "usage": {"prompt_tokens": sum(len(t) for t in texts) // 4,
+                                  "total_tokens": sum(len(t) for t in texts) // 4},
+                    }
+                    endpoint = "embeddings"
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(payload).encode("utf-8")
+                # Recorded before replying, so the stats are complete once the client has the response
+                server._record(endpoint, len(body), len(data))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, content, bytes_in):
+                # Server-sent events, one word per chunk, paced at about 50 words per second
+                events = []
+                for i, word in enumerate(content.split(" ")):
+                    piece = word if i == 0 else " " + word
+                    chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    events.append(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                server._record("chat", bytes_in, sum(len(data) for data in events))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for data in events:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+                    time.sleep(0.02)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        return Handler
+
+
+class FakeSpotify:
+    def __init__(self, latency=0.05, devices=1):
+        """
+        In-process stand-in for spotipy.Spotify with deterministic search results.
+
+        Args:
+            latency (float): Seconds added to each call.
+            devices (int): Number of playback devices reported.
+        """
+        self.latency = latency
+        self._devices = [{"id": f"device-{i}", "name": f"Speaker {i}", "is_active": i == 0} for i in range(devices)]
+        self.calls = defaultdict(int)
+        self.now_playing = None
+
+    def search(self, q, limit=1, type="track"):
+        self.calls["search"] += 1
+        time.sleep(self.latency)
+        digest = hashlib.sha256(q.encode("utf-8")).hexdigest()
+        results = {}
+        for kind in type.split(","):
+            items = []
+            for i in range(limit):
+                item = {"uri": f"spotify:{kind}:{digest[:16]}{i}", "name": f"{q.title()} {kind} {i}"}
+                if kind != "playlist":
+                    item["artists"] = [{"name": "Benchmark Ensemble"}]
+                items.append(item)
+            results[f"{kind}s"] = {"items": items}
+        return results
+
+    def devices(self):
+        self.calls["devices"] += 1
+        time.sleep(self.latency)
+        return {"devices": list(self._devices)}
+
+    def start_playback(self, device_id=None, uris=None, context_uri=None):
+        self.calls["start_playback"] += 1
+        time.sleep(self.latency)
+        self.now_playing = (device_id, uris[0] if uris else context_uri)
+
+
+class FakeHueBridge:
+    def __init__(self, lights=6, latency=0.02, groups=None):
+        """
+        In-process stand-in for phue.Bridge keeping the state of a few lights.
+
+        Args:
+            lights (int): Number of lights on the bridge.
+            latency (float): Seconds added to each request.
+            groups (dict): Light ids of each group besides group 0, e.g. {1: [1, 2, 3]}.
+        """
+        self.latency = latency
+        self.lights = {i: {"on": False, "xy": [0.33, 0.33], "bri": 254} for i in range(1, lights + 1)}
+        self.groups = groups or {}
+        self.calls = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get_api(self):
+        self.calls["get_api"] += 1
+        time.sleep(self.latency)
+        with self._lock:
+            return {
+                "lights": {str(i): {"state": dict(state)} for i, state in self.lights.items()},
+                "groups": {str(g): {"lights": [str(i) for i in ids]} for g, ids in self.groups.items()},
+            }
+
+    def _apply(self, light_id, command):
+        state = self.lights[light_id]
+        for key in ("on", "xy", "bri"):
+            if key in command:
+                state[key] = command[key]
+
+    def set_group(self, group_id, command):
+        self.calls["set_group"] += 1
+        time.sleep(self.latency)
+        with self._lock:
+            for light_id in self.groups.get(group_id, self.lights) if group_id != 0 else self.lights:
+                self._apply(light_id, command)
+
+    def set_light(self, light_id, command):
+        self.calls["set_light"] += 1
+        time.sleep(self.latency)
+        with self._lock:
+            self._apply(light_id, command)
+
+    def activate_scene(self, group_id, scene_id, transition_time=None):
+        self.calls["activate_scene"] += 1
+        time.sleep(self.latency)
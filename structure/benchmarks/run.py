@@ -0,0 +1,322 @@
+"""
+Offline end-to-end benchmark: drives the agents and the session pipeline against local
+stand-ins (a fake OpenAI server, Spotify client and Hue bridge, and synthesized session
+recordings replayed as the microphone) and reports per-stage latency, throughput, peak
+memory and bytes transferred.
+
+Run from the structure folder:
+    python benchmarks/run.py [--minutes 30] [--repeat 3] [--json results.json]
+    python benchmarks/run.py --save-baseline            # store benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json --threshold 0.2
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+STRUCTURE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(STRUCTURE_DIR)
+
+from benchmarks.fakes import SESSION_SENTENCES, SUMMARY_TEXT, FakeHueBridge, FakeOpenAIServer, FakeSpotify, synthesize_session  # noqa: E402
+from backend.agents.audio_agent import AudioAgent  # noqa: E402
+from backend.agents.music_agent import MusicAgent  # noqa: E402
+from backend.agents.visual_environment_agent import VisualLightAgent  # noqa: E402
+from backend.mood_tracker import MoodTracker  # noqa: E402
+from backend.orchestrator import TherapySessionManager  # noqa: E402
+from backend.streaming import WavFileSource  # noqa: E402
+from backend.telemetry import current_span, tracer  # noqa: E402
+from backend.vector_index import OpenAIEmbedder, VectorIndex  # noqa: E402
+from integrations.openai_config import OpenAIConfig  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+MOODS = ("calm", "uplifting", "neutral", "anxious", "sad")
+# Metrics compared against the baseline; higher is worse for all of them
+COMPARED_METRICS = ("p95_ms", "peak_memory_bytes", "bytes_uploaded")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def synthetic_transcript(minutes, words_per_minute=140):
+    """Deterministic transcript of about the length spoken in the given number of minutes."""
+    sentences = itertools.cycle(SESSION_SENTENCES)
+    words = []
+    while len(words) < minutes * words_per_minute:
+        words.extend(next(sentences).split())
+    return " ".join(words)
+
+
+class Bench:
+    def __init__(self, minutes=30, live_minutes=5, repeat=3, events=50, latency=0.2, chat_latency=0.5,
+                 upload_bandwidth=None, history_sessions=20, workdir=None):
+        """
+        Builds the agents against the local stand-ins.
+
+        Args:
+            minutes (float): Length of the recorded session used for batch transcription.
+            live_minutes (float): Length of the session replayed through live transcription.
+            repeat (int): Iterations of each audio and summary scenario.
+            events (int): Mood changes applied in the music and lighting scenarios.
+            latency (float): Fake Whisper latency per request in seconds.
+            chat_latency (float): Fake chat completion latency in seconds.
+            upload_bandwidth (float): Simulated uplink in bytes per second (None for unlimited).
+            history_sessions (int): Past sessions of the patient in the history index.
+            workdir (str): Folder for the synthesized recordings (a temporary one by default).
+        """
+        self.minutes = minutes
+        self.live_minutes = live_minutes
+        self.repeat = repeat
+        self.events = events
+        self.workdir = workdir or tempfile.mkdtemp(prefix="moodsync-bench-")
+        self.server = FakeOpenAIServer(latency=latency, chat_latency=chat_latency,
+                                       upload_bandwidth=upload_bandwidth).start()
+        self.openai_config = OpenAIConfig(api_key="sk-benchmark", api_base=self.server.url)
+        self.spotify = FakeSpotify()
+        self.hue = FakeHueBridge()
+
+        patient_data = {"name": "Benchmark Patient", "age": 35, "condition": "anxiety"}
+        # Past sessions, so summaries retrieve history from a populated index
+        self.vector_index = VectorIndex(os.path.join(self.workdir, "vector_index"), OpenAIEmbedder(self.openai_config))
+        for i in range(history_sessions):
+            rng = random.Random(i)
+            past = {"patient_name": patient_data["name"], "date": f"2024-{i // 28 + 1:02d}-{i % 28 + 1:02d}",
+                    "summary": SUMMARY_TEXT}
+            self.vector_index.add_session(past, " ".join(rng.choice(SESSION_SENTENCES) for _ in range(100)), key=i)
+        self.audio_agent = AudioAgent(openai_api_key="sk-benchmark", patient_data=patient_data, use_cache=False,
+                                      openai_config=self.openai_config, vector_index=self.vector_index)
+        self.music_agent = MusicAgent(None, None, None, openai_api_key="sk-benchmark",
+                                      openai_config=self.openai_config, spotify_client=self.spotify)
+        self.visual_agent = VisualLightAgent(bridge_ip=None, bridge=self.hue, preload_visuals=False)
+        self.manager = TherapySessionManager(self.music_agent, self.visual_agent, self.audio_agent)
+
+        self.session_file = synthesize_session(os.path.join(self.workdir, "session.wav"), minutes * 60)
+        self.short_file = synthesize_session(os.path.join(self.workdir, "short.wav"), 120, seed=1)
+        self.live_file = synthesize_session(os.path.join(self.workdir, "live.wav"), live_minutes * 60, seed=2)
+
+    def close(self):
+        self.music_agent.stop_device_refresh()
+        self.server.stop()
+
+    def transcribe_long(self):
+        self.audio_agent.transcribe_long_audio(self.session_file)
+        return self.minutes * 60
+
+    def summarize(self):
+        self.audio_agent.summarize_transcript(synthetic_transcript(self.minutes))
+        return 1
+
+    def incremental_summary(self):
+        # Live windows of about 10 s of speech, folded into the running summary as they arrive
+        summarizer = self.audio_agent.incremental_summarizer()
+        words = synthetic_transcript(self.live_minutes).split()
+        for i in range(0, len(words), 25):
+            summarizer.on_partial(i // 25, " ".join(words[i:i + 25]), " ".join(words[:i + 25]))
+        self.audio_agent.finish_incremental_summary(summarizer)
+        return 1
+
+    def music(self):
+        for mood in itertools.islice(itertools.cycle(MOODS), self.events):
+            self.music_agent.play_music_based_on_emotion(mood)
+        return self.events
+
+    def lighting(self):
+        for mood in itertools.islice(itertools.cycle(MOODS), self.events):
+            self.visual_agent.adjust_lighting(mood)
+        return self.events
+
+    def session(self):
+        # Keep the pipeline's spans in the benchmark's session
+        self.manager.process_audio(self.short_file, session_id=current_span().session_id)
+        return 120
+
+    def live(self):
+        tracker = MoodTracker(music_agent=self.music_agent, visual_agent=self.visual_agent, cooldown=0, min_words=3)
+        streamer = self.audio_agent.stream_transcription(WavFileSource(self.live_file, realtime=False),
+                                                         record=False, mood_tracker=tracker)
+        streamer.join()
+        tracker.close()
+        return self.live_minutes * 60
+
+    # name -> (method, iterations, unit of the throughput)
+    def scenarios(self):
+        return {
+            "transcribe_long": (self.transcribe_long, self.repeat, "audio_s/s"),
+            "summarize": (self.summarize, self.repeat, "summaries/s"),
+            "incremental_summary": (self.incremental_summary, self.repeat, "summaries/s"),
+            "music": (self.music, 1, "events/s"),
+            "lighting": (self.lighting, 1, "events/s"),
+            "session": (self.session, self.repeat, "audio_s/s"),
+            "live": (self.live, 1, "audio_s/s"),
+        }
+
+    def _call(self, name):
+        with tracer.session() as session_id, tracer.span(f"bench.{name}"):
+            return self.scenarios()[name][0](), session_id
+
+    def peak_memory(self, name):
+        """
+        Peak Python memory allocated during one iteration of a scenario. Measured in a
+        separate pass since tracemalloc slows pure-Python code down several times.
+
+        Returns:
+            int: Bytes.
+        """
+        tracemalloc.start()
+        try:
+            self._call(name)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def run_scenario(self, name, memory=True):
+        """
+        Run one scenario and aggregate its spans.
+
+        Args:
+            name (str): Scenario name (see scenarios()).
+            memory (bool): Also measure the peak memory of one extra iteration.
+
+        Returns:
+            dict: Latency percentiles, throughput, peak memory and bytes, overall and per stage.
+        """
+        _, iterations, unit = self.scenarios()[name]
+        # The fakes are shared by all scenarios: count only this one's requests
+        self.server.reset_stats()
+        self.spotify.calls.clear()
+        self.hue.calls.clear()
+        durations, spans, work = [], [], 0
+        for _ in range(iterations):
+            start = time.perf_counter()
+            amount, session_id = self._call(name)
+            durations.append(time.perf_counter() - start)
+            work += amount
+            spans.extend(tracer.spans(session_id))
+        server = {endpoint: dict(stats) for endpoint, stats in self.server.stats.items()}
+        spotify_calls, hue_calls = dict(self.spotify.calls), dict(self.hue.calls)
+        peak = self.peak_memory(name) if memory else None
+
+        stages = {}
+        for span in spans:
+            stage = stages.setdefault(span.name, {"calls": 0, "durations": [], "errors": 0, "bytes_uploaded": 0})
+            stage["calls"] += 1
+            stage["durations"].append(span.duration * 1000)
+            stage["errors"] += span.status == "error"
+            stage["bytes_uploaded"] += span.attributes.get("bytes_uploaded", 0)
+        for stage in stages.values():
+            durations_ms = stage.pop("durations")
+            stage["p50_ms"] = round(statistics.median(durations_ms), 2)
+            stage["p95_ms"] = round(percentile(durations_ms, 0.95), 2)
+
+        return {
+            "iterations": iterations,
+            "p50_ms": round(statistics.median(durations) * 1000, 1),
+            "p95_ms": round(percentile(durations, 0.95) * 1000, 1),
+            "throughput": round(work / sum(durations), 2),
+            "throughput_unit": unit,
+            "peak_memory_bytes": peak,
+            "bytes_uploaded": sum(stats["bytes_in"] for stats in server.values()),
+            "bytes_downloaded": sum(stats["bytes_out"] for stats in server.values()),
+            "server": server,
+            "spotify_calls": spotify_calls,
+            "hue_calls": hue_calls,
+            "stages": dict(sorted(stages.items())),
+        }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results against a baseline run.
+
+    Returns:
+        list: (scenario, metric, baseline value, current value) for every metric that
+        grew by more than threshold (a fraction) relative to the baseline.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), current.get(metric)
+            if before and after is not None and after > before * (1 + threshold):
+                regressions.append((name, metric, before, after))
+    return regressions
+
+
+def print_report(results):
+    for name, scenario in results["scenarios"].items():
+        print(f"{name}: p50 {scenario['p50_ms']:.0f} ms, p95 {scenario['p95_ms']:.0f} ms, "
+              f"{scenario['throughput']} {scenario['throughput_unit']}, "
+              + (f"peak {scenario['peak_memory_bytes'] / 2 ** 20:.1f} MB, " if scenario["peak_memory_bytes"] else "") +
+              f"up {scenario['bytes_uploaded'] / 2 ** 10:.0f} KB, down {scenario['bytes_downloaded'] / 2 ** 10:.0f} KB")
+        for stage, row in scenario["stages"].items():
+            uploaded = f", {row['bytes_uploaded'] / 2 ** 10:.0f} KB up" if row["bytes_uploaded"] else ""
+            errors = f", {row['errors']} errors" if row["errors"] else ""
+            print(f"    {stage:28s} {row['calls']:5d} calls  p50 {row['p50_ms']:9.1f} ms  "
+                  f"p95 {row['p95_ms']:9.1f} ms{uploaded}{errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline MoodSync benchmarks.")
+    parser.add_argument("--scenarios", nargs="+", help="Scenarios to run (default: all).")
+    parser.add_argument("--minutes", type=float, default=30, help="Length of the recorded session in minutes.")
+    parser.add_argument("--live-minutes", type=float, default=5, help="Length of the replayed live session.")
+    parser.add_argument("--repeat", type=int, default=3, help="Iterations of the audio and summary scenarios.")
+    parser.add_argument("--events", type=int, default=50, help="Mood changes in the music and lighting scenarios.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake Whisper latency in seconds.")
+    parser.add_argument("--chat-latency", type=float, default=0.5, help="Fake chat completion latency in seconds.")
+    parser.add_argument("--upload-bandwidth", type=float, help="Simulated uplink in bytes per second.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the (slow) peak memory pass.")
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare against this results file and fail on regressions.")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Store the results as the baseline.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed growth over the baseline (0.2 = 20%%).")
+    args = parser.parse_args()
+
+    bench = Bench(minutes=args.minutes, live_minutes=args.live_minutes, repeat=args.repeat, events=args.events,
+                  latency=args.latency, chat_latency=args.chat_latency, upload_bandwidth=args.upload_bandwidth)
+    names = args.scenarios or list(bench.scenarios())
+    results = {
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("json", "baseline", "save_baseline", "threshold", "scenarios", "no_memory")},
+        "scenarios": {},
+    }
+    try:
+        for name in names:
+            print(f"Running {name}...")
+            results["scenarios"][name] = bench.run_scenario(name, memory=not args.no_memory)
+    finally:
+        bench.close()
+
+    print_report(results)
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as file:
+                json.dump(results, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("config") != results["config"]:
+            print("Warning: the baseline was recorded with different settings.")
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name}.{metric}: {before} -> {after} (+{(after / before - 1) * 100:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression over {args.threshold * 100:.0f}% against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Cold-start benchmark: import time of the agent modules in a fresh interpreter,
+and the time to spawn a job worker process.
+
+Run from the structure folder:
+    python benchmarks/startup.py [--runs 5] [--budget-ms 500]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+STRUCTURE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(STRUCTURE_DIR)
+
+MODULES = (
+    "backend.agents.audio_agent",
+    "backend.agents.music_agent",
+    "backend.agents.visual_environment_agent",
+    "backend.orchestrator",
+    "backend.jobs",
+    "backend.registry",
+)
+
+_IMPORT_SNIPPET = (
+    "import sys, time; sys.path.append({path!r}); start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def import_time(module, runs=5):
+    """
+    Median time to import a module in a fresh interpreter.
+
+    Returns:
+        float: Seconds, or None if the module cannot be imported here.
+    """
+    times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET.format(path=STRUCTURE_DIR, module=module)],
+            capture_output=True, text=True, cwd=STRUCTURE_DIR,
+        )
+        if result.returncode != 0:
+            print(f"  {module}: import failed ({result.stderr.strip().splitlines()[-1]})")
+            return None
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def slowest_imports(module, limit=5):
+    """
+    Returns:
+        list: (cumulative seconds, module) of the slowest top-level imports, from python -X importtime.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.append({STRUCTURE_DIR!r}); import {module}"],
+        capture_output=True, text=True, cwd=STRUCTURE_DIR,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        # Only modules imported directly by the measured one or by the backend package
+        if name.startswith("  ") and not name.strip().startswith(("backend", "integrations")):
+            continue
+        rows.append((int(parts[1]) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def _worker_ready(queue):
+    import backend.jobs  # noqa: F401
+
+    queue.put(time.perf_counter())
+
+
+def worker_spawn_time(runs=3):
+    """
+    Median time from starting a spawned process until it has imported the job worker module.
+
+    Returns:
+        float: Seconds.
+    """
+    context = multiprocessing.get_context("spawn")
+    times = []
+    for _ in range(runs):
+        queue = context.Queue()
+        start = time.perf_counter()
+        process = context.Process(target=_worker_ready, args=(queue,))
+        process.start()
+        ready = queue.get(timeout=60)
+        process.join()
+        times.append(ready - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure MoodSync cold-start times.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement (the median is reported).")
+    parser.add_argument("--budget-ms", type=float, help="Fail if a module takes longer than this to import.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = {"imports": {}, "worker_spawn": None}
+    print("Import time (fresh interpreter, median):")
+    for module in MODULES:
+        seconds = import_time(module, args.runs)
+        results["imports"][module] = seconds
+        if seconds is not None:
+            print(f"  {module:45s} {seconds * 1000:8.1f} ms")
+            for cumulative, name in slowest_imports(module):
+                print(f"      {cumulative * 1000:8.1f} ms  {name}")
+
+    try:
+        results["worker_spawn"] = worker_spawn_time(max(1, args.runs // 2))
+        print(f"Worker spawn (spawn start method, until backend.jobs is imported): "
+              f"{results['worker_spawn'] * 1000:.1f} ms")
+    except Exception as e:
+        print(f"Worker spawn failed: {e}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if args.budget_ms is not None:
+        over = {m: s for m, s in results["imports"].items() if s is not None and s * 1000 > args.budget_ms}
+        if over:
+            print(f"Over the {args.budget_ms:.0f} ms budget: {', '.join(over)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
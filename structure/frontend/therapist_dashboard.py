@@ -1,18 +1,30 @@
+import pandas as pd
 import streamlit as st
 from datetime import datetime
 import json
 import sys
 import os
-from dotenv import load_dotenv
+import threading
+import time
+import uuid
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from backend.agents.audio_agent import AudioAgent
+from backend.agents.audio_agent import AudioAgent, save_summary_to_json, summary_file_name
+from backend.analytics import DIMENSIONS, get_mood_analytics
+from backend.jobs import DONE, FAILED, JobQueue, WorkerPool
+from backend.mood_tracker import MoodTracker
+from backend.registry import get_registry, warm_imports
+from backend.settings import configure_logging
+from backend.telemetry import tracer
 
-load_dotenv()
+configure_logging()
 
 # Constants
 openai_api_key = os.getenv("OPENAI_API_KEY")
 output_folder = "./saved_outputs"
+POLL_INTERVAL = 1.0  # seconds between page refreshes while background jobs run
+LIVE_REFRESH_INTERVAL = 2.0  # seconds between page refreshes during live transcription
+TREND_WINDOW = 5  # sessions averaged in the mood trend chart
 
 # Configure Streamlit app
 st.set_page_config(
@@ -22,6 +34,93 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+
+@st.cache_resource
+def get_agent_registry():
+    """
+    Shared components, warmed up in the background on the first page load so
+    the first transcription or summary does not wait for imports and connections.
+    """
+    warm_imports()
+    registry = get_registry()
+    registry.warm(["openai", "sentiment", "session_store", "mood_analytics", "music", "visual"])
+    return registry
+
+
+@st.cache_resource(max_entries=16)
+def get_audio_agent(name, age, history):
+    """
+    One AudioAgent per patient, shared across reruns instead of being rebuilt on every interaction.
+    """
+    return AudioAgent(
+        openai_api_key=openai_api_key,
+        patient_data={
+            "name": name,
+            "age": age,
+            "history": history,
+        },
+        target_language="en",
+        sentiment_backend=get_agent_registry().get("sentiment"),
+    )
+
+
+@st.cache_resource
+def get_job_queue():
+    """
+    Persistent job queue shared with the worker processes. Unless MOODSYNC_EXTERNAL_WORKERS is set
+    (workers started separately with `python -m backend.jobs`), a small local pool is started with the app.
+    """
+    if not os.getenv("MOODSYNC_EXTERNAL_WORKERS"):
+        WorkerPool(processes=int(os.getenv("MOODSYNC_WORKERS", "2"))).start()
+    return JobQueue()
+
+
+@st.cache_data
+def summary_to_json(summary):
+    return json.dumps(summary, indent=4)
+
+
+def submit_job(name, kind, payload):
+    """
+    Queue a job once per session; later reruns poll the same job.
+
+    Args:
+        name (hashable): Job key in the session state.
+        kind (str): Job kind handled by the workers.
+        payload (dict): Job arguments.
+
+    Returns:
+        str: The job id.
+    """
+    jobs = st.session_state.setdefault("jobs", {})
+    if name not in jobs:
+        jobs[name] = get_job_queue().submit(kind, payload)
+    return jobs[name]
+
+
+def job_status(name):
+    """
+    Returns:
+        dict: Current state of a submitted job (status, progress, message, result), or None.
+    """
+    job_id = st.session_state.get("jobs", {}).get(name)
+    job = get_job_queue().get(job_id) if job_id else None
+    if job is not None:
+        # Spans recorded by the worker, shown in the timing panel with the page's own
+        tracer.import_spans(job["spans"])
+    return job
+
+
+def retry_job(name):
+    job_id = st.session_state.get("jobs", {}).get(name)
+    if job_id:
+        get_job_queue().retry(job_id)
+
+
+def show_progress(job, default_message):
+    st.progress(job["progress"] if job else 0.0, text=(job and job["message"]) or default_message)
+
+
 # App title and header
 st.title("🌊 Therapy Session Assistant")
 
@@ -32,71 +131,205 @@ patient_age = st.sidebar.number_input("Age", value=32, step=1)
 patient_history = st.sidebar.text_area("History", value="Anxiety and mild depression.")
 
 # Initialize AudioAgent
-audio_agent = AudioAgent(
-    openai_api_key=openai_api_key,
-    patient_data={
-        "name": patient_name,
-        "age": patient_age,
-        "history": patient_history,
-    },
-    target_language="en"
-)
+audio_agent = get_audio_agent(patient_name, int(patient_age), patient_history)
+
+# Telemetry spans of this browser session are grouped under one id
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
 
 # Record Audio
 st.header("🎙️ Step 1: Record Audio")
-audio_file = None
-stop_event = None
-recording_thread = None
-stream = None
-audio = None
-frames = []
 
 # Buttons for recording
 start_recording = st.button("Start Recording")
 stop_recording = st.button("Stop Recording")
 
-# Handle recording
-if start_recording:
-    with st.spinner("Recording in progress..."):
-        stop_event, recording_thread, audio_file, stream, audio, frames = audio_agent.capture_audio()
-        st.success("Recording started.")
+# Handle recording; the handle lives in the session state so it survives reruns
+if start_recording and "recording" not in st.session_state:
+    st.session_state["recording"] = audio_agent.start_recording(downsample=True)
+    st.success("Recording started.")
 
-if stop_recording and audio_file:
+if stop_recording and "recording" in st.session_state:
     with st.spinner("Stopping recording..."):
-        audio_file = audio_agent.stop_recording(stop_event, recording_thread, stream, audio, audio_file, frames)
+        audio_file = st.session_state.pop("recording").stop()
+        # A new recording starts a new set of jobs
+        st.session_state["audio_file"] = audio_file
+        st.session_state["jobs"] = {}
         st.success(f"Recording saved: {audio_file}")
 
-# Step 2: Transcription and Summarization
+if "recording" in st.session_state:
+    st.info("Recording in progress...")
+
+# Live transcription while the session is being recorded
+st.subheader("Live Transcription")
+live_col_start, live_col_stop = st.columns(2)
+if live_col_start.button("Start Live Transcription") and "live_transcriber" not in st.session_state:
+    # Mood switches play music and adjust the lights through the shared agents
+    registry = get_agent_registry()
+    st.session_state["mood_tracker"] = MoodTracker(
+        sentiment_backend=audio_agent.sentiment_backend,
+        music_agent=registry.get("music"),
+        visual_agent=registry.get("visual"),
+    )
+    # The summary is updated as the session goes, so it is ready right after it ends. Updates
+    # are written on a worker thread, which signals each new piece to the page through this event.
+    summary_written = st.session_state["live_summary_written"] = threading.Event()
+    st.session_state["live_summarizer"] = audio_agent.incremental_summarizer(
+        on_token=lambda piece: summary_written.set()
+    )
+    st.session_state.pop("live_summary", None)
+    with tracer.session(session_id):
+        st.session_state["live_transcriber"] = audio_agent.stream_transcription(
+            mood_tracker=st.session_state["mood_tracker"],
+            summarizer=st.session_state["live_summarizer"],
+        )
+    st.success("Live transcription started.")
+
+live_transcriber = st.session_state.get("live_transcriber")
+running_summary_placeholder = None
+if live_transcriber is not None:
+    if live_col_stop.button("Stop Live Transcription"):
+        with st.spinner("Finishing live transcription..."):
+            st.session_state["live_transcript"] = live_transcriber.stop()
+        st.session_state["live_audio_file"] = live_transcriber.output_file
+        del st.session_state["live_transcriber"]
+        st.session_state.pop("live_summary_written", None)
+
+        # Stream the last summary update into the page as it is written
+        summary_placeholder = st.empty()
+        pieces = []
+
+        def show_token(piece):
+            pieces.append(piece)
+            summary_placeholder.markdown("".join(pieces))
+
+        with tracer.session(session_id):
+            st.session_state["live_summary"] = audio_agent.finish_incremental_summary(
+                st.session_state.pop("live_summarizer"), on_token=show_token
+            )
+        summary_placeholder.empty()
+    else:
+        st.text_area("Partial Transcript", live_transcriber.text, height=150)
+        st.metric("Current Mood", st.session_state["mood_tracker"].mood.capitalize())
+        # Visual selected by the visual agent on the last mood switch
+        current_visual = get_agent_registry().get("visual").current_visual
+        if current_visual is not None:
+            st.image(current_visual, width=480)
+        # Filled at the end of the page, where summary updates are streamed in as they are written
+        running_summary_placeholder = st.empty()
+
+if st.session_state.get("live_transcript"):
+    st.text_area("Live Transcript", st.session_state["live_transcript"], height=150)
+
+live_summary = st.session_state.get("live_summary")
+if live_summary:
+    st.subheader("Live Session Summary")
+    st.write(live_summary)
+    if st.button("Save Live Session"):
+        live_audio_file = st.session_state.get("live_audio_file")
+        save_summary_to_json(live_summary, file_name=summary_file_name(live_audio_file),
+                             transcript=st.session_state.get("live_transcript"),
+                             mood=st.session_state["mood_tracker"].mood, audio_file=live_audio_file)
+        st.success("Session saved to the patient's history.")
+
+# Step 2: Transcription and Summarization, run by the job workers and polled by the page
+audio_file = st.session_state.get("audio_file")
+patient_data = {"name": patient_name, "age": int(patient_age), "history": patient_history}
+jobs_running = False
 if audio_file:
     st.header("📝 Step 2: Transcription and Summarization")
-    with st.spinner("Processing audio..."):
-        transcription_result = audio_agent.transcribe_audio(audio_file)
+    submit_job("transcript", "transcribe", {"audio_file": os.path.abspath(audio_file), "patient_data": patient_data,
+                                            "session_id": session_id})
+    transcript_job = job_status("transcript")
 
-    if transcription_result:
+    if transcript_job["status"] not in (DONE, FAILED):
+        jobs_running = True
+        show_progress(transcript_job, "Processing audio...")
+    elif transcript_job["status"] == DONE:
+        transcription_result = transcript_job["result"]["transcript"]
         st.subheader("Transcription")
         st.text_area("Transcript", transcription_result, height=200)
 
-        with st.spinner("Generating session summary..."):
-            summary = audio_agent.summarize_transcript(transcription_result)
+        # Keyed on the patient details so editing them in the sidebar produces a new summary
+        summary_job = ("summary", patient_name, int(patient_age), patient_history)
+        submit_job(summary_job, "summarize", {"transcript": transcription_result, "patient_data": patient_data,
+                                              "session_id": session_id})
+        summary_status = job_status(summary_job)
 
-        if summary:
+        if summary_status["status"] not in (DONE, FAILED):
+            jobs_running = True
+            show_progress(summary_status, "Generating session summary...")
+        elif summary_status["status"] == DONE:
+            summary = summary_status["result"]
             st.subheader("Session Summary")
             st.markdown(f"**Date**: {datetime.today().strftime('%Y-%m-%d')}")
             st.markdown("**Overview**")
             st.write(summary)
-            
+
             # Export or download summary
             session_date = datetime.today().strftime('%Y-%m-%d')
             file_name = f"{patient_name.replace(' ', '_')}_session_summary_{session_date}.json"
-            json_data = json.dumps(summary, indent=4)
 
             st.download_button(
                 label="Download Summary as JSON",
-                data=json_data,
+                data=summary_to_json(summary),
                 file_name=file_name,
                 mime="application/json",
             )
+            if st.button("Save Session"):
+                save_summary_to_json(summary, file_name=summary_file_name(audio_file), transcript=transcription_result,
+                                     mood=transcript_job["result"].get("mood"), audio_file=audio_file)
+                st.success("Session saved to the patient's history.")
         else:
-            st.error("Summary generation failed.")
+            st.error(f"Summary generation failed: {summary_status['error']}")
+            if st.button("Retry Summary"):
+                retry_job(summary_job)
+                st.rerun()
     else:
-        st.error("Transcription failed. Please try again.")
+        st.error(f"Transcription failed: {transcript_job['error']}")
+        if st.button("Retry Transcription"):
+            retry_job("transcript")
+            st.rerun()
+
+# Mood trends across the patient's saved sessions
+st.header("📈 Mood Trends")
+trend = get_mood_analytics().trend(patient_name)
+top_emotions = [emotion for emotion, _ in trend.top_emotions(5)]
+if top_emotions:
+    dates, rolling = trend.rolling_mean(TREND_WINDOW)
+    st.caption(f"Share of the last {TREND_WINDOW} sessions mentioning each of the patient's most frequent emotions.")
+    st.line_chart(pd.DataFrame(
+        rolling[:, [DIMENSIONS.index(emotion) for emotion in top_emotions]],
+        index=pd.to_datetime(dates),
+        columns=top_emotions,
+    ))
+else:
+    st.caption("No saved sessions for this patient yet.")
+
+# Per-session timing panel
+timings = tracer.summary(session_id)
+if timings:
+    with st.expander("⏱️ Session Timings"):
+        st.caption("Wall time, uploaded bytes, tokens and cache hits per operation in this session.")
+        st.table(timings)
+
+# During live transcription, stream the running summary into its placeholder until the next
+# refresh, and finish an update that is being written before refreshing
+if running_summary_placeholder is not None:
+    live_summarizer = st.session_state["live_summarizer"]
+    summary_written = st.session_state["live_summary_written"]
+    refresh_at = time.monotonic() + LIVE_REFRESH_INTERVAL
+    shown = None
+    while True:
+        if live_summarizer.draft != shown:
+            shown = live_summarizer.draft
+            running_summary_placeholder.markdown(f"**Running Summary**\n\n{shown}" if shown else "")
+        if time.monotonic() >= refresh_at and not live_summarizer.updating:
+            break
+        summary_written.wait(0.2)
+        summary_written.clear()
+    st.rerun()
+
+# Poll until the background jobs are done
+if jobs_running:
+    time.sleep(POLL_INTERVAL)
+    st.rerun()
@@ -1,44 +1,391 @@
 import os
-import openai
-from dotenv import load_dotenv 
+import asyncio
+import contextvars
+import logging
+import random
+import threading
+import time
+
+import backend.settings  # noqa: F401  (loads the .env file)
+from backend.telemetry import current_span, tracer
+
+# The openai SDK takes a noticeable time to import, so it is loaded when the first client is created
+openai = None
+# Errors worth retrying: rate limits, timeouts and transient server/connection failures
+RETRYABLE_ERRORS = ()
+# Timeout of the OpenAIConfig sending the current request, applied by the shared HTTP session
+_request_timeout = contextvars.ContextVar("openai_request_timeout", default=None)
+
+
+def _load_openai():
+    global openai, RETRYABLE_ERRORS
+    if openai is None:
+        import openai as sdk
+
+        RETRYABLE_ERRORS = (
+            sdk.error.RateLimitError,
+            sdk.error.Timeout,
+            sdk.error.APIError,
+            sdk.error.APIConnectionError,
+            sdk.error.ServiceUnavailableError,
+        )
+        openai = sdk
+    return openai
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        """
+        Token-bucket rate limiter shared by all threads (and event loops) of the process.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float): Maximum burst size (defaults to one second worth of tokens, at least 1).
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens=1):
+        """Take tokens from the bucket and return how long the caller must wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens=1):
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _timeout_adapter(pool_size):
+    """
+    HTTP adapter applying the request_timeout of the calling OpenAIConfig to requests
+    sent without one of their own. The SDK's Audio endpoints take no request_timeout
+    and always fall back to its 600 s default, which is replaced here.
+    """
+    import requests
+
+    sdk_default = openai.api_requestor.TIMEOUT_SECS
+
+    class TimeoutHTTPAdapter(requests.adapters.HTTPAdapter):
+        def send(self, request, timeout=None, **kwargs):
+            if timeout is None or timeout == sdk_default:
+                timeout = _request_timeout.get() or timeout
+            return super().send(request, timeout=timeout, **kwargs)
+
+    return TimeoutHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _shared_session(pool_size):
+    """
+    Persistent connection pool used by every synchronous SDK request of the process.
+    It holds no credentials: each OpenAIConfig passes its key with its own requests.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+
+            session = requests.Session()
+            adapter = _timeout_adapter(pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            openai.requestssession = session
+            _session = session
+        return _session
 
-# Load environment variables from .env file
-load_dotenv()
 
 class OpenAIConfig:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, requests_per_minute=None, max_retries=5, backoff_base=1.0,
+                 backoff_max=60.0, pool_size=20, request_timeout=120, api_base=None):
         """
         Initialize the OpenAI client with the provided API key or an environment variable.
+
+        The client reuses pooled HTTP connections, limits the request rate with a token
+        bucket and retries rate-limited or transient failures with exponential backoff
+        and jitter. One instance per API key is meant to be shared by all agents (see
+        get_openai_config). The key and endpoint are sent with each request rather than set
+        on the openai module, so clients with different keys can be used side by side.
+
+        Args:
+            api_key (str): OpenAI API key (defaults to the OPENAI_API_KEY environment variable).
+            requests_per_minute (int): Request rate limit (defaults to OPENAI_REQUESTS_PER_MINUTE or 500).
+            max_retries (int): Retries after the first attempt for retryable errors.
+            backoff_base (float): Initial retry delay in seconds, doubled on each attempt.
+            backoff_max (float): Upper bound for a single retry delay.
+            pool_size (int): Maximum number of pooled HTTP connections.
+            request_timeout (float): Timeout of a single request in seconds.
+            api_base (str): API endpoint (defaults to OPENAI_API_BASE, then the OpenAI API),
+                e.g. a local server for offline benchmarks.
         """
         # Use the provided API key or load from environment variables
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
-        
+
         # Ensure the API key is available
         if not self.api_key:
             raise ValueError("API key for OpenAI must be provided or set as an environment variable.")
-        
-        # Set the API key for OpenAI
-        openai.api_key = self.api_key
+
+        _load_openai()
+        self.api_base = api_base or os.environ.get("OPENAI_API_BASE")
+
+        requests_per_minute = requests_per_minute or int(os.environ.get("OPENAI_REQUESTS_PER_MINUTE", 500))
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_timeout = request_timeout
+        self.pool_size = pool_size
+        self._aiosessions = {}
+        self.session = _shared_session(pool_size)
+
+    def _retry_delay(self, attempt, error):
+        """Delay before the next attempt: the server's Retry-After if given, else backoff with full jitter."""
+        headers = getattr(error, "headers", None) or {}
+        retry_after = headers.get("retry-after") or headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _credentials(self):
+        """API key and endpoint passed with each SDK call (None keeps the SDK's default endpoint)."""
+        return {"api_key": self.api_key, "api_base": self.api_base}
+
+    def _call_kwargs(self, kwargs):
+        """Add the credentials and default request_timeout to the kwargs of a ChatCompletion or Embedding call."""
+        kwargs.setdefault("request_timeout", self.request_timeout)
+        return {**self._credentials(), **kwargs}
+
+    def request(self, fn, *args, **kwargs):
+        """
+        Call an OpenAI SDK function with rate limiting and retries.
+
+        Returns:
+            The SDK response.
+
+        Raises:
+            openai.error.OpenAIError: If the request fails with a non-retryable error or retries are exhausted.
+        """
+        timeout = _request_timeout.set(self.request_timeout)
+        try:
+            for attempt in range(self.max_retries + 1):
+                self.rate_limiter.acquire()
+                try:
+                    return fn(*args, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self._retry_delay(attempt, e)
+                    span = current_span()
+                    if span is not None:
+                        span.incr("retries")
+                    logging.warning(f"OpenAI request failed ({e.__class__.__name__}), retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+        finally:
+            _request_timeout.reset(timeout)
+
+    async def arequest(self, fn, *args, **kwargs):
+        """Async counterpart of request() for the SDK's a* coroutines."""
+        await self._use_aiosession()
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.aacquire()
+            try:
+                return await fn(*args, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                span = current_span()
+                if span is not None:
+                    span.incr("retries")
+                await asyncio.sleep(self._retry_delay(attempt, e))
+
+    async def _use_aiosession(self):
+        """Reuse one aiohttp session per event loop for async requests, when aiohttp is available."""
+        try:
+            import aiohttp
+        except ImportError:
+            return
+        loop = asyncio.get_running_loop()
+        session = self._aiosessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+            self._aiosessions[loop] = session
+        openai.aiosession.set(session)
+
+    async def aclose(self):
+        """Close the aiohttp session of the running event loop."""
+        session = self._aiosessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    @staticmethod
+    def _record_usage(span, response):
+        usage = response.get("usage") or {}
+        span.set(prompt_tokens=usage.get("prompt_tokens", 0), completion_tokens=usage.get("completion_tokens", 0))
 
     def create_chat_completion(self, model, messages, **kwargs):
         """
         Create a chat completion using the specified model and messages.
-        
+
         Args:
             model (str): The model to use (e.g., 'gpt-4', 'gpt-3.5-turbo').
             messages (list): A list of message dictionaries (role and content).
             **kwargs: Additional parameters for the completion (e.g., temperature, max_tokens).
-            
+
         Returns:
             dict: The response from the OpenAI API.
         """
         try:
-            response = openai.ChatCompletion.create(  
-                model=model,
-                messages=messages,
-                **kwargs
-            )
+            with tracer.span("openai.chat", model=model) as span:
+                response = self.request(openai.ChatCompletion.create, model=model, messages=messages,
+                                        **self._call_kwargs(kwargs))
+                self._record_usage(span, response)
             return response
         except Exception as e:
-            print(f"Error creating chat completion: {e}")
+            logging.error(f"Error creating chat completion: {e}")
             return None  # Return None if an error occurs
+
+    async def acreate_chat_completion(self, model, messages, **kwargs):
+        """Async counterpart of create_chat_completion()."""
+        try:
+            with tracer.span("openai.chat", model=model) as span:
+                response = await self.arequest(openai.ChatCompletion.acreate, model=model, messages=messages,
+                                               **self._call_kwargs(kwargs))
+                self._record_usage(span, response)
+            return response
+        except Exception as e:
+            logging.error(f"Error creating chat completion: {e}")
+            return None
+
+    def chat(self, model, messages, **kwargs):
+        """
+        Create a chat completion and return the reply text.
+
+        Returns:
+            str: Content of the first choice.
+
+        Raises:
+            openai.error.OpenAIError: If the request ultimately fails.
+        """
+        with tracer.span("openai.chat", model=model) as span:
+            response = self.request(openai.ChatCompletion.create, model=model, messages=messages,
+                                    **self._call_kwargs(kwargs))
+            self._record_usage(span, response)
+        return response.choices[0].message["content"]
+
+    async def achat(self, model, messages, **kwargs):
+        """Async counterpart of chat()."""
+        with tracer.span("openai.chat", model=model) as span:
+            response = await self.arequest(openai.ChatCompletion.acreate, model=model, messages=messages,
+                                           **self._call_kwargs(kwargs))
+            self._record_usage(span, response)
+        return response.choices[0].message["content"]
+
+    def stream_chat(self, model, messages, **kwargs):
+        """
+        Create a chat completion and yield the reply text as it is generated.
+
+        Yields:
+            str: Pieces of the reply content, in order.
+
+        Raises:
+            openai.error.OpenAIError: If the request ultimately fails.
+        """
+        with tracer.span("openai.chat", model=model, stream=True) as span:
+            response = self.request(openai.ChatCompletion.create, model=model, messages=messages, stream=True,
+                                    **self._call_kwargs(kwargs))
+            for chunk in response:
+                content = chunk["choices"][0].get("delta", {}).get("content")
+                if content:
+                    span.incr("completion_chunks")
+                    yield content
+
+    def embed(self, texts, model="text-embedding-ada-002", **kwargs):
+        """
+        Embed a batch of texts.
+
+        Returns:
+            list: One embedding (list of floats) per text, in order.
+
+        Raises:
+            openai.error.OpenAIError: If the request ultimately fails.
+        """
+        with tracer.span("openai.embed", model=model, inputs=len(texts)) as span:
+            response = self.request(openai.Embedding.create, model=model, input=list(texts),
+                                    **self._call_kwargs(kwargs))
+            span.set(prompt_tokens=(response.get("usage") or {}).get("prompt_tokens", 0))
+        return [item["embedding"] for item in sorted(response["data"], key=lambda item: item["index"])]
+
+    def transcribe(self, file, model="whisper-1", **kwargs):
+        """
+        Transcribe an audio file object with Whisper.
+
+        Returns:
+            str: Transcribed text.
+        """
+        def call(**call_kwargs):
+            # Rewind so a retried upload sends the whole file again
+            file.seek(0)
+            return openai.Audio.transcribe(model=model, file=file, **self._credentials(), **call_kwargs)
+
+        with tracer.span("openai.transcribe", model=model, bytes_uploaded=_file_size(file)):
+            response = self.request(call, **kwargs)
+        return response.get("text", "")
+
+    async def atranscribe(self, file, model="whisper-1", **kwargs):
+        """Async counterpart of transcribe()."""
+        async def call(**call_kwargs):
+            file.seek(0)
+            return await openai.Audio.atranscribe(model=model, file=file, **self._credentials(), **call_kwargs)
+
+        with tracer.span("openai.transcribe", model=model, bytes_uploaded=_file_size(file)):
+            response = await self.arequest(call, **kwargs)
+        return response.get("text", "")
+
+
+def _file_size(file):
+    """Size in bytes of a seekable file object."""
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return size
+
+
+_shared_configs = {}
+_shared_lock = threading.Lock()
+
+
+def get_openai_config(api_key=None):
+    """
+    Return the process-wide OpenAIConfig for an API key, creating it on first use, so
+    every agent using the key shares one client and one rate limit.
+
+    Args:
+        api_key (str): API key of the client (defaults to the OPENAI_API_KEY environment variable).
+
+    Returns:
+        OpenAIConfig: The shared client for the key.
+    """
+    key = api_key or os.environ.get("OPENAI_API_KEY")
+    with _shared_lock:
+        config = _shared_configs.get(key)
+        if config is None:
+            config = _shared_configs[key] = OpenAIConfig(key)
+        return config
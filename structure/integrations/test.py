@@ -1,4 +1,8 @@
-from openai_config import OpenAIConfig
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from integrations.openai_config import OpenAIConfig
 
 openai_config = OpenAIConfig()
 
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fakes import FakeOpenAIServer  # noqa: E402
+
+
+@pytest.fixture
+def openai_server():
+    server = FakeOpenAIServer(latency=0.01, chat_latency=0.01, embed_latency=0.0).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def openai_config(openai_server):
+    """OpenAIConfig pointed at the fake server, failing fast so tests exercise the callers' own retries."""
+    from integrations.openai_config import OpenAIConfig
+
+    return OpenAIConfig(api_key="sk-test", api_base=openai_server.url, max_retries=0, backoff_base=0.01)
+
+
+@pytest.fixture
+def saved_outputs(tmp_path, monkeypatch):
+    """Saved summaries, session store, mood trends and history index written under tmp_path."""
+    from backend import analytics, session_store, vector_index
+    from backend.agents import audio_agent
+
+    monkeypatch.setattr(audio_agent, "OUTPUT_PATH", str(tmp_path))
+    monkeypatch.setattr(session_store, "_store", session_store.SessionStore(str(tmp_path / "sessions.sqlite")))
+    monkeypatch.setattr(analytics, "_analytics", analytics.MoodAnalytics(str(tmp_path / "analytics")))
+    monkeypatch.setattr(vector_index, "_index", vector_index.VectorIndex(
+        str(tmp_path / "vector_index"), embedder=vector_index.HashingEmbedder()))
+    return tmp_path
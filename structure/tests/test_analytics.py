@@ -0,0 +1,21 @@
+from backend.analytics import DIMENSIONS, emotion_vector
+
+
+def mentioned(section, sentiment_label=None):
+    vector = emotion_vector({"patient_name": "Test Patient", "emotions_or_states": section}, sentiment_label)
+    return [DIMENSIONS[i] for i in vector.nonzero()[0]]
+
+
+def test_emotions_match_whole_words():
+    assert mentioned("Hopeless about the future, helplessness.") == ["hopelessness"]
+    assert mentioned("Hopeful and more confident.") == ["hope"]
+    assert mentioned("Hopelessness, but some hope.") == ["hopelessness", "hope"]
+    # Stems only match at the start of a word
+    assert mentioned("Average outrage at the dosage.") == []
+
+
+def test_negated_emotions_are_left_out():
+    assert mentioned("No longer anxious, but still tired.") == ["fatigue"]
+    assert mentioned("Not sad; calm without fear and no anger.") == ["calm"]
+    assert mentioned("He didn't feel lonely, no anxiety or sadness.") == []
+    assert mentioned("Anxious, not depressed.", sentiment_label="neutral") == ["anxiety", "sentiment_neutral"]
@@ -0,0 +1,163 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from backend import jobs
+from backend.analytics import get_mood_analytics
+from backend.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue
+from backend.session_store import get_session_store
+from backend.telemetry import Tracer, tracer
+from backend.vector_index import get_vector_index
+from benchmarks.fakes import synthesize_session
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite"), lease_duration=0.1)
+
+
+def test_submitting_the_same_work_twice_returns_the_existing_job(queue):
+    job_id = queue.submit("summarize", {"transcript": "hello"})
+
+    assert queue.submit("summarize", {"transcript": "hello"}) == job_id
+    assert queue.submit("summarize", {"transcript": "bye"}) != job_id
+    assert len(queue.list()) == 2
+
+
+def test_running_job_is_reclaimed_once_its_lease_expires(queue):
+    job_id = queue.submit("summarize", {"transcript": "hello"})
+
+    assert queue.claim("worker-1")["id"] == job_id
+    assert queue.claim("worker-2") is None
+    time.sleep(0.15)
+    job = queue.claim("worker-2")
+
+    assert job["id"] == job_id
+    assert job["worker"] == "worker-2"
+    assert job["attempts"] == 2
+
+
+def test_failed_attempts_are_queued_again_until_the_job_runs_out_of_them(queue):
+    job_id = queue.submit("summarize", {"transcript": "hello"}, max_attempts=2)
+
+    queue.claim("worker-1")
+    queue.fail(job_id, "RuntimeError: first", "worker-1")
+    assert queue.get(job_id)["status"] == QUEUED
+    queue.claim("worker-1")
+    queue.fail(job_id, "RuntimeError: second", "worker-1")
+
+    job = queue.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"] == "RuntimeError: second"
+    assert queue.claim("worker-1") is None
+
+
+def test_abandoned_job_without_attempts_left_is_failed(queue):
+    job_id = queue.submit("summarize", {"transcript": "hello"}, max_attempts=1)
+    queue.claim("worker-1")
+    time.sleep(0.15)
+
+    assert queue.claim("worker-2") is None
+    assert queue.get(job_id)["status"] == FAILED
+    assert queue.get(job_id)["error"] == "worker lost"
+
+
+def test_retry_gives_a_failed_job_a_fresh_set_of_attempts(queue):
+    job_id = queue.submit("summarize", {"transcript": "hello"}, max_attempts=1)
+    queue.claim("worker-1")
+    queue.fail(job_id, "RuntimeError: boom", "worker-1")
+
+    queue.retry(job_id)
+    job = queue.claim("worker-2")
+    queue.complete(job_id, {"summary": "done"}, "worker-2")
+
+    assert job["status"] == RUNNING
+    assert job["attempts"] == 1
+    assert queue.get(job_id)["status"] == DONE
+    assert queue.get(job_id)["result"] == {"summary": "done"}
+
+
+def test_worker_that_lost_its_lease_cannot_finish_the_job(queue):
+    job_id = queue.submit("summarize", {"transcript": "hello"})
+    queue.claim("worker-1")
+    time.sleep(0.15)
+    queue.claim("worker-2")
+
+    assert not queue.report_progress(job_id, 0.5, worker_id="worker-1")
+    assert not queue.complete(job_id, {"summary": "stale"}, "worker-1")
+    assert not queue.fail(job_id, "RuntimeError: stale", "worker-1")
+    assert queue.get(job_id)["status"] == RUNNING
+
+    assert queue.report_progress(job_id, 0.5, worker_id="worker-2")
+    assert queue.complete(job_id, {"summary": "fresh"}, "worker-2")
+    assert queue.get(job_id)["result"] == {"summary": "fresh"}
+
+
+class StubAudioAgent:
+    """Audio agent answering every step of a session job without calling the API."""
+
+    def transcribe_long_audio(self, audio_file):
+        return "I felt anxious this week but the breathing exercises helped."
+
+    def summarize_transcript(self, transcript):
+        return {"patient_name": "Test Patient", "date": "2024-05-01", "summary": "Overview: anxious, then calmer."}
+
+    def analyze_sentiment(self, transcript):
+        return [{"label": "calm", "score": 0.9}]
+
+
+def test_transcription_job_returns_the_mood_to_save_the_session_with(monkeypatch):
+    monkeypatch.setattr(jobs, "_audio_agent", lambda payload: StubAudioAgent())
+
+    result = jobs.handle_transcribe({"audio_file": "session.wav"}, lambda *args: None)
+
+    assert result == {"transcript": StubAudioAgent().transcribe_long_audio("session.wav"), "mood": "calm"}
+
+
+def test_session_job_run_twice_saves_the_session_once(tmp_path, monkeypatch, saved_outputs):
+    monkeypatch.setattr(jobs, "_audio_agent", lambda payload: StubAudioAgent())
+    payload = {"audio_file": synthesize_session(str(tmp_path / "session.wav"), 5)}
+
+    # A re-claimed job runs its handler again from the start
+    first = jobs.handle_session(payload, lambda *args: None)
+    second = jobs.handle_session(payload, lambda *args: None)
+
+    assert first == second
+    assert len(get_session_store().sessions(patient_name="Test Patient")) == 1
+    assert len(get_mood_analytics().trend("Test Patient").dates) == 1
+    assert len(set(get_vector_index()._load("Test Patient")["keys"])) == 1
+    assert [path.name for path in (saved_outputs / "saved_summaries" / "Test Patient").iterdir()] == [
+        "session_session_summary.json"]
+
+
+def test_worker_spans_are_stored_on_the_job_for_the_submitting_session(tmp_path, monkeypatch):
+    def summarize(payload, progress):
+        with tracer.span("openai.chat", prompt_tokens=10):
+            return {"summary": "done"}
+
+    monkeypatch.setitem(jobs.HANDLERS, "summarize", summarize)
+    session_id = uuid.uuid4().hex
+    db_path = str(tmp_path / "jobs.sqlite")
+    job_id = JobQueue(db_path).submit("summarize", {"transcript": "hello", "session_id": session_id})
+    stop = threading.Event()
+    worker = threading.Thread(target=jobs.worker_loop, kwargs={"db_path": db_path, "poll_interval": 0.05,
+                                                                "stop_event": stop})
+    worker.start()
+    try:
+        job = JobQueue(db_path).wait(job_id, timeout=5, poll_interval=0.05)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert job["status"] == DONE
+    assert {span["name"] for span in job["spans"]} == {"job.summarize", "openai.chat"}
+    assert all(span["session_id"] == session_id for span in job["spans"])
+    # The dashboard process imports them into its own tracer, once however often it polls
+    dashboard_tracer = Tracer()
+    assert dashboard_tracer.import_spans(job["spans"]) == 2
+    assert dashboard_tracer.import_spans(job["spans"]) == 0
+    rows = {row["stage"]: row for row in dashboard_tracer.summary(session_id)}
+    assert rows["openai.chat"]["prompt_tokens"] == 10
+    assert rows["job.summarize"]["calls"] == 1
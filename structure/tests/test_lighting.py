@@ -0,0 +1,53 @@
+from backend.lighting import LightingEngine
+from benchmarks.fakes import FakeHueBridge
+
+WARM = [0.5, 0.41]
+COOL = [0.17, 0.2]
+
+
+def test_all_lights_changing_use_one_group_action():
+    bridge = FakeHueBridge(lights=4, latency=0)
+    engine = LightingEngine(bridge)
+
+    assert engine.apply(WARM) == 1
+    assert bridge.calls["set_group"] == 1
+    assert bridge.calls["set_light"] == 0
+    assert all(state["on"] and state["xy"] == WARM for state in bridge.lights.values())
+
+
+def test_only_lights_out_of_date_are_updated_one_by_one():
+    bridge = FakeHueBridge(lights=4, latency=0)
+    engine = LightingEngine(bridge, state_ttl=0)
+    engine.apply(WARM)
+    bridge.lights[2]["xy"] = COOL
+    bridge.lights[3]["on"] = False
+
+    assert engine.apply(WARM) == 2
+    assert bridge.calls["set_group"] == 1
+    assert bridge.calls["set_light"] == 2
+    assert all(state["on"] and state["xy"] == WARM for state in bridge.lights.values())
+
+
+def test_unchanged_color_sends_no_request():
+    bridge = FakeHueBridge(lights=4, latency=0)
+    engine = LightingEngine(bridge)
+    engine.apply(WARM, brightness=200)
+
+    assert engine.apply(WARM, brightness=200) == 0
+    assert engine.apply(WARM, brightness=100) == 1
+    # Known states are reused, so only the first apply read the bridge
+    assert bridge.calls["get_api"] == 1
+
+
+def test_room_group_leaves_other_lights_alone():
+    bridge = FakeHueBridge(lights=6, latency=0, groups={1: [1, 2, 3]})
+    engine = LightingEngine(bridge, group_id=1, state_ttl=0)
+
+    assert engine.apply(WARM) == 1
+    assert bridge.calls["set_group"] == 1
+    bridge.lights[2]["xy"] = COOL
+    assert engine.apply(WARM) == 1
+    assert bridge.calls["set_light"] == 1
+
+    assert [bridge.lights[i]["on"] for i in range(1, 7)] == [True] * 3 + [False] * 3
+    assert set(engine._light_states()) == {1, 2, 3}
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from backend.agents.music_agent import MusicAgent
+from backend.registry import AgentRegistry
+from benchmarks.fakes import FakeSpotify
+
+
+@pytest.fixture
+def spotify():
+    return FakeSpotify(latency=0, devices=2)
+
+
+def make_agent(spotify, openai_config=None, **kwargs):
+    return MusicAgent(None, None, None, openai_api_key="sk-test", openai_config=openai_config,
+                      spotify_client=spotify, **kwargs)
+
+
+def test_search_results_are_cached_per_query(spotify):
+    agent = make_agent(spotify)
+
+    first = agent.search_spotify("calm piano")
+    second = agent.search_spotify("calm piano")
+    agent.search_spotify("calm piano", limit=3)
+    agent.search_spotify("upbeat pop")
+
+    assert first == second
+    assert [c["kind"] for c in first] == ["track", "playlist", "album"]
+    # One miss per distinct (query, limit); the repeated query is a hit
+    assert spotify.calls["search"] == 3
+
+
+def test_search_cache_entries_expire(spotify):
+    agent = make_agent(spotify, search_ttl=0.05)
+
+    agent.search_spotify("calm piano")
+    time.sleep(0.1)
+    agent.search_spotify("calm piano")
+
+    assert spotify.calls["search"] == 2
+
+
+def test_devices_are_reused_until_stale(spotify):
+    agent = make_agent(spotify, device_ttl=0.05)
+
+    assert agent.get_active_device()["id"] == "device-0"
+    agent.get_active_device()
+    assert spotify.calls["devices"] == 1
+    time.sleep(0.1)
+    agent.get_active_device()
+    assert spotify.calls["devices"] == 2
+
+
+def test_prefetched_mood_plays_without_searching(spotify, openai_server, openai_config):
+    agent = make_agent(spotify, openai_config)
+    agent.prefetch_mood_pools(["calm"], pool_size=2, background=False)
+    searches = spotify.calls["search"]
+
+    agent.play_music_based_on_emotion("calm")
+    first = spotify.now_playing
+    agent.play_music_based_on_emotion("Calm")
+
+    assert searches == 1
+    assert spotify.calls["search"] == searches
+    assert spotify.calls["start_playback"] == 2
+    # Repeated switches to the same mood rotate through its pool
+    assert spotify.now_playing != first
+    # The prefetch generated the mood's query once; playing from the pool needs no chat request
+    assert openai_server.stats["chat"]["requests"] == 1
+    agent.stop_device_refresh()
+
+
+def test_warm_up_and_prefetch_share_the_query_requests(spotify, openai_server, openai_config):
+    agent = make_agent(spotify, openai_config)
+
+    agent.warm_query_cache(["calm", "sad"])
+    agent.prefetch_mood_pools(["calm", "sad"], pool_size=2, background=False)
+
+    # The prefetch waits for the warm-up's requests instead of sending its own
+    assert openai_server.stats["chat"]["requests"] == 2
+    assert set(agent.mood_pools) == {"calm", "sad"}
+    agent.close()
+
+
+def test_closing_the_registry_stops_the_device_refresh(spotify):
+    registry = AgentRegistry()
+    registry.register("music", lambda: make_agent(spotify, device_ttl=0.02), close=lambda agent: agent.close())
+    agent = registry.get("music")
+    agent.start_device_refresh()
+
+    registry.close()
+    agent._device_refresher.join(timeout=1)
+
+    assert not agent._device_refresher.is_alive()
+    assert not registry.is_ready("music")
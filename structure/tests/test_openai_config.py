@@ -0,0 +1,35 @@
+import io
+
+from integrations import openai_config as openai_config_module
+from integrations.openai_config import OpenAIConfig, get_openai_config
+
+MESSAGES = [{"role": "user", "content": "How are you?"}]
+
+
+def upload():
+    file = io.BytesIO(b"RIFF" + bytes(8192))
+    file.name = "session.wav"
+    return file
+
+
+def test_clients_with_different_keys_send_their_own_key(openai_server):
+    module_key = openai_config_module._load_openai().api_key
+    first = OpenAIConfig(api_key="sk-first", api_base=openai_server.url, max_retries=0)
+    second = OpenAIConfig(api_key="sk-second", api_base=openai_server.url, max_retries=0)
+
+    first.chat("gpt-4", MESSAGES)
+    second.chat("gpt-4", MESSAGES)
+    first.transcribe(upload())
+    second.embed(["calm"])
+
+    assert openai_server.api_keys == {"sk-first": 2, "sk-second": 2}
+    # Nothing is set on the openai module, so neither client overrides the other
+    assert openai_config_module.openai.api_key == module_key
+
+
+def test_shared_client_is_kept_per_key():
+    client = get_openai_config("sk-shared-a")
+
+    assert get_openai_config("sk-shared-a") is client
+    assert get_openai_config("sk-shared-b") is not client
+    assert client.api_key == "sk-shared-a"
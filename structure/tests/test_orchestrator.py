@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.agents.audio_agent import AudioAgent
+from backend.agents.music_agent import MusicAgent
+from backend.agents.visual_environment_agent import VisualLightAgent
+from backend.orchestrator import DagExecutor, Stage, StageFailed, TherapySessionManager
+from benchmarks.fakes import FakeHueBridge, FakeSpotify, synthesize_session
+
+
+def run(stages, **inputs):
+    executor = DagExecutor(stages)
+    try:
+        return asyncio.run(executor.run(**inputs))
+    finally:
+        executor.shutdown()
+
+
+def test_stages_run_after_their_dependencies():
+    events = []
+    lock = threading.Lock()
+
+    def stage(name, delay=0.0):
+        def fn(**kwargs):
+            with lock:
+                events.append(("start", name))
+            time.sleep(delay)
+            with lock:
+                events.append(("end", name))
+            return f"{name}({','.join(sorted(kwargs.values()))})"
+        return fn
+
+    result = run([
+        Stage("summary", stage("summary"), ("transcript",)),
+        Stage("transcript", stage("transcript", 0.05), ("audio_file",)),
+        Stage("mood", stage("mood", 0.02), ("transcript",)),
+        Stage("music", stage("music"), ("mood",)),
+    ], audio_file="a.wav")
+
+    assert result["errors"] == {}
+    assert result["results"]["music"] == "music(mood(transcript(a.wav)))"
+    assert result["results"]["summary"] == "summary(transcript(a.wav))"
+    order = {event: i for i, event in enumerate(events)}
+    for stage_name, dependency in [("mood", "transcript"), ("summary", "transcript"), ("music", "mood")]:
+        assert order[("end", dependency)] < order[("start", stage_name)]
+    # Independent stages overlap
+    assert order[("start", "summary")] < order[("end", "mood")]
+
+
+def test_timeout_fails_the_stage_and_skips_its_dependents():
+    result = run([
+        Stage("slow", lambda: time.sleep(1), timeout=0.1),
+        Stage("after_slow", lambda slow: slow, ("slow",)),
+        Stage("independent", lambda: "ok"),
+    ])
+
+    assert result["errors"]["slow"] == "timed out after 0.1s"
+    assert result["errors"]["after_slow"] == "skipped: dependency 'slow' failed"
+    assert result["results"]["independent"] == "ok"
+    assert result["timings"]["slow"] < 0.5
+
+
+def test_failed_stage_is_reported():
+    def fail():
+        raise StageFailed("no text")
+
+    result = run([Stage("transcript", fail), Stage("mood", lambda transcript: "calm", ("transcript",))])
+
+    assert result["errors"]["transcript"] == "StageFailed: no text"
+    assert "mood" not in result["results"]
+
+
+def test_former_signature_with_openai_config_still_binds_the_agents():
+    music_agent, visual_agent, audio_agent = object(), object(), object()
+
+    with pytest.warns(DeprecationWarning):
+        manager = TherapySessionManager("openai-config", music_agent, visual_agent, audio_agent, {"mood": 5})
+
+    assert manager.music_agent is music_agent
+    assert manager.visual_agent is visual_agent
+    assert manager.audio_agent is audio_agent
+    assert manager.stage_timeouts["mood"] == 5
+
+
+def test_session_pipeline_runs_against_fakes(tmp_path, openai_server, openai_config):
+    audio_file = synthesize_session(str(tmp_path / "session.wav"), 30)
+    audio_agent = AudioAgent(openai_api_key="sk-test", patient_data={"name": "Test Patient"}, use_cache=False,
+                             openai_config=openai_config, use_history=False)
+    music_agent = MusicAgent(None, None, None, openai_api_key="sk-test", openai_config=openai_config,
+                             spotify_client=FakeSpotify(latency=0))
+    visual_agent = VisualLightAgent(bridge_ip=None, bridge=FakeHueBridge(latency=0), preload_visuals=False)
+    manager = TherapySessionManager(music_agent, visual_agent, audio_agent)
+
+    try:
+        summary = manager.process_audio(audio_file)
+    finally:
+        music_agent.stop_device_refresh()
+
+    assert summary["patient_name"] == "Test Patient"
+    assert not {"transcript", "mood", "music", "lighting", "session_structure"} & set(manager.last_run["errors"])
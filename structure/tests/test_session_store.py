@@ -0,0 +1,29 @@
+from backend.session_store import SessionStore, extract_emotions
+
+# Saved summary of a recorded session (backend/saved_outputs/saved_summaries)
+SUMMARY = {
+    "patient_name": "Khlifa KHLIF",
+    "date": "2024-12-22",
+    "summary": (
+        "1. **Overview**: The main themes discussed in the session include the patient's struggle with panic "
+        "symptoms, especially rapid breathing when anxious.\n\n"
+        "2. **Key Insights**: \n   - The patient struggles with severe emotional pain due to loss.\n\n"
+        "3. **Emotions or States**: The patient seems to be in a state of anxiety with bouts of panic. He also "
+        "registers significant emotional pain and possibly a sense of loss, loneliness, and isolation.\n\n"
+        "4. **Therapeutic Goals**: \n   - Regular practice of the relaxation breathing technique."
+    ),
+}
+
+
+def test_emotions_of_a_summary_come_from_the_vocabulary():
+    assert extract_emotions(SUMMARY, mood="Neutral") == ["neutral", "anxiety", "loneliness"]
+
+
+def test_sessions_are_found_by_emotion_term(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite"))
+    session_id = store.add_session(SUMMARY, mood="neutral", source_path=str(tmp_path / "summary.json"))
+
+    assert [s["id"] for s in store.sessions(emotion="anxious")] == [session_id]
+    assert [s["id"] for s in store.sessions(emotion="Neutral")] == [session_id]
+    assert store.sessions(emotion="the") == []
+    assert store.sessions(emotion="sadness") == []
@@ -0,0 +1,54 @@
+import struct
+import wave
+
+from backend.streaming import StreamingTranscriber, WavFileSource, merge_transcripts
+
+RATE = 8000
+
+
+def write_counting_wav(path, seconds):
+    """Mono WAV whose samples hold the index of the second they belong to."""
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(b"".join(struct.pack("<h", second) * RATE for second in range(seconds)))
+    return path
+
+
+def transcribe_seconds(window):
+    """Stub transcriber "hearing" one word per second of audio in the window."""
+    with wave.open(window, "rb") as wf:
+        frames = wf.readframes(wf.getnframes())
+    seconds = sorted(set(struct.unpack(f"<{len(frames) // 2}h", frames)))
+    return " ".join(f"second{s}" for s in seconds)
+
+
+def test_words_repeated_by_the_overlap_are_dropped():
+    assert merge_transcripts("", " I felt calm ") == "I felt calm"
+    assert merge_transcripts("I felt calm this week", "this week, at work") == "I felt calm this week at work"
+    # Case and punctuation are ignored when matching the overlap
+    assert merge_transcripts("I was anxious.", "Anxious about work") == "I was anxious. about work"
+
+
+def test_text_is_only_merged_at_the_boundary():
+    assert merge_transcripts("the week was long", "the week ahead") == "the week was long the week ahead"
+    assert merge_transcripts("one two three", "one two three four", max_overlap_words=2) == \
+        "one two three one two three four"
+
+
+def test_replayed_recording_is_transcribed_in_overlapping_windows(tmp_path):
+    audio_file = write_counting_wav(str(tmp_path / "session.wav"), 5)
+    partials = []
+    transcriber = StreamingTranscriber(transcribe_seconds, window_duration=2.0, overlap_duration=0.5)
+
+    source = WavFileSource(audio_file, chunk_size=RATE // 20, realtime=False)
+    source.open()
+    transcriber.start(source, on_partial=lambda index, text, full: partials.append((index, text)))
+    transcriber.join(timeout=10)
+
+    assert [index for index, _ in partials] == list(range(len(partials)))
+    assert partials[0][1] == "second0 second1"
+    # Each window starts in the last second of the previous one
+    assert [text for _, text in partials[1:]] == ["second1 second2 second3", "second3 second4"]
+    assert transcriber.text == "second0 second1 second2 second3 second4"
@@ -0,0 +1,97 @@
+import threading
+
+from backend.agents.audio_agent import AudioAgent, save_summary_to_json
+from backend.cache import DiskCache
+from backend.session_store import get_session_store
+from backend.summarization import SEGMENT_PREAMBLE, MapReduceSummarizer, segment_transcript
+from backend.vector_index import get_vector_index
+from benchmarks.run import synthetic_transcript
+
+
+class RecordingChat:
+    """Chat function answering segment prompts with numbered notes and recording every request."""
+
+    def __init__(self):
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def __call__(self, messages):
+        with self._lock:
+            self.requests.append(messages)
+        if messages[0]["content"] == SEGMENT_PREAMBLE:
+            segment = messages[1]["content"].split(":", 1)[0]  # "Segment 2 of 5"
+            return f"notes for {segment}"
+        return "Overview: merged."
+
+
+def test_segments_are_summarized_then_merged_in_order():
+    transcript = synthetic_transcript(60)
+    segments = segment_transcript(transcript, 500)
+    chat = RecordingChat()
+
+    summary = MapReduceSummarizer(chat, max_workers=4, segment_tokens=500).summarize(transcript, "Patient Name: Test")
+
+    assert summary == "Overview: merged."
+    assert len(segments) > 1
+    assert len(chat.requests) == len(segments) + 1
+    merge_prompt = chat.requests[-1][1]["content"]
+    assert "Patient Name: Test" in merge_prompt
+    positions = [merge_prompt.index(f"Segment {i + 1} notes:\nnotes for Segment {i + 1} of {len(segments)}")
+                 for i in range(len(segments))]
+    assert positions == sorted(positions)
+
+
+def test_empty_segment_notes_are_left_out_of_the_merge():
+    def chat(messages):
+        if messages[0]["content"] != SEGMENT_PREAMBLE:
+            return messages[1]["content"]
+        return "" if messages[1]["content"].startswith("Segment 2 ") else "notes"
+
+    transcript = synthetic_transcript(30)
+    merge_prompt = MapReduceSummarizer(chat, segment_tokens=500).summarize(transcript, "")
+
+    notes = len(segment_transcript(transcript, 500)) - 1
+    assert merge_prompt.count("notes:\nnotes") == notes
+    assert f"Segment {notes + 1} notes:" not in merge_prompt
+
+
+def test_long_transcript_is_map_reduced_through_the_api(openai_server, openai_config):
+    agent = AudioAgent(openai_api_key="sk-test", patient_data={"name": "Test Patient"}, use_cache=False,
+                       openai_config=openai_config, use_history=False)
+
+    summary = agent.summarize_transcript(synthetic_transcript(60), mode="map_reduce")
+
+    assert summary["patient_name"] == "Test Patient"
+    assert "Overview" in summary["summary"]
+    # One request per segment plus the merge
+    assert openai_server.stats["chat"]["requests"] > 1
+
+
+def test_saved_transcript_summarized_again_hits_the_cache_and_not_its_own_history(
+        tmp_path, openai_server, openai_config, saved_outputs, monkeypatch):
+    lookups = []
+    index = get_vector_index()
+    context = index.context
+    monkeypatch.setattr(index, "context", lambda *args, **kwargs: lookups.append(kwargs) or context(*args, **kwargs))
+    cache = DiskCache(str(tmp_path / "cache.sqlite"))
+    transcript = synthetic_transcript(5)
+
+    def agent(**kwargs):
+        return AudioAgent(openai_api_key="sk-test", patient_data={"name": "Test Patient"}, openai_config=openai_config,
+                          vector_index=index, **kwargs)
+
+    summary = agent(cache=cache).summarize_transcript(transcript)
+    save_summary_to_json(summary, file_name="session_summary.json", transcript=transcript)
+    requests, history_lookups = openai_server.stats["chat"]["requests"], len(lookups)
+
+    # Found in the cache before any history is retrieved, although the session is now indexed
+    assert agent(cache=cache).summarize_transcript(transcript) == summary
+    assert openai_server.stats["chat"]["requests"] == requests
+    assert len(lookups) == history_lookups
+
+    # Summarized again without the cache, the session's own notes are left out of its history
+    session_id = get_session_store().session_id_for("Test Patient", transcript)
+    assert agent(use_cache=False).history_notes(transcript) != ""
+    agent(use_cache=False).summarize_transcript(transcript)
+    assert lookups[-1]["exclude_key"] == session_id
+    assert index.context("Test Patient", transcript, exclude_key=session_id) == ""
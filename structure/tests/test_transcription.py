@@ -0,0 +1,60 @@
+import threading
+import time
+
+from backend.agents.audio_agent import AudioAgent
+from backend.transcription import ConcurrentTranscriber
+from benchmarks.fakes import synthesize_session
+
+
+def test_chunks_keep_their_order():
+    # Later chunks finish first, and there are more chunks than may be in flight at once
+    def transcribe(chunk):
+        time.sleep((10 - chunk) * 0.005)
+        return f"chunk {chunk}"
+
+    results = ConcurrentTranscriber(transcribe, max_workers=4).transcribe(iter(range(10)))
+
+    assert results == [f"chunk {i}" for i in range(10)]
+
+
+def test_transient_error_is_retried():
+    attempts = {}
+    lock = threading.Lock()
+
+    def transcribe(chunk):
+        with lock:
+            attempts[chunk] = attempts.get(chunk, 0) + 1
+            first = attempts[chunk] == 1
+        if chunk == 2 and first:
+            raise ConnectionError("connection reset")
+        if chunk == 3 and first:
+            return None  # failed request reported as no text
+        return f"chunk {chunk}"
+
+    results = ConcurrentTranscriber(transcribe, max_workers=2, backoff_base=0.01).transcribe(range(5))
+
+    assert results == [f"chunk {i}" for i in range(5)]
+    assert attempts == {0: 1, 1: 1, 2: 2, 3: 2, 4: 1}
+
+
+def test_chunk_failing_every_attempt_is_none():
+    def transcribe(chunk):
+        if chunk == 1:
+            raise ConnectionError("connection reset")
+        return f"chunk {chunk}"
+
+    results = ConcurrentTranscriber(transcribe, max_retries=2, backoff_base=0.01).transcribe(range(3))
+
+    assert results == ["chunk 0", None, "chunk 2"]
+
+
+def test_long_audio_retries_failed_upload(tmp_path, openai_server, openai_config):
+    audio_file = synthesize_session(str(tmp_path / "session.wav"), 20)
+    agent = AudioAgent(openai_api_key="sk-test", patient_data={"name": "Test Patient"}, use_cache=False,
+                       openai_config=openai_config)
+    openai_server.fail_next("transcriptions")
+
+    transcript = agent.transcribe_long_audio(audio_file)
+
+    assert transcript
+    assert openai_server.stats["transcriptions"]["requests"] == 2